@@ -2,19 +2,23 @@ import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from config import configuracion, opciones_motor
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, 
                 template_folder=os.path.join(os.path.dirname(__file__), 'templates'),
                 static_folder=os.path.join(os.path.dirname(__file__), 'static'))
     
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///nomina.db'
+    app.config.update(configuracion())
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['SECRET_KEY'] = 'tu-clave-secreta-aqui'
     app.config['JSON_SORT_KEYS'] = False
+    if config:
+        app.config.update(config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opciones_motor(app.config))
     
     db.init_app(app)
     login_manager.init_app(app)
@@ -22,16 +26,41 @@ def create_app():
     login_manager.login_message = 'Debes iniciar sesión para acceder a esta página'
     
     with app.app_context():
-        db.create_all()
+        # Pragmas de SQLite antes de abrir la primera conexión
+        from servicios import base_datos
+        base_datos.init_app(app)
+        # Base de archivo histórico adjunta a cada conexión
+        from servicios import archivo
+        archivo.init_app(app)
         
-        # Cargar usuario por ID para Flask-Login
+        # Registrar los modelos antes de crear o migrar el esquema
+        import models
         from models.usuario import Usuario
+        import models.sincronizacion
+        import models.trabajos
+        import models.archivo
+        # Índice de búsqueda creado junto con la tabla personal
+        from servicios import busqueda
+        from models.migraciones import preparar_base_datos, verificar_esquema
+        if app.config['MIGRAR_AL_INICIAR']:
+            preparar_base_datos()
+        elif app.config.get('VERIFICAR_ESQUEMA', True):
+            verificar_esquema()
         
+        from servicios import cambios, perfilado, sesiones, trabajos, eventos, compresion
+        cambios.init_app(app)
+        perfilado.init_app(app)
+        sesiones.init_app(app)
+        trabajos.init_app(app)
+        eventos.init_app(app)
+        compresion.init_app(app)
+        
+        # Cargar usuario por ID para Flask-Login (con caché en memoria)
         @login_manager.user_loader
         def load_user(user_id):
-            return Usuario.query.get(int(user_id))
+            return sesiones.cargar_usuario(int(user_id))
     
-    from routes import main_bp, personal_bp, obras_bp, asignaciones_bp, presentismo_bp, ingresos_egresos_bp, auth_bp, admin_bp
+    from routes import main_bp, personal_bp, obras_bp, asignaciones_bp, presentismo_bp, ingresos_egresos_bp, liquidacion_bp, sync_bp, trabajos_bp, tablero_bp, eventos_bp, auth_bp, admin_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(personal_bp)
@@ -39,6 +68,11 @@ def create_app():
     app.register_blueprint(asignaciones_bp)
     app.register_blueprint(presentismo_bp)
     app.register_blueprint(ingresos_egresos_bp)
+    app.register_blueprint(liquidacion_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(trabajos_bp)
+    app.register_blueprint(tablero_bp)
+    app.register_blueprint(eventos_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(admin_bp)
     
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Script para mover los meses cerrados de presentismo e ingresos/egresos al archivo histórico
+Uso: python archivar.py [--hasta YYYY-MM | --meses N] [--compactar]
+     python archivar.py --verificar
+
+Por defecto archiva todo lo anterior a los últimos 3 meses. El mes en curso
+nunca se archiva. Ver servicios/archivo.py.
+"""
+
+import argparse
+from datetime import date, datetime
+
+from app import create_app, db
+from servicios import archivo
+
+MESES_CALIENTES = 3
+
+
+def _mes(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'Mes inválido: {valor} (se espera YYYY-MM)')
+
+
+def _restar_meses(mes, cantidad):
+    indice = mes.year * 12 + mes.month - 1 - cantidad
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def _verificar():
+    periodos, problemas = archivo.verificar()
+    for problema in problemas:
+        print(f"❌ {problema}")
+    if problemas:
+        raise SystemExit(1)
+    print(f"✅ Archivo verificado: {periodos} períodos sin diferencias")
+
+
+def _compactar():
+    # VACUUM no puede correr dentro de una transacción: se usa la conexión
+    # del driver para que no pase por el evento begin (servicios/base_datos.py)
+    db.session.remove()
+    conexion = db.engine.raw_connection()
+    try:
+        conexion.driver_connection.execute('VACUUM')
+    finally:
+        conexion.close()
+    print("✅ Base principal compactada")
+
+
+def archivar():
+    parser = argparse.ArgumentParser(description='Archiva los meses cerrados de asistencia')
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--hasta', type=_mes, help='Último mes a archivar (YYYY-MM)')
+    grupo.add_argument('--meses', type=int, default=MESES_CALIENTES,
+                       help=f'Meses recientes que quedan sin archivar (por defecto {MESES_CALIENTES})')
+    grupo.add_argument('--verificar', action='store_true',
+                       help='Solo verifica el archivo contra lo registrado')
+    parser.add_argument('--compactar', action='store_true',
+                        help='Compacta la base principal (VACUUM) después de archivar')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        try:
+            archivo.preparar()
+        except archivo.ArchivoNoDisponible as e:
+            print(f"❌ {str(e)}")
+            raise SystemExit(1)
+
+        if args.verificar:
+            _verificar()
+            return
+
+        mes_actual = date.today().replace(day=1)
+        if args.hasta is not None:
+            if args.hasta >= mes_actual:
+                print(f"❌ No se puede archivar el mes en curso ni meses futuros ({args.hasta:%Y-%m})")
+                raise SystemExit(1)
+            ultimo = args.hasta
+        else:
+            if args.meses < 1:
+                print("❌ --meses debe ser al menos 1 (el mes en curso)")
+                raise SystemExit(1)
+            ultimo = _restar_meses(mes_actual, args.meses)
+
+        archivados = 0
+        for tabla in archivo.TABLAS:
+            for mes in archivo.meses_pendientes(tabla, ultimo):
+                try:
+                    periodo = archivo.archivar_mes(tabla, mes)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"❌ {tabla} {mes:%Y-%m}: {str(e)}")
+                    raise SystemExit(1)
+                archivados += 1
+                print(f"✅ {tabla} {mes:%Y-%m}: {periodo.filas} filas archivadas")
+
+        if not archivados:
+            print(f"✅ No hay meses para archivar hasta {ultimo:%Y-%m}")
+        _verificar()
+        if args.compactar:
+            _compactar()
+
+
+if __name__ == '__main__':
+    archivar()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la API completa con el cliente de prueba de Flask.
+
+Recorre los endpoints de todos los blueprints y para cada uno informa
+latencia (p50, p95, p99 y máximo), consultas SQL por request y pico de
+memoria de Python (tracemalloc). El resultado se guarda en JSON en
+benchmarks/resultados/ para comparar corridas entre cambios.
+
+Sin --db genera los datos en una base en memoria. Con --db usa una base ya
+poblada con benchmarks.datos; los escenarios de escritura la modifican, así
+que conviene usar una copia.
+
+Uso: python -m benchmarks.api [--empleados 300] [--obras 15] [--dias 180]
+                              [--db sqlite:///bench.db] [--repeticiones 20]
+                              [--comparar benchmarks/resultados/anterior.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, func, select
+
+from app import create_app, db
+from models import Personal, Asignacion, Presentismo
+from models.usuario import Usuario
+from benchmarks import datos
+
+DIRECTORIO_RESULTADOS = os.path.join(os.path.dirname(__file__), 'resultados')
+
+EMAIL_BENCHMARK = 'benchmark@obra.local'
+PASSWORD_BENCHMARK = 'benchmark'
+
+ESCENARIOS = []
+
+
+def escenario(blueprint, nombre):
+    """Registra una función (contexto, número de repetición) -> pedido"""
+    def registrar(funcion):
+        ESCENARIOS.append((blueprint, nombre, funcion))
+        return funcion
+    return registrar
+
+
+def _mes(ctx):
+    return f"fecha_inicio={ctx['mes_desde']}&fecha_fin={ctx['hasta']}"
+
+
+@escenario('main', 'GET /dashboard')
+def _dashboard(ctx, i):
+    return {'url': '/dashboard'}
+
+
+@escenario('main', 'GET /presentismo (página)')
+def _pagina_presentismo(ctx, i):
+    return {'url': '/presentismo'}
+
+
+@escenario('auth', 'GET /login')
+def _login(ctx, i):
+    return {'url': '/login', 'anonimo': True}
+
+
+@escenario('auth', 'POST /login')
+def _iniciar_sesion_form(ctx, i):
+    return {'metodo': 'POST', 'url': '/login', 'anonimo': True,
+            'form': {'email': EMAIL_BENCHMARK, 'password': PASSWORD_BENCHMARK}}
+
+
+@escenario('admin', 'GET /admin/usuarios')
+def _usuarios(ctx, i):
+    return {'url': '/admin/usuarios'}
+
+
+@escenario('personal', 'GET /api/personal (100)')
+def _personal(ctx, i):
+    return {'url': '/api/personal?limit=100'}
+
+
+@escenario('personal', 'GET /api/personal (1000)')
+def _personal_1000(ctx, i):
+    return {'url': '/api/personal?limit=1000'}
+
+
+@escenario('personal', 'GET /api/personal (If-None-Match)')
+def _personal_304(ctx, i):
+    return {'url': '/api/personal?limit=100', 'headers': {'If-None-Match': ctx['etag_personal']}}
+
+
+@escenario('personal', 'GET /api/personal/buscar')
+def _buscar_personal(ctx, i):
+    return {'url': f"/api/personal/buscar?q={('gon', 'mar ro', 'pe', 'sosa')[i % 4]}"}
+
+
+@escenario('personal', 'GET /api/personal/<id>')
+def _personal_id(ctx, i):
+    return {'url': f"/api/personal/{ctx['personal_id']}"}
+
+
+@escenario('personal', 'POST /api/personal')
+def _crear_personal(ctx, i):
+    return {'metodo': 'POST', 'url': '/api/personal',
+            'json': {'nombre': 'Bench', 'apellido': f'Alta {i}', 'dni': f"bench-{ctx['corrida']}-{i}"}}
+
+
+@escenario('personal', 'PUT /api/personal/<id>')
+def _actualizar_personal(ctx, i):
+    return {'metodo': 'PUT', 'url': f"/api/personal/{ctx['personal_id']}",
+            'json': {'telefono': f'351{i:07d}'}}
+
+
+@escenario('obras', 'GET /api/obras')
+def _obras(ctx, i):
+    return {'url': '/api/obras'}
+
+
+@escenario('obras', 'GET /api/obras/<id>')
+def _obra_id(ctx, i):
+    return {'url': f"/api/obras/{ctx['obra_id']}"}
+
+
+@escenario('obras', 'PUT /api/obras/<id>')
+def _actualizar_obra(ctx, i):
+    return {'metodo': 'PUT', 'url': f"/api/obras/{ctx['obra_id']}",
+            'json': {'responsable': f'Responsable {i}'}}
+
+
+@escenario('asignaciones', 'GET /api/asignaciones?obra_id&estado')
+def _asignaciones_obra(ctx, i):
+    return {'url': f"/api/asignaciones?obra_id={ctx['obra_id']}&estado=activa&limit=1000"}
+
+
+@escenario('asignaciones', 'GET /api/asignaciones?personal_id')
+def _asignaciones_personal(ctx, i):
+    return {'url': f"/api/asignaciones?personal_id={ctx['personal_id']}"}
+
+
+@escenario('asignaciones', 'GET /api/asignaciones/vigentes?obra_id')
+def _asignaciones_vigentes(ctx, i):
+    return {'url': f"/api/asignaciones/vigentes?obra_id={ctx['obra_id']}&fecha={ctx['hasta']}"}
+
+
+@escenario('presentismo', 'GET /api/presentismo (obra, mes)')
+def _presentismo(ctx, i):
+    return {'url': f"/api/presentismo?obra_id={ctx['obra_id']}&{_mes(ctx)}&sort=-fecha"}
+
+
+@escenario('presentismo', 'GET /api/presentismo (obra, mes, columnar gzip)')
+def _presentismo_columnar(ctx, i):
+    return {'url': f"/api/presentismo?obra_id={ctx['obra_id']}&{_mes(ctx)}&sort=-fecha&format=columnar",
+            'headers': {'Accept-Encoding': 'gzip'}}
+
+
+@escenario('presentismo', 'GET /api/presentismo (obra, mes, html)')
+def _presentismo_html(ctx, i):
+    return {'url': f"/api/presentismo?obra_id={ctx['obra_id']}&{_mes(ctx)}&sort=-fecha&limit=50&format=html"}
+
+
+@escenario('presentismo', 'GET /api/presentismo (sin filtros)')
+def _presentismo_todo(ctx, i):
+    return {'url': '/api/presentismo?sort=-fecha'}
+
+
+@escenario('presentismo', 'GET /api/presentismo/resumen')
+def _resumen(ctx, i):
+    return {'url': f"/api/presentismo/resumen?obra_id={ctx['obra_id']}&{_mes(ctx)}"}
+
+
+@escenario('presentismo', 'GET /api/presentismo/matriz (obra, mes)')
+def _matriz(ctx, i):
+    return {'url': f"/api/presentismo/matriz?obra_id={ctx['obra_id']}&mes={ctx['hasta'][:7]}"}
+
+
+@escenario('presentismo', 'GET /api/presentismo/exportar (mes)')
+def _exportar_presentismo(ctx, i):
+    return {'url': f"/api/presentismo/exportar?formato=csv&{_mes(ctx)}"}
+
+
+@escenario('presentismo', 'POST /api/presentismo')
+def _crear_presentismo(ctx, i):
+    fecha = date.fromisoformat(ctx['hasta']) + timedelta(days=1 + i)
+    return {'metodo': 'POST', 'url': '/api/presentismo',
+            'json': {'personal_id': ctx['personal_id'], 'obra_id': ctx['obra_id'],
+                     'fecha': fecha.isoformat(), 'tipo': 'presente'}}
+
+
+@escenario('presentismo', 'POST /api/presentismo/lote')
+def _lote(ctx, i):
+    fecha = date.fromisoformat(ctx['hasta']) + timedelta(days=1 + i)
+    return {'metodo': 'POST', 'url': '/api/presentismo/lote',
+            'json': {'obra_id': ctx['obra_id'], 'fecha': fecha.isoformat(),
+                     'registros': [{'personal_id': p, 'tipo': 'presente'} for p in ctx['cuadrilla']]}}
+
+
+@escenario('ingresos_egresos', 'GET /api/ingresos-egresos (obra, mes)')
+def _ingresos(ctx, i):
+    return {'url': f"/api/ingresos-egresos?obra_id={ctx['obra_id']}&{_mes(ctx)}&sort=-fecha"}
+
+
+@escenario('ingresos_egresos', 'GET /api/ingresos-egresos/exportar (mes)')
+def _exportar_ingresos(ctx, i):
+    return {'url': f"/api/ingresos-egresos/exportar?formato=ndjson&{_mes(ctx)}"}
+
+
+@escenario('ingresos_egresos', 'POST /api/ingresos-egresos')
+def _crear_ingreso(ctx, i):
+    fecha = date.fromisoformat(ctx['hasta']) + timedelta(days=1 + i)
+    return {'metodo': 'POST', 'url': '/api/ingresos-egresos',
+            'json': {'personal_id': ctx['personal_id'], 'obra_id': ctx['obra_id'],
+                     'fecha': fecha.isoformat(), 'hora_ingreso': '08:00',
+                     'hora_egreso': '17:00', 'horas_trabajadas': 9}}
+
+
+@escenario('liquidacion', 'GET /api/liquidacion (mes)')
+def _liquidacion(ctx, i):
+    return {'url': f"/api/liquidacion?{_mes(ctx)}"}
+
+
+@escenario('liquidacion', 'GET /api/liquidacion/detalle (obra, mes)')
+def _liquidacion_detalle(ctx, i):
+    return {'url': f"/api/liquidacion/detalle?obra_id={ctx['obra_id']}&{_mes(ctx)}"}
+
+
+@escenario('liquidacion', 'GET /api/liquidacion (obra, mes)')
+def _liquidacion_obra(ctx, i):
+    return {'url': f"/api/liquidacion?obra_id={ctx['obra_id']}&{_mes(ctx)}"}
+
+
+@escenario('sync', 'GET /api/sync?since')
+def _sync_delta(ctx, i):
+    return {'url': f"/api/sync?since={ctx['version']}"}
+
+
+@escenario('sync', 'POST /api/sync (10 operaciones)')
+def _sync_subir(ctx, i):
+    fecha = date.fromisoformat(ctx['hasta']) + timedelta(days=400 + i)
+    return {'metodo': 'POST', 'url': '/api/sync', 'json': {'operaciones': [
+        {'clave': f"bench-{ctx['corrida']}-{i}-{n}", 'entidad': 'presentismo', 'accion': 'crear',
+         'datos': {'personal_id': p, 'obra_id': ctx['obra_id'],
+                   'fecha': fecha.isoformat(), 'tipo': 'presente'}}
+        for n, p in enumerate(ctx['cuadrilla'][:10])
+    ]}}
+
+
+@escenario('tablero', 'GET /api/tablero')
+def _tablero(ctx, i):
+    return {'url': '/api/tablero'}
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def _preparar_contexto(cliente):
+    """Ids y fechas que usan los escenarios, elegidos sobre los datos cargados"""
+    hasta = db.session.execute(select(func.max(Presentismo.fecha))).scalar()
+    obra_id, = db.session.execute(
+        select(Asignacion.obra_id).where(Asignacion.estado == 'activa')
+        .group_by(Asignacion.obra_id).order_by(func.count().desc()).limit(1)
+    ).one()
+    cuadrilla = list(db.session.scalars(
+        select(Asignacion.personal_id)
+        .where(Asignacion.obra_id == obra_id, Asignacion.estado == 'activa')
+        .order_by(Asignacion.personal_id).limit(20)
+    ))
+    respuesta = cliente.get('/api/personal?limit=100')
+    return {
+        'corrida': datetime.now().strftime('%Y%m%d%H%M%S'),
+        'hasta': hasta.isoformat(),
+        'mes_desde': (hasta - timedelta(days=29)).isoformat(),
+        'obra_id': obra_id,
+        'personal_id': cuadrilla[0],
+        'cuadrilla': cuadrilla,
+        'etag_personal': respuesta.headers.get('ETag', ''),
+        'version': int(respuesta.headers.get('X-Version', 0)),
+    }
+
+
+def _iniciar_sesion(cliente):
+    if not Usuario.query.filter_by(email=EMAIL_BENCHMARK).first():
+        usuario = Usuario(nombre='Benchmark', apellido='API', email=EMAIL_BENCHMARK, rol='admin')
+        usuario.set_password(PASSWORD_BENCHMARK)
+        db.session.add(usuario)
+        db.session.commit()
+    cliente.post('/login', data={'email': EMAIL_BENCHMARK, 'password': PASSWORD_BENCHMARK})
+
+
+def _ejecutar(clientes, pedido):
+    # Los pedidos anónimos usan un cliente sin sesión (y sin guardar cookies)
+    cliente = clientes[1] if pedido.get('anonimo') else clientes[0]
+    respuesta = cliente.open(pedido['url'], method=pedido.get('metodo', 'GET'),
+                             json=pedido.get('json'), data=pedido.get('form'),
+                             headers=pedido.get('headers'))
+    respuesta.get_data()  # consume también las respuestas en streaming
+    return respuesta.status_code
+
+
+def medir(clientes, ctx, funcion, repeticiones, consultas):
+    """Corre un escenario y devuelve sus métricas"""
+    tiempos, por_request, estados = [], [], Counter()
+    for i in range(repeticiones):
+        pedido = funcion(ctx, i)
+        consultas[0] = 0
+        inicio = time.perf_counter()
+        estados[_ejecutar(clientes, pedido)] += 1
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        por_request.append(consultas[0])
+
+    # La memoria se mide en una corrida aparte: tracemalloc agrega mucho overhead
+    tracemalloc.start()
+    _ejecutar(clientes, funcion(ctx, repeticiones))
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50_ms': round(_percentil(tiempos, 50), 2),
+        'p95_ms': round(_percentil(tiempos, 95), 2),
+        'p99_ms': round(_percentil(tiempos, 99), 2),
+        'max_ms': round(max(tiempos), 2),
+        'consultas': round(sum(por_request) / len(por_request), 1),
+        'memoria_pico_kib': round(pico / 1024, 1),
+        'estados': {str(k): v for k, v in sorted(estados.items())},
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _comparar(resultados, archivo):
+    with open(archivo, encoding='utf-8') as f:
+        anteriores = {(r['blueprint'], r['escenario']): r for r in json.load(f)['resultados']}
+    print(f'\nComparación con {archivo} (p50):')
+    for r in resultados:
+        previo = anteriores.get((r['blueprint'], r['escenario']))
+        if not previo or not previo['p50_ms']:
+            continue
+        cambio = (r['p50_ms'] - previo['p50_ms']) / previo['p50_ms'] * 100
+        print(f"  {r['escenario']:<45} {previo['p50_ms']:>9.2f} -> {r['p50_ms']:>9.2f} ms ({cambio:+.0f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--db', help='URI de una base ya poblada (por defecto, una en memoria)')
+    parser.add_argument('--empleados', type=int, default=300)
+    parser.add_argument('--obras', type=int, default=15)
+    parser.add_argument('--dias', type=int, default=180)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    parser.add_argument('--solo', help='Ejecutar solo los escenarios de este blueprint')
+    parser.add_argument('--salida', help='Archivo JSON de resultados')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.db or 'sqlite:///:memory:'})
+    with app.app_context():
+        if args.db:
+            escala = {'db': args.db, 'empleados': Personal.query.count()}
+        else:
+            escala = datos.generar(args.empleados, args.obras, args.dias)
+
+        consultas = [0]
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def contar(*_):
+            consultas[0] += 1
+
+        cliente = app.test_client()
+        _iniciar_sesion(cliente)
+        ctx = _preparar_contexto(cliente)
+    clientes = (cliente, app.test_client(use_cookies=False))
+
+    # Los requests se miden fuera del app context de la preparación: si no,
+    # Flask lo reutiliza y g (con el usuario ya cargado) queda compartido
+    resultados = []
+    for blueprint, nombre, funcion in ESCENARIOS:
+        if args.solo and blueprint != args.solo:
+            continue
+        metricas = medir(clientes, ctx, funcion, args.repeticiones, consultas)
+        resultados.append({'blueprint': blueprint, 'escenario': nombre, **metricas})
+        print(f"{nombre:<45} p50 {metricas['p50_ms']:>8.2f}  p95 {metricas['p95_ms']:>8.2f}  "
+              f"p99 {metricas['p99_ms']:>8.2f} ms  {metricas['consultas']:>5} SQL  "
+              f"{metricas['memoria_pico_kib']:>9.1f} KiB  {metricas['estados']}")
+
+    salida = args.salida or os.path.join(DIRECTORIO_RESULTADOS,
+                                         f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit_actual(),
+            'python': platform.python_version(),
+            'escala': escala,
+            'repeticiones': args.repeticiones,
+            'resultados': resultados,
+        }, f, ensure_ascii=False, indent=2)
+    print(f'\n✅ Resultados guardados en {salida}')
+
+    if args.comparar:
+        _comparar(resultados, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
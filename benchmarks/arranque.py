@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark del tiempo de arranque de un worker.
+
+Cada repetición corre en un proceso nuevo (el arranque real de un worker,
+sin módulos ya importados) y mide por separado:
+
+    importar     import app (Flask, SQLAlchemy y dependencias)
+    migrando     create_app() con MIGRAR_AL_INICIAR, como run.py
+    wsgi         create_app() sin migrar, como wsgi.py
+    primer_req   primer GET /login sobre la app de wsgi
+
+Con --importtime muestra además los módulos propios más lentos según
+python -X importtime.
+
+Uso: python -m benchmarks.arranque [--repeticiones 10] [--importtime]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Código que corre en cada proceso hijo; imprime una línea JSON con los tiempos
+MEDICION = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+aplicacion = app.create_app({'MIGRAR_AL_INICIAR': False})
+t3 = time.perf_counter()
+aplicacion.test_client().get('/login')
+t4 = time.perf_counter()
+print(json.dumps({'importar': t1 - t0, 'migrando': t2 - t1,
+                  'wsgi': t3 - t2, 'primer_req': t4 - t3}))
+"""
+
+MODULOS_PROPIOS = ('app', 'config', 'models', 'routes', 'servicios')
+
+
+def _entorno(archivo):
+    entorno = dict(os.environ)
+    entorno['DATABASE_URL'] = f'sqlite:///{archivo}'
+    return entorno
+
+
+def _medir(entorno):
+    salida = subprocess.run([sys.executable, '-c', MEDICION], cwd=RAIZ, env=entorno,
+                            capture_output=True, text=True, check=True)
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def _importtime(entorno, cantidad):
+    """Módulos propios ordenados por tiempo acumulado de import (µs)"""
+    salida = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             "import app; app.create_app({'MIGRAR_AL_INICIAR': False})"],
+                            cwd=RAIZ, env=entorno, capture_output=True, text=True, check=True)
+    filas = []
+    for linea in salida.stderr.splitlines():
+        if not linea.startswith('import time:'):
+            continue
+        propio, acumulado, modulo = (c.strip() for c in linea[len('import time:'):].split('|'))
+        if modulo.split('.')[0] in MODULOS_PROPIOS and acumulado.isdigit():
+            filas.append((int(acumulado), int(propio), modulo))
+    return sorted(filas, reverse=True)[:cantidad]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeticiones', type=int, default=10)
+    parser.add_argument('--importtime', action='store_true',
+                        help='detalle de los imports propios más lentos')
+    args = parser.parse_args()
+
+    archivo = os.path.join(tempfile.mkdtemp(prefix='nomina-arranque-'), 'arranque.db')
+    entorno = _entorno(archivo)
+    # Primera corrida fuera de la medición: crea el esquema y calienta el caché de bytecode
+    _medir(entorno)
+
+    muestras = [_medir(entorno) for _ in range(args.repeticiones)]
+    print(f'{args.repeticiones} procesos nuevos, mediana y máximo en ms')
+    for etapa in ('importar', 'migrando', 'wsgi', 'primer_req'):
+        tiempos = [m[etapa] * 1000 for m in muestras]
+        print(f'  {etapa:<12} {statistics.median(tiempos):>8.1f}  {max(tiempos):>8.1f}')
+    worker = [(m['importar'] + m['wsgi'] + m['primer_req']) * 1000 for m in muestras]
+    print(f'  worker sin preload: {statistics.median(worker):.0f} ms hasta el primer request')
+
+    if args.importtime:
+        print('\nImports propios más lentos (acumulado / propio, ms):')
+        for acumulado, propio, modulo in _importtime(entorno, 15):
+            print(f'  {acumulado / 1000:>7.1f}  {propio / 1000:>7.1f}  {modulo}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Prueba de estrés de escrituras concurrentes sobre SQLite.
+
+Simula el comienzo de turno: varios capataces cargan presentismo y fichadas
+en paralelo (POST /api/presentismo y POST /api/ingresos-egresos) mientras
+otros usuarios consultan listados. Cada hilo usa su propio cliente de
+prueba con sesión iniciada, sobre una base en un archivo temporal.
+
+Informa escrituras por segundo, latencias y errores. Termina con código 1
+si algún request falló (por ejemplo con "database is locked").
+
+Uso: python -m benchmarks.concurrencia [--escritores 8] [--lectores 4]
+                                       [--operaciones 100] [--sin-ajustes]
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from app import create_app, db
+from models.usuario import Usuario
+from benchmarks import datos
+
+EMAIL = 'capataz@obra.local'
+PASSWORD = 'concurrencia'
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0
+    return ordenados[max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))]
+
+
+def _escritor(app, numero, operaciones, empleados, inicio, resultados, barrera):
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': EMAIL, 'password': PASSWORD})
+    barrera.wait()
+    for i in range(operaciones):
+        # Cada escritor usa fechas propias: los conflictos son de lock, no de datos
+        fecha = (inicio + timedelta(days=numero * operaciones + i)).isoformat()
+        personal_id = (numero * operaciones + i) % empleados + 1
+        if i % 2 == 0:
+            url, cuerpo = '/api/presentismo', {
+                'personal_id': personal_id, 'obra_id': 1, 'fecha': fecha, 'tipo': 'presente'}
+        else:
+            url, cuerpo = '/api/ingresos-egresos', {
+                'personal_id': personal_id, 'obra_id': 1, 'fecha': fecha,
+                'hora_ingreso': '08:00', 'hora_egreso': '17:00', 'horas_trabajadas': 9}
+        t = time.perf_counter()
+        respuesta = cliente.post(url, json=cuerpo)
+        resultados.append(('escritura', respuesta.status_code, (time.perf_counter() - t) * 1000,
+                           respuesta.get_data(as_text=True)[:200]))
+
+
+def _lector(app, fin, resultados, barrera):
+    cliente = app.test_client()
+    cliente.post('/login', data={'email': EMAIL, 'password': PASSWORD})
+    barrera.wait()
+    while not fin.is_set():
+        t = time.perf_counter()
+        respuesta = cliente.get('/api/presentismo?obra_id=1&sort=-fecha&limit=100')
+        resultados.append(('lectura', respuesta.status_code, (time.perf_counter() - t) * 1000,
+                           '' if respuesta.status_code == 200 else respuesta.get_data(as_text=True)[:200]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--escritores', type=int, default=8)
+    parser.add_argument('--lectores', type=int, default=4)
+    parser.add_argument('--operaciones', type=int, default=100, help='escrituras por escritor')
+    parser.add_argument('--sin-ajustes', action='store_true',
+                        help='SQLite sin WAL ni pragmas, para comparar')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='nomina-estres-')
+    archivo = os.path.join(directorio, 'estres.db')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{archivo}',
+        'SQLITE_AJUSTES': not args.sin_ajustes,
+        'PERFILADO_UMBRAL_LENTO_MS': 10 ** 6,
+    })
+    with app.app_context():
+        resumen = datos.generar(empleados=100, obras=5, dias=30)
+        usuario = Usuario(nombre='Capataz', apellido='Prueba', email=EMAIL, rol='admin')
+        usuario.set_password(PASSWORD)
+        db.session.add(usuario)
+        db.session.commit()
+        modo = db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+    inicio = date.fromisoformat(resumen['hasta']) + timedelta(days=1)
+
+    resultados = []
+    fin = threading.Event()
+    barrera = threading.Barrier(args.escritores + args.lectores + 1)
+    escritores = [
+        threading.Thread(target=_escritor, args=(app, n, args.operaciones, 100, inicio,
+                                                 resultados, barrera))
+        for n in range(args.escritores)
+    ]
+    lectores = [threading.Thread(target=_lector, args=(app, fin, resultados, barrera))
+                for _ in range(args.lectores)]
+    for hilo in escritores + lectores:
+        hilo.start()
+
+    barrera.wait()
+    comienzo = time.perf_counter()
+    for hilo in escritores:
+        hilo.join()
+    segundos = time.perf_counter() - comienzo
+    fin.set()
+    for hilo in lectores:
+        hilo.join()
+
+    print(f'journal_mode={modo}, {args.escritores} escritores, {args.lectores} lectores')
+    errores = 0
+    for tipo in ('escritura', 'lectura'):
+        filas = [r for r in resultados if r[0] == tipo]
+        tiempos = [r[2] for r in filas]
+        estados = Counter(r[1] for r in filas)
+        fallidas = [r for r in filas if r[1] >= 500]
+        errores += len(fallidas)
+        print(f'{tipo:<10} {len(filas):>6} requests  p50 {_percentil(tiempos, 50):>7.1f}  '
+              f'p95 {_percentil(tiempos, 95):>7.1f}  p99 {_percentil(tiempos, 99):>7.1f} ms  '
+              f'{dict(estados)}')
+        for r in fallidas[:3]:
+            print(f'   ❌ {r[3]}')
+    escrituras = sum(1 for r in resultados if r[0] == 'escritura')
+    print(f'{escrituras / segundos:.0f} escrituras/s en {segundos:.1f} s')
+
+    if errores:
+        print(f'❌ {errores} requests fallaron')
+        raise SystemExit(1)
+    print('✅ Sin errores de concurrencia')
+
+
+if __name__ == '__main__':
+    main()
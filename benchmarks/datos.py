@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Generador de datos sintéticos para pruebas de carga.
+
+Crea obras, empleados, asignaciones con rotación entre obras, presentismo
+diario (lunes a sábado) y fichadas con horarios variables, con la misma
+semilla siempre da el mismo resultado. Las filas se insertan en lotes con
+inserts masivos y al final se reconstruye resumen_diario.
+
+Uso: python -m benchmarks.datos [--empleados 2000] [--obras 50] [--dias 730]
+                                [--db sqlite:///bench.db] [--semilla 42]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, time as hora, timedelta
+
+from app import create_app, db
+from models import (Personal, Obra, Asignacion, Presentismo, IngresoEgreso,
+                    TIPOS_PRESENTISMO)
+from servicios import resumen_diario, horas
+
+TAMANO_LOTE = 20000
+
+NOMBRES = ('Juan', 'Carlos', 'Jorge', 'Luis', 'Miguel', 'José', 'Ramón', 'Pedro',
+           'Sergio', 'Diego', 'Marcelo', 'Walter', 'Néstor', 'Hugo', 'Daniel',
+           'Ana', 'María', 'Laura', 'Silvia', 'Gabriela')
+APELLIDOS = ('González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz',
+             'Martínez', 'Pérez', 'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz',
+             'Ramírez', 'Flores', 'Benítez', 'Acosta', 'Medina', 'Herrera', 'Aguirre')
+CIUDADES = (('Córdoba', 'Córdoba'), ('Rosario', 'Santa Fe'), ('La Plata', 'Buenos Aires'),
+            ('Mendoza', 'Mendoza'), ('Neuquén', 'Neuquén'), ('Salta', 'Salta'))
+PUESTOS = (('Ayudante', 17000.0), ('Medio oficial', 20000.0), ('Oficial', 24000.0),
+           ('Oficial especializado', 28000.0), ('Capataz', 34000.0))
+TIPOS_OBRA = ('Edificio', 'Nave industrial', 'Escuela', 'Barrio', 'Hospital', 'Puente')
+
+# Pesos de cada tipo de presentismo, en el orden de TIPOS_PRESENTISMO
+PESOS_TIPO = (86, 3, 2, 1, 3, 5)
+
+
+class _Lotes:
+    """Acumula filas por modelo y las inserta cuando el lote se llena"""
+
+    def __init__(self):
+        self.filas = {}
+        self.totales = {}
+
+    def agregar(self, modelo, fila):
+        pendientes = self.filas.setdefault(modelo, [])
+        pendientes.append(fila)
+        if len(pendientes) >= TAMANO_LOTE:
+            self.vaciar(modelo)
+
+    def vaciar(self, modelo=None):
+        for m in ([modelo] if modelo else list(self.filas)):
+            pendientes = self.filas.pop(m, [])
+            if pendientes:
+                db.session.execute(db.insert(m), pendientes)
+                self.totales[m.__tablename__] = self.totales.get(m.__tablename__, 0) + len(pendientes)
+
+
+def _tramos(rnd, dias, obras):
+    """Períodos (día inicial, día final, obra) de un empleado, rotando de obra"""
+    tramos = []
+    dia = rnd.randint(0, min(60, dias - 1))
+    while dia < dias:
+        duracion = rnd.randint(60, 240)
+        tramos.append((dia, min(dia + duracion, dias) - 1, rnd.randint(1, obras)))
+        dia += duracion
+    return tramos
+
+
+def _fichada(rnd, personal_id, obra_id, fecha):
+    entrada = 7 * 60 + rnd.choice((0, 0, 0, 15, 30, 45, 60, 90))
+    salida = 16 * 60 + rnd.choice((0, 0, 30, 60, 60, 90, 120, 150))
+    fila = {'personal_id': personal_id, 'obra_id': obra_id, 'fecha': fecha,
+            'hora_ingreso': hora(entrada // 60, entrada % 60),
+            'hora_egreso': hora(salida // 60, salida % 60)}
+    if rnd.random() < 0.03:
+        # Fichadas sin egreso, como las que quedan abiertas en obra
+        fila['hora_egreso'] = None
+    calculadas = horas.calcular(fila['hora_ingreso'], fila['hora_egreso'])
+    del calculadas['cruza_medianoche']
+    fila.update(calculadas)
+    return fila
+
+
+def generar(empleados=2000, obras=50, dias=730, inicio=None, semilla=42):
+    """
+    Puebla la base activa con datos sintéticos y hace commit.
+    Devuelve un resumen con el rango de fechas y la cantidad de filas por tabla.
+    """
+    rnd = random.Random(semilla)
+    inicio = inicio or date.today() - timedelta(days=dias)
+    fin = inicio + timedelta(days=dias - 1)
+    lotes = _Lotes()
+
+    for o in range(1, obras + 1):
+        ciudad, _ = rnd.choice(CIUDADES)
+        comienzo = inicio - timedelta(days=rnd.randint(0, 365))
+        fin_estimado = comienzo + timedelta(days=rnd.randint(365, 1100))
+        lotes.agregar(Obra, {
+            'id': o,
+            'nombre': f'{rnd.choice(TIPOS_OBRA)} {ciudad} {o}',
+            'ubicacion': ciudad,
+            'fecha_inicio': comienzo.isoformat(),
+            'fecha_fin_estimada': fin_estimado.isoformat(),
+            'estado': 'activa' if fin_estimado > fin else 'finalizada',
+            'responsable': f'{rnd.choice(NOMBRES)} {rnd.choice(APELLIDOS)}',
+        })
+
+    tramos_de = {}
+    for p in range(1, empleados + 1):
+        ciudad, provincia = rnd.choice(CIUDADES)
+        tramos = tramos_de[p] = _tramos(rnd, dias, obras)
+        lotes.agregar(Personal, {
+            'id': p,
+            'nombre': rnd.choice(NOMBRES),
+            'apellido': rnd.choice(APELLIDOS),
+            'dni': str(20000000 + p),
+            'telefono': f'351{rnd.randint(4000000, 6999999)}',
+            'fecha_nacimiento': date(rnd.randint(1960, 2004), rnd.randint(1, 12),
+                                     rnd.randint(1, 28)).isoformat(),
+            'ciudad': ciudad,
+            'provincia': provincia,
+            'estado': 'activo' if tramos[-1][1] == dias - 1 else 'inactivo',
+            'fecha_ingreso': (inicio + timedelta(days=tramos[0][0])).isoformat(),
+        })
+    # Las tablas referenciadas van antes que las series (claves foráneas)
+    lotes.vaciar()
+
+    for p, tramos in tramos_de.items():
+        puesto, salario = rnd.choice(PUESTOS)
+        for numero, (desde, hasta, obra_id) in enumerate(tramos):
+            ultimo = numero == len(tramos) - 1
+            lotes.agregar(Asignacion, {
+                'personal_id': p,
+                'obra_id': obra_id,
+                'fecha_asignacion': inicio + timedelta(days=desde),
+                'fecha_fin': None if ultimo else inicio + timedelta(days=hasta),
+                'puesto': puesto,
+                'salario_diario': salario,
+                'estado': 'activa' if ultimo else 'finalizada',
+            })
+            # Aumento en cada cambio de obra
+            salario = round(salario * rnd.uniform(1.03, 1.10), -2)
+
+            for d in range(desde, hasta + 1):
+                fecha = inicio + timedelta(days=d)
+                if fecha.weekday() == 6:
+                    continue
+                tipo = rnd.choices(TIPOS_PRESENTISMO, weights=PESOS_TIPO)[0]
+                lotes.agregar(Presentismo, {'personal_id': p, 'obra_id': obra_id,
+                                            'fecha': fecha, 'tipo': tipo})
+                if tipo == 'presente':
+                    lotes.agregar(IngresoEgreso, _fichada(rnd, p, obra_id, fecha))
+
+    lotes.vaciar()
+    resumen_diario.reconstruir()
+    db.session.commit()
+    return {
+        'empleados': empleados,
+        'obras': obras,
+        'dias': dias,
+        'semilla': semilla,
+        'desde': inicio.isoformat(),
+        'hasta': fin.isoformat(),
+        'filas': lotes.totales,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--empleados', type=int, default=2000)
+    parser.add_argument('--obras', type=int, default=50)
+    parser.add_argument('--dias', type=int, default=730)
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--db', default='sqlite:///bench.db',
+                        help='URI de la base a poblar (debe estar vacía)')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.db})
+    with app.app_context():
+        if Personal.query.first():
+            print(f'❌ La base {args.db} ya tiene datos')
+            raise SystemExit(1)
+
+        inicio = time.perf_counter()
+        resumen = generar(args.empleados, args.obras, args.dias, semilla=args.semilla)
+        segundos = time.perf_counter() - inicio
+
+    print(f"✅ Datos generados en {segundos:.1f} s ({resumen['desde']} a {resumen['hasta']})")
+    for tabla, cantidad in resumen['filas'].items():
+        print(f'   {tabla}: {cantidad}')
+
+
+if __name__ == '__main__':
+    main()
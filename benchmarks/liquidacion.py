@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Benchmark del motor de liquidación.
+
+Genera en una base SQLite en memoria N empleados con asignaciones y un mes
+de presentismo y fichadas (benchmarks.datos), y mide calcular_liquidacion()
+sobre el período.
+
+Uso: python -m benchmarks.liquidacion [--empleados 500] [--dias 30] [--repeticiones 5]
+"""
+
+import argparse
+import statistics
+import time
+from datetime import date
+
+from app import create_app
+from servicios.liquidacion import calcular_liquidacion
+from benchmarks import datos
+
+OBJETIVO_SEGUNDOS = 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--empleados', type=int, default=500)
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    with app.app_context():
+        resumen = datos.generar(args.empleados, obras=10, dias=args.dias)
+        desde = date.fromisoformat(resumen['desde'])
+        hasta = date.fromisoformat(resumen['hasta'])
+
+        tiempos = []
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            filas = calcular_liquidacion(desde, hasta)
+            tiempos.append(time.perf_counter() - inicio)
+
+    mediana = statistics.median(tiempos)
+    print(f'{args.empleados} empleados x {args.dias} días -> {len(filas)} filas')
+    print(f'mediana {mediana * 1000:.1f} ms, máximo {max(tiempos) * 1000:.1f} ms')
+    if mediana >= OBJETIVO_SEGUNDOS:
+        print(f'⚠️  Supera el objetivo de {OBJETIVO_SEGUNDOS:.0f} s')
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Configuración de la base de datos a partir de variables de entorno.
+
+    DATABASE_URL              URI de SQLAlchemy (por defecto sqlite:///nomina.db,
+                              relativo a instance/). Acepta postgres:// de Heroku.
+    DB_POOL_SIZE              conexiones permanentes del pool (por defecto 10)
+    DB_MAX_OVERFLOW           conexiones extra en picos (por defecto 20)
+    DB_POOL_TIMEOUT           segundos de espera por una conexión libre (30)
+    DB_POOL_RECYCLE           segundos de vida de una conexión de servidor (1800)
+    MIGRAR_AL_INICIAR         1 para crear/migrar el esquema en create_app (por
+                              defecto). wsgi.py lo desactiva: en producción se
+                              migra con python migrar.py antes de levantar workers.
+
+Solo SQLite:
+    ARCHIVO_DB                archivo de la base histórica adjunta (por defecto
+                              <base>_archivo.db junto a la principal); ver
+                              servicios/archivo.py
+    SQLITE_AJUSTES            0 para usar SQLite sin WAL ni pragmas (por defecto 1)
+    SQLITE_BUSY_TIMEOUT_MS    espera ante un bloqueo antes de fallar (5000)
+    SQLITE_SYNCHRONOUS        NORMAL es seguro con WAL y mucho más rápido que FULL
+    SQLITE_CACHE_KIB          caché de páginas por conexión (65536 = 64 MiB)
+    SQLITE_MMAP_BYTES         lectura por memoria mapeada (268435456 = 256 MiB)
+"""
+
+import os
+import sys
+
+
+def _entero(entorno, nombre, por_defecto):
+    valor = entorno.get(nombre)
+    return int(valor) if valor not in (None, '') else por_defecto
+
+
+def configuracion(entorno=None):
+    """Claves de app.config para la base de datos"""
+    entorno = os.environ if entorno is None else entorno
+    uri = entorno.get('DATABASE_URL', 'sqlite:///nomina.db')
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+
+    return {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'MIGRAR_AL_INICIAR': entorno.get('MIGRAR_AL_INICIAR', '1') not in ('0', 'false', 'no'),
+        'DB_POOL_SIZE': _entero(entorno, 'DB_POOL_SIZE', 10),
+        'DB_MAX_OVERFLOW': _entero(entorno, 'DB_MAX_OVERFLOW', 20),
+        'DB_POOL_TIMEOUT': _entero(entorno, 'DB_POOL_TIMEOUT', 30),
+        'DB_POOL_RECYCLE': _entero(entorno, 'DB_POOL_RECYCLE', 1800),
+        'SQLITE_AJUSTES': entorno.get('SQLITE_AJUSTES', '1') not in ('0', 'false', 'no'),
+        'SQLITE_BUSY_TIMEOUT_MS': _entero(entorno, 'SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'SQLITE_SYNCHRONOUS': entorno.get('SQLITE_SYNCHRONOUS', 'NORMAL').upper(),
+        'SQLITE_CACHE_KIB': _entero(entorno, 'SQLITE_CACHE_KIB', 65536),
+        'SQLITE_MMAP_BYTES': _entero(entorno, 'SQLITE_MMAP_BYTES', 268435456),
+        'ARCHIVO_DB': entorno.get('ARCHIVO_DB') or None,
+    }
+
+
+def con_gevent(entorno=None):
+    """True en un worker gevent de gunicorn (o con threading ya parcheado por gevent)"""
+    entorno = os.environ if entorno is None else entorno
+    if entorno.get('WEB_WORKER_CLASS') == 'gevent':
+        return True
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('threading')
+
+
+def es_sqlite_en_memoria(uri):
+    return uri.startswith('sqlite') and (uri in ('sqlite://', 'sqlite:///:memory:')
+                                         or 'mode=memory' in uri)
+
+
+def opciones_motor(config):
+    """SQLALCHEMY_ENGINE_OPTIONS según el tipo de base configurada"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if es_sqlite_en_memoria(uri):
+        # Flask-SQLAlchemy usa un StaticPool de una sola conexión
+        return {}
+
+    opciones = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if uri.startswith('sqlite'):
+        # La espera ante bloqueos la maneja busy_timeout; el timeout del
+        # driver se alinea para que no corte antes
+        opciones['connect_args'] = {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}
+    else:
+        # Las conexiones a un servidor pueden cortarse por inactividad
+        opciones['pool_pre_ping'] = True
+        opciones['pool_recycle'] = config['DB_POOL_RECYCLE']
+    return opciones
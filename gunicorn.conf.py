@@ -0,0 +1,64 @@
+"""
+Configuración de gunicorn para el servidor de obra
+Uso: gunicorn -c gunicorn.conf.py wsgi:app
+
+Variables de entorno:
+    PORT              puerto (por defecto 8000)
+    WEB_CONCURRENCY   procesos worker (por defecto uno por núcleo)
+    WEB_THREADS       hilos por worker (por defecto 4)
+    WEB_WORKER_CLASS  gthread (por defecto) o gevent
+    WEB_CONEXIONES    conexiones simultáneas por worker con gevent (por defecto 200)
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Un proceso por núcleo y varios hilos por proceso: las esperas de la base
+# y de la red liberan el GIL, así cada worker atiende varios requests
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+
+# Con gevent cada conexión es una greenlet: los flujos de eventos en vivo
+# (/api/eventos) quedan esperando sin ocupar uno de los hilos del worker.
+# Con gthread cada flujo ocupa un hilo, así que se admite uno cada cuatro
+# hilos y el resto de las pantallas consulta los cambios periódicamente
+# (EVENTOS_MAXIMO_SUSCRIPTORES, servicios/eventos.py).
+# En ese modo los trabajos en segundo plano corren en trabajador.py:
+# TRABAJOS_HILOS pasa a 0 por defecto (servicios/trabajos.py), porque un
+# cálculo largo frenaría al resto.
+worker_connections = int(os.environ.get('WEB_CONEXIONES', 200))
+
+# La aplicación se importa una sola vez en el proceso maestro y los workers
+# la heredan con fork: el arranque de cada worker es casi inmediato. Con
+# gevent no: gunicorn aplica el monkey patching en cada worker después del
+# fork, y los locks e hilos creados al importar la aplicación en el maestro
+# quedarían sin parchear. Ahí cada worker carga la aplicación ya parcheado.
+preload_app = worker_class != 'gevent'
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Reinicio periódico de workers para acotar el crecimiento de memoria
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # Las conexiones abiertas en el maestro (verificación del esquema) no se
+    # comparten entre procesos: cada worker abre las suyas. Sin preload el
+    # maestro no abrió ninguna, y importar wsgi acá cargaría la aplicación
+    # antes del monkey patching de gevent
+    if not server.cfg.preload_app:
+        return
+    from app import db
+    from wsgi import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Script para importar personal (y sus asignaciones) desde un CSV o XLSX
+Uso: python importar.py archivo.csv [--simular] [--reporte errores.csv]
+
+Las columnas aceptadas se describen en servicios/importacion.py. Las filas
+con error no se importan y se listan en el reporte.
+"""
+
+import argparse
+import os
+import time
+
+from app import create_app, db
+from servicios import importacion
+
+def importar_archivo():
+    parser = argparse.ArgumentParser(description='Importar personal desde CSV o XLSX')
+    parser.add_argument('archivo')
+    parser.add_argument('--simular', action='store_true',
+                        help='solo validar, sin guardar nada')
+    parser.add_argument('--reporte', default=None,
+                        help='archivo del reporte de errores (por defecto <archivo>.errores.csv)')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archivo):
+        print(f"❌ No existe el archivo {args.archivo}")
+        raise SystemExit(1)
+
+    app = create_app()
+
+    with app.app_context():
+        inicio = time.perf_counter()
+        try:
+            with open(args.archivo, 'rb') as flujo:
+                resumen, errores = importacion.importar(
+                    importacion.leer(flujo, args.archivo), simular=args.simular
+                )
+            if args.simular:
+                db.session.rollback()
+            else:
+                db.session.commit()
+        except importacion.ArchivoInvalido as e:
+            db.session.rollback()
+            print(f"❌ {str(e)}")
+            raise SystemExit(1)
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error al importar: {str(e)}")
+            raise SystemExit(1)
+        duracion = time.perf_counter() - inicio
+
+        accion = "validadas" if args.simular else "importadas"
+        print(f"\n✅ {resumen['filas']} filas {accion} en {duracion:.1f} s")
+        print(f"   Personal nuevo: {resumen['personal_creado']}")
+        print(f"   Asignaciones: {resumen['asignaciones_creadas']}")
+
+        if errores:
+            reporte = args.reporte or f"{os.path.splitext(args.archivo)[0]}.errores.csv"
+            with open(reporte, 'w', encoding='utf-8', newline='') as destino:
+                importacion.reporte_csv(errores, destino)
+            print(f"   ❌ Filas con error: {len(errores)} (detalle en {reporte})\n")
+            raise SystemExit(2)
+        print()
+
+if __name__ == '__main__':
+    importar_archivo()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Script para crear o migrar el esquema de la base de datos
+Uso: python migrar.py
+
+En producción los workers no migran al iniciar (ver wsgi.py): este comando
+se corre una vez antes de cada despliegue.
+"""
+
+from app import create_app
+from models.migraciones import preparar_base_datos, VERSION_ACTUAL
+
+def migrar():
+    app = create_app({'MIGRAR_AL_INICIAR': False, 'VERIFICAR_ESQUEMA': False})
+    
+    with app.app_context():
+        try:
+            aplicadas = preparar_base_datos()
+        except Exception as e:
+            print(f"❌ Error al migrar la base: {str(e)}")
+            raise SystemExit(1)
+        
+        if aplicadas:
+            print(f"✅ Migraciones aplicadas: {', '.join(map(str, aplicadas))}")
+        else:
+            print(f"✅ La base ya está en la versión {VERSION_ACTUAL}")
+
+if __name__ == '__main__':
+    migrar()
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from servicios.fechas import formatear
 
 class Personal(db.Model):
     __tablename__ = 'personal'
@@ -69,8 +70,8 @@ class Asignacion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     personal_id = db.Column(db.Integer, db.ForeignKey('personal.id'), nullable=False)
     obra_id = db.Column(db.Integer, db.ForeignKey('obras.id'), nullable=False)
-    fecha_asignacion = db.Column(db.String(10), nullable=False)
-    fecha_fin = db.Column(db.String(10))
+    fecha_asignacion = db.Column(db.Date, nullable=False)
+    fecha_fin = db.Column(db.Date)
     puesto = db.Column(db.String(100))
     salario_diario = db.Column(db.Float)
     estado = db.Column(db.String(20), default='activa')
@@ -79,6 +80,10 @@ class Asignacion(db.Model):
     personal = db.relationship('Personal', backref='asignaciones')
     obra = db.relationship('Obra', backref='asignaciones')
     
+    __table_args__ = (
+        db.Index('ix_asignaciones_personal_fecha', 'personal_id', 'fecha_asignacion'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -87,21 +92,32 @@ class Asignacion(db.Model):
             'personal_nombre': self.personal.nombre,
             'personal_apellido': self.personal.apellido,
             'obra_nombre': self.obra.nombre,
-            'fecha_asignacion': self.fecha_asignacion,
-            'fecha_fin': self.fecha_fin,
+            'fecha_asignacion': formatear(self.fecha_asignacion),
+            'fecha_fin': formatear(self.fecha_fin),
             'puesto': self.puesto,
             'salario_diario': self.salario_diario,
             'estado': self.estado
         }
 
 
+# Tipos de presentismo que acepta la API (mismo orden que el formulario)
+TIPOS_PRESENTISMO = (
+    'presente',
+    'ausente_justificado',
+    'ausente_sin_aviso',
+    'art',
+    'vacacion',
+    'franco',
+)
+
+
 class Presentismo(db.Model):
     __tablename__ = 'presentismo'
     
     id = db.Column(db.Integer, primary_key=True)
     personal_id = db.Column(db.Integer, db.ForeignKey('personal.id'), nullable=False)
     obra_id = db.Column(db.Integer, db.ForeignKey('obras.id'), nullable=False)
-    fecha = db.Column(db.String(10), nullable=False)
+    fecha = db.Column(db.Date, nullable=False)
     tipo = db.Column(db.String(50), nullable=False)
     descripcion = db.Column(db.Text)
     notas = db.Column(db.Text)
@@ -110,7 +126,11 @@ class Presentismo(db.Model):
     personal = db.relationship('Personal', backref='presentismo')
     obra = db.relationship('Obra', backref='presentismo')
     
-    __table_args__ = (db.UniqueConstraint('personal_id', 'obra_id', 'fecha', name='uq_presentismo'),)
+    __table_args__ = (
+        db.UniqueConstraint('personal_id', 'obra_id', 'fecha', name='uq_presentismo'),
+        db.Index('ix_presentismo_obra_fecha', 'obra_id', 'fecha'),
+        db.Index('ix_presentismo_personal_fecha', 'personal_id', 'fecha'),
+    )
     
     def to_dict(self):
         return {
@@ -120,7 +140,7 @@ class Presentismo(db.Model):
             'personal_nombre': self.personal.nombre,
             'personal_apellido': self.personal.apellido,
             'obra_nombre': self.obra.nombre,
-            'fecha': self.fecha,
+            'fecha': formatear(self.fecha),
             'tipo': self.tipo,
             'descripcion': self.descripcion,
             'notas': self.notas
@@ -133,16 +153,24 @@ class IngresoEgreso(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     personal_id = db.Column(db.Integer, db.ForeignKey('personal.id'), nullable=False)
     obra_id = db.Column(db.Integer, db.ForeignKey('obras.id'), nullable=False)
-    fecha = db.Column(db.String(10), nullable=False)
-    hora_ingreso = db.Column(db.String(5))
-    hora_egreso = db.Column(db.String(5))
+    fecha = db.Column(db.Date, nullable=False)
+    hora_ingreso = db.Column(db.Time)
+    hora_egreso = db.Column(db.Time)
+    # Calculadas en el servidor a partir de las horas (servicios/horas.py)
     horas_trabajadas = db.Column(db.Float)
+    horas_nocturnas = db.Column(db.Float)
+    horas_extra = db.Column(db.Float)
     notas = db.Column(db.Text)
     fecha_creacion = db.Column(db.DateTime, default=datetime.now)
     
     personal = db.relationship('Personal', backref='ingresos_egresos')
     obra = db.relationship('Obra', backref='ingresos_egresos')
     
+    __table_args__ = (
+        db.Index('ix_ingresos_egresos_obra_fecha', 'obra_id', 'fecha'),
+        db.Index('ix_ingresos_egresos_personal_fecha', 'personal_id', 'fecha'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -151,9 +179,45 @@ class IngresoEgreso(db.Model):
             'personal_nombre': self.personal.nombre,
             'personal_apellido': self.personal.apellido,
             'obra_nombre': self.obra.nombre,
-            'fecha': self.fecha,
-            'hora_ingreso': self.hora_ingreso,
-            'hora_egreso': self.hora_egreso,
+            'fecha': formatear(self.fecha),
+            'hora_ingreso': formatear(self.hora_ingreso),
+            'hora_egreso': formatear(self.hora_egreso),
             'horas_trabajadas': self.horas_trabajadas,
+            'horas_nocturnas': self.horas_nocturnas,
+            'horas_extra': self.horas_extra,
             'notas': self.notas
         }
+
+
+class ResumenDiario(db.Model):
+    """Totales diarios por obra, mantenidos al escribir presentismo y fichadas"""
+    __tablename__ = 'resumen_diario'
+    
+    obra_id = db.Column(db.Integer, db.ForeignKey('obras.id'), primary_key=True)
+    fecha = db.Column(db.Date, primary_key=True)
+    # Un contador por cada tipo de TIPOS_PRESENTISMO
+    presente = db.Column(db.Integer, nullable=False, default=0)
+    ausente_justificado = db.Column(db.Integer, nullable=False, default=0)
+    ausente_sin_aviso = db.Column(db.Integer, nullable=False, default=0)
+    art = db.Column(db.Integer, nullable=False, default=0)
+    vacacion = db.Column(db.Integer, nullable=False, default=0)
+    franco = db.Column(db.Integer, nullable=False, default=0)
+    # Empleados con presentismo cargado en el día
+    dotacion = db.Column(db.Integer, nullable=False, default=0)
+    registros_ingreso = db.Column(db.Integer, nullable=False, default=0)
+    horas_totales = db.Column(db.Float, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'obra_id': self.obra_id,
+            'fecha': formatear(self.fecha),
+            'presente': self.presente,
+            'ausente_justificado': self.ausente_justificado,
+            'ausente_sin_aviso': self.ausente_sin_aviso,
+            'art': self.art,
+            'vacacion': self.vacacion,
+            'franco': self.franco,
+            'dotacion': self.dotacion,
+            'registros_ingreso': self.registros_ingreso,
+            'horas_totales': self.horas_totales
+        }
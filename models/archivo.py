@@ -0,0 +1,26 @@
+from app import db
+from datetime import datetime
+from servicios.fechas import formatear
+
+
+class PeriodoArchivado(db.Model):
+    """Mes de una tabla de series que se movió a la base de archivo"""
+    __tablename__ = 'periodos_archivados'
+
+    tabla = db.Column(db.String(50), primary_key=True)
+    mes = db.Column(db.Date, primary_key=True)  # primer día del mes
+    filas = db.Column(db.Integer, nullable=False)
+    suma = db.Column(db.String(64), nullable=False)  # SHA-256 de las filas, ordenadas por id
+    fecha_archivado = db.Column(db.DateTime, default=datetime.now)
+
+    def to_dict(self):
+        return {
+            'tabla': self.tabla,
+            'mes': self.mes.strftime('%Y-%m'),
+            'filas': self.filas,
+            'suma': self.suma,
+            'fecha_archivado': formatear(self.fecha_archivado),
+        }
+
+    def __repr__(self):
+        return f'<PeriodoArchivado {self.tabla} {self.mes:%Y-%m}>'
@@ -0,0 +1,298 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada migración recibe una conexión abierta dentro de una transacción y debe
+poder ejecutarse sobre una base que ya tenga el esquema nuevo (idempotente).
+La versión aplicada se guarda en la tabla versiones_esquema.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import bindparam, inspect, select, text
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+
+
+class VersionEsquema(db.Model):
+    __tablename__ = 'versiones_esquema'
+
+    version = db.Column(db.Integer, primary_key=True)
+    descripcion = db.Column(db.String(200))
+    fecha_aplicacion = db.Column(db.DateTime, default=datetime.now)
+
+
+def _crear_indice(conexion, nombre, tabla, columnas):
+    conexion.execute(text(
+        f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({", ".join(columnas)})'
+    ))
+
+
+def _migracion_1(conexion):
+    """Fechas y horas nativas e índices compuestos en las tablas de series"""
+    if conexion.dialect.name == 'sqlite':
+        # En SQLite las fechas ya se guardaban como 'YYYY-MM-DD'; solo hay
+        # que limpiar vacíos y completar los segundos de las horas 'HH:MM'
+        conexion.execute(text(
+            "UPDATE asignaciones SET fecha_fin = NULL WHERE fecha_fin = ''"
+        ))
+        for columna in ('hora_ingreso', 'hora_egreso'):
+            conexion.execute(text(
+                f"UPDATE ingresos_egresos SET {columna} = NULL WHERE {columna} = ''"
+            ))
+            conexion.execute(text(
+                f"UPDATE ingresos_egresos SET {columna} = {columna} || :segundos "
+                f"WHERE length({columna}) = 5"
+            ), {'segundos': ':00'})
+
+    for tabla in ('presentismo', 'ingresos_egresos'):
+        _crear_indice(conexion, f'ix_{tabla}_obra_fecha', tabla, ('obra_id', 'fecha'))
+        _crear_indice(conexion, f'ix_{tabla}_personal_fecha', tabla, ('personal_id', 'fecha'))
+
+
+def _migracion_2(conexion):
+    """Índice para buscar la asignación vigente de un empleado en una fecha"""
+    _crear_indice(conexion, 'ix_asignaciones_personal_fecha', 'asignaciones',
+                  ('personal_id', 'fecha_asignacion'))
+
+
+def _migracion_3(conexion):
+    """Tabla resumen_diario con los totales históricos"""
+    from models import ResumenDiario, TIPOS_PRESENTISMO
+
+    ResumenDiario.__table__.create(conexion, checkfirst=True)
+    conexion.execute(text('DELETE FROM resumen_diario'))
+
+    tipos = ', '.join(TIPOS_PRESENTISMO)
+    contadores = ', '.join(
+        f"SUM(CASE WHEN tipo = '{tipo}' THEN 1 ELSE 0 END)" for tipo in TIPOS_PRESENTISMO
+    )
+    conexion.execute(text(
+        f'INSERT INTO resumen_diario (obra_id, fecha, {tipos}, dotacion, '
+        f'registros_ingreso, horas_totales) '
+        f'SELECT obra_id, fecha, {contadores}, COUNT(*), 0, 0 '
+        f'FROM presentismo GROUP BY obra_id, fecha'
+    ))
+    ceros = ', '.join('0' for _ in TIPOS_PRESENTISMO)
+    # El WHERE 1 = 1 es necesario: sin WHERE, SQLite toma el ON de ON CONFLICT
+    # como condición de un join del FROM y falla el parseo (ver "upsert" en
+    # la documentación de SQLite). No sacarlo.
+    conexion.execute(text(
+        f'INSERT INTO resumen_diario (obra_id, fecha, {tipos}, dotacion, '
+        f'registros_ingreso, horas_totales) '
+        f'SELECT obra_id, fecha, {ceros}, 0, COUNT(*), COALESCE(SUM(horas_trabajadas), 0) '
+        f'FROM ingresos_egresos WHERE 1 = 1 GROUP BY obra_id, fecha '
+        f'ON CONFLICT (obra_id, fecha) DO UPDATE SET '
+        f'registros_ingreso = excluded.registros_ingreso, '
+        f'horas_totales = excluded.horas_totales'
+    ))
+
+
+def _migracion_4(conexion):
+    """Registro de cambios y operaciones de sincronización"""
+    from models.sincronizacion import RegistroCambio, OperacionSync
+
+    RegistroCambio.__table__.create(conexion, checkfirst=True)
+    OperacionSync.__table__.create(conexion, checkfirst=True)
+
+
+def _migracion_5(conexion):
+    """Horas nocturnas y extra calculadas en el servidor para las fichadas"""
+    from servicios import horas
+
+    columnas = {c['name'] for c in inspect(conexion).get_columns('ingresos_egresos')}
+    for columna in ('horas_nocturnas', 'horas_extra'):
+        if columna not in columnas:
+            conexion.execute(text(f'ALTER TABLE ingresos_egresos ADD COLUMN {columna} FLOAT'))
+
+    # Las fichadas completas se recalculan; los turnos imposibles (egreso
+    # igual al ingreso o más de MAXIMO_TURNO_HORAS) conservan lo cargado
+    from models import IngresoEgreso
+
+    tabla = IngresoEgreso.__table__
+    filas = conexion.execute(select(
+        tabla.c.id, tabla.c.hora_ingreso, tabla.c.hora_egreso, tabla.c.horas_trabajadas
+    )).all()
+    calculadas = []
+    for id_, ingreso, egreso, cargadas in filas:
+        try:
+            if ingreso is None and egreso is None:
+                valores = horas.horas_manuales(cargadas)
+            else:
+                valores = horas.calcular(ingreso, egreso)
+                del valores['cruza_medianoche']
+        except horas.TurnoInvalido:
+            valores = {'horas_trabajadas': cargadas, 'horas_nocturnas': None,
+                       'horas_extra': None}
+        calculadas.append({'id_fichada': id_, **valores})
+    if calculadas:
+        conexion.execute(
+            tabla.update().where(tabla.c.id == bindparam('id_fichada')),
+            calculadas
+        )
+
+    # Los totales de horas del resumen se rehacen con los valores nuevos
+    conexion.execute(text(
+        'UPDATE resumen_diario SET horas_totales = COALESCE(('
+        'SELECT SUM(i.horas_trabajadas) FROM ingresos_egresos i '
+        'WHERE i.obra_id = resumen_diario.obra_id AND i.fecha = resumen_diario.fecha), 0)'
+    ))
+
+
+def _migracion_6(conexion):
+    """Índice para la última versión de los cambios de una obra"""
+    _crear_indice(conexion, 'ix_registro_cambios_tabla_obra_version', 'registro_cambios',
+                  ('tabla', 'obra_id', 'version'))
+
+
+def _migracion_7(conexion):
+    """Índice de búsqueda de texto sobre personal (FTS5, solo SQLite)"""
+    from servicios import busqueda
+
+    busqueda.crear_indice(conexion)
+
+
+def _migracion_8(conexion):
+    """Cola de trabajos en segundo plano"""
+    from models.trabajos import Trabajo
+
+    Trabajo.__table__.create(conexion, checkfirst=True)
+
+
+def _migracion_9(conexion):
+    """Períodos de presentismo y fichadas movidos al archivo histórico"""
+    from models.archivo import PeriodoArchivado
+
+    PeriodoArchivado.__table__.create(conexion, checkfirst=True)
+
+
+def _migracion_10(conexion):
+    """Claves de idempotencia de la sincronización únicas por usuario"""
+    from models.sincronizacion import OperacionSync
+
+    inspector = inspect(conexion)
+    primaria = inspector.get_pk_constraint('operaciones_sync')
+    if 'usuario_id' in primaria['constrained_columns']:
+        return
+    # Una operación sin usuario no se puede volver a pedir por la API
+    conexion.execute(text('DELETE FROM operaciones_sync WHERE usuario_id IS NULL'))
+    if conexion.dialect.name == 'sqlite':
+        # SQLite no permite cambiar la clave primaria: se rehace la tabla
+        conexion.execute(text('ALTER TABLE operaciones_sync RENAME TO operaciones_sync_anterior'))
+        OperacionSync.__table__.create(conexion)
+        conexion.execute(text(
+            'INSERT INTO operaciones_sync (usuario_id, clave, resultado, fecha_aplicacion) '
+            'SELECT usuario_id, clave, resultado, fecha_aplicacion FROM operaciones_sync_anterior'
+        ))
+        conexion.execute(text('DROP TABLE operaciones_sync_anterior'))
+    else:
+        conexion.execute(text('ALTER TABLE operaciones_sync ALTER COLUMN usuario_id SET NOT NULL'))
+        conexion.execute(text(f"ALTER TABLE operaciones_sync DROP CONSTRAINT {primaria['name']}"))
+        conexion.execute(text('ALTER TABLE operaciones_sync ADD PRIMARY KEY (usuario_id, clave)'))
+
+
+def _migracion_11(conexion):
+    """Versiones de registro_cambios sin reutilizar y fila de secuencia_cambios"""
+    from models.sincronizacion import RegistroCambio, SecuenciaCambios
+
+    SecuenciaCambios.__table__.create(conexion, checkfirst=True)
+    if conexion.dialect.name != 'sqlite':
+        return
+    definicion = conexion.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'registro_cambios'"
+    )).scalar()
+    if 'AUTOINCREMENT' in definicion.upper():
+        return
+    # AUTOINCREMENT solo se puede declarar al crear la tabla. Los índices
+    # se borran antes porque sus nombres pasarían a la tabla renombrada
+    for indice in RegistroCambio.__table__.indexes:
+        conexion.execute(text(f'DROP INDEX IF EXISTS {indice.name}'))
+    conexion.execute(text('ALTER TABLE registro_cambios RENAME TO registro_cambios_anterior'))
+    RegistroCambio.__table__.create(conexion)
+    conexion.execute(text(
+        'INSERT INTO registro_cambios (version, tabla, registro_id, operacion, obra_id, fecha) '
+        'SELECT version, tabla, registro_id, operacion, obra_id, fecha '
+        'FROM registro_cambios_anterior ORDER BY version'
+    ))
+    conexion.execute(text('DROP TABLE registro_cambios_anterior'))
+
+
+MIGRACIONES = [
+    (1, _migracion_1),
+    (2, _migracion_2),
+    (3, _migracion_3),
+    (4, _migracion_4),
+    (5, _migracion_5),
+    (6, _migracion_6),
+    (7, _migracion_7),
+    (8, _migracion_8),
+    (9, _migracion_9),
+    (10, _migracion_10),
+    (11, _migracion_11),
+]
+
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+
+def version_aplicada(conexion):
+    filas = conexion.execute(text('SELECT MAX(version) FROM versiones_esquema'))
+    return filas.scalar() or 0
+
+
+def preparar_base_datos():
+    """
+    Crea el esquema en una base nueva o migra una existente a la última
+    versión. Devuelve la lista de versiones aplicadas.
+    """
+    inspector = inspect(db.engine)
+    base_nueva = not inspector.has_table('personal')
+    aplicadas = []
+
+    with db.engine.begin() as conexion:
+        VersionEsquema.__table__.create(conexion, checkfirst=True)
+
+        if base_nueva:
+            db.metadata.create_all(conexion)
+            actual = VERSION_ACTUAL
+            conexion.execute(VersionEsquema.__table__.insert().values(
+                version=VERSION_ACTUAL, descripcion='Esquema inicial',
+                fecha_aplicacion=datetime.now()
+            ))
+        else:
+            actual = version_aplicada(conexion)
+
+        for version, migracion in MIGRACIONES:
+            if version <= actual:
+                continue
+            migracion(conexion)
+            conexion.execute(VersionEsquema.__table__.insert().values(
+                version=version, descripcion=migracion.__doc__,
+                fecha_aplicacion=datetime.now()
+            ))
+            aplicadas.append(version)
+
+        # Tablas agregadas al modelo que todavía no existan
+        db.metadata.create_all(conexion)
+
+    return aplicadas
+
+
+class EsquemaDesactualizado(RuntimeError):
+    """La base no está migrada a la versión que espera el código"""
+
+
+def verificar_esquema():
+    """
+    Chequeo barato para procesos que no migran al iniciar (workers de
+    producción): una sola consulta a versiones_esquema.
+    """
+    try:
+        with db.engine.connect() as conexion:
+            version = version_aplicada(conexion)
+    except DBAPIError:
+        version = 0
+    if version < VERSION_ACTUAL:
+        raise EsquemaDesactualizado(
+            f'La base está en la versión {version} y se necesita la {VERSION_ACTUAL}: '
+            f'ejecute python migrar.py'
+        )
@@ -0,0 +1,52 @@
+from datetime import datetime
+from sqlalchemy import DDL, event
+from app import db
+
+class RegistroCambio(db.Model):
+    """Bitácora de altas, modificaciones y bajas; version es creciente y no se reutiliza"""
+    __tablename__ = 'registro_cambios'
+    
+    version = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    tabla = db.Column(db.String(50), nullable=False)
+    registro_id = db.Column(db.Integer, nullable=False)
+    operacion = db.Column(db.String(20), nullable=False)  # 'alta', 'modificacion' o 'baja'
+    obra_id = db.Column(db.Integer)
+    fecha = db.Column(db.DateTime, default=datetime.now)
+    
+    __table_args__ = (
+        db.Index('ix_registro_cambios_tabla_version', 'tabla', 'version'),
+        db.Index('ix_registro_cambios_tabla_obra_version', 'tabla', 'obra_id', 'version'),
+        # Sin AUTOINCREMENT, SQLite vuelve a usar la versión más alta si se borra
+        {'sqlite_autoincrement': True},
+    )
+    
+    def __repr__(self):
+        return f'<RegistroCambio {self.version} {self.tabla}:{self.registro_id} {self.operacion}>'
+
+
+class SecuenciaCambios(db.Model):
+    """
+    Una sola fila. En bases de servidor las transacciones que registran
+    cambios la bloquean hasta el commit (ver servicios/cambios.py)
+    """
+    __tablename__ = 'secuencia_cambios'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+
+
+event.listen(SecuenciaCambios.__table__, 'after_create',
+             DDL('INSERT INTO secuencia_cambios (id) VALUES (1)'))
+
+
+class OperacionSync(db.Model):
+    """Operaciones ya aplicadas desde dispositivos, por usuario y clave de idempotencia"""
+    __tablename__ = 'operaciones_sync'
+    
+    # Las claves las genera cada dispositivo: solo son únicas por usuario
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), primary_key=True)
+    clave = db.Column(db.String(64), primary_key=True)
+    resultado = db.Column(db.Text, nullable=False)  # JSON devuelto al dispositivo
+    fecha_aplicacion = db.Column(db.DateTime, default=datetime.now)
+    
+    def __repr__(self):
+        return f'<OperacionSync {self.usuario_id}:{self.clave}>'
@@ -0,0 +1,49 @@
+from app import db
+from datetime import datetime
+from servicios.fechas import formatear
+
+ESTADOS_TRABAJO = ('pendiente', 'en_curso', 'terminado', 'error', 'cancelado')
+
+
+class Trabajo(db.Model):
+    """Reporte o exportación que se calcula en segundo plano"""
+    __tablename__ = 'trabajos'
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.Text, nullable=False)  # JSON
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    progreso = db.Column(db.Float, nullable=False, default=0.0)  # de 0 a 1
+    mensaje = db.Column(db.String(200))
+    archivo = db.Column(db.String(200))  # nombre del resultado dentro de instance/trabajos
+    tipo_contenido = db.Column(db.String(100))
+    error = db.Column(db.Text)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    proceso = db.Column(db.String(100))  # host:pid del que lo está ejecutando
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha_creacion = db.Column(db.DateTime, default=datetime.now)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_actualizacion = db.Column(db.DateTime)  # latido mientras está en curso
+    fecha_fin = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_trabajos_estado_id', 'estado', 'id'),
+        db.Index('ix_trabajos_usuario_id', 'usuario_id', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'progreso': round(self.progreso or 0.0, 3),
+            'mensaje': self.mensaje,
+            'error': self.error,
+            'intentos': self.intentos,
+            'fecha_creacion': formatear(self.fecha_creacion),
+            'fecha_inicio': formatear(self.fecha_inicio),
+            'fecha_fin': formatear(self.fecha_fin),
+        }
+
+    def __repr__(self):
+        return f'<Trabajo {self.id} {self.tipo} {self.estado}>'
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Script para reconstruir la tabla resumen_diario desde presentismo e ingresos/egresos
+Uso: python reconstruir_resumen.py [--obra ID] [--desde YYYY-MM-DD] [--hasta YYYY-MM-DD]
+"""
+
+import argparse
+from app import create_app, db
+from servicios.fechas import parsear_fecha
+from servicios import resumen_diario
+
+def reconstruir():
+    parser = argparse.ArgumentParser(description='Reconstruye el resumen diario de asistencia')
+    parser.add_argument('--obra', type=int, help='Solo la obra indicada')
+    parser.add_argument('--desde', type=parsear_fecha, help='Fecha inicial (YYYY-MM-DD)')
+    parser.add_argument('--hasta', type=parsear_fecha, help='Fecha final (YYYY-MM-DD)')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            filas = resumen_diario.reconstruir(obra_id=args.obra, fecha_inicio=args.desde,
+                                               fecha_fin=args.hasta)
+            db.session.commit()
+            print(f"✅ Resumen reconstruido: {filas} filas (obra, día)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error al reconstruir el resumen: {str(e)}")
+
+if __name__ == '__main__':
+    reconstruir()
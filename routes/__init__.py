@@ -1,8 +1,25 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, Response, stream_with_context, send_file, current_app
 from flask_login import login_required, current_user
 from models import Personal, Obra, Asignacion, Presentismo, IngresoEgreso
+from servicios.listados import listar, filtrar, ParametroInvalido
+from servicios.exportacion import exportar, FORMATOS
+from servicios.serializacion import tablas_consultadas
+from servicios.fechas import parsear_fecha
+from servicios import resumen_diario, matriz_presentismo
+from servicios.lote_presentismo import registrar_lote
+from servicios import asistencia, cambios, busqueda, vigencias, trabajos, tablero, eventos, archivo, columnar
+# importacion (openpyxl), liquidacion y fragmentos (plantillas de filas) se
+# importan en las rutas que los usan, para no cargarlos al iniciar el worker
+from servicios.asistencia import DatosInvalidos
+from servicios.sincronizacion import aplicar_operaciones, LoteInvalido, TABLAS_REFERENCIA, TABLAS_DESCARGABLES
+from models.trabajos import Trabajo
 from app import db
+from sqlalchemy.exc import IntegrityError
+from datetime import date
 from functools import wraps
+import os
+import re
+import time
 
 def admin_required(f):
     """Decorador para requerir rol de admin"""
@@ -13,6 +30,82 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# json, columnar o html (filas renderizadas, ver servicios/fragmentos.py)
+FORMATOS_LISTADO = columnar.FORMATOS + ('html',)
+
+def _es_admin():
+    return current_user.is_authenticated and current_user.es_admin()
+
+def _listado(modelo, delta=False):
+    """
+    Responde una página del listado con el cursor siguiente en un header.
+    
+    Si el cliente manda If-None-Match con el ETag vigente responde 304 sin
+    consultar la tabla. Con delta=True acepta ?since=<version> y devuelve
+    solo los registros que cambiaron desde esa versión. Con
+    ?format=columnar la página se devuelve en formato columnar y con
+    ?format=html como filas de tabla renderizadas.
+    """
+    formato = request.args.get('format', 'json')
+    if formato not in FORMATOS_LISTADO:
+        return jsonify({'error': f"Formato no soportado: {formato}. "
+                                 f"Válidos: {', '.join(FORMATOS_LISTADO)}"}), 400
+    tablas = tablas_consultadas(modelo)
+    etag, version = cambios.etiqueta(tablas, request.query_string)
+    es_admin = formato == 'html' and _es_admin()
+    if es_admin:
+        # Las filas de los administradores incluyen los botones de edición
+        etag += '-admin'
+    if request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+    elif delta and 'since' in request.args:
+        since = request.args.get('since', type=int)
+        limite = request.args.get('limit', 500, type=int)
+        if since is None or since < 0 or limite is None or limite < 1:
+            return jsonify({'error': 'since y limit deben ser números enteros positivos'}), 400
+        lista, version, hay_mas = cambios.cambios_desde(since, tablas, limite=min(limite, 1000))
+        respuesta = jsonify(lista)
+        if hay_mas:
+            respuesta.headers['X-Hay-Mas'] = 'true'
+    else:
+        try:
+            if formato == 'html':
+                from servicios import fragmentos
+                html, siguiente = fragmentos.renderizar(modelo, request.args, version, es_admin)
+                respuesta = Response(html, mimetype='text/html')
+            else:
+                filas, siguiente = listar(modelo, request.args)
+                respuesta = jsonify(columnar.codificar(filas) if formato == 'columnar' else filas)
+        except ParametroInvalido as e:
+            return jsonify({'error': str(e)}), 400
+        if siguiente:
+            respuesta.headers['X-Siguiente-Cursor'] = siguiente
+    
+    respuesta.set_etag(etag, weak=True)
+    # El navegador guarda la respuesta pero revalida siempre con el ETag
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    respuesta.headers['X-Version'] = str(version)
+    return respuesta
+
+def _exportacion(modelo, nombre):
+    """Exporta en streaming el listado filtrado, en NDJSON o CSV"""
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return jsonify({'error': f'Formato no soportado: {formato}'}), 400
+    try:
+        query = filtrar(modelo, request.args).order_by(modelo.fecha, modelo.id)
+    except ParametroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    desde = re.sub(r'[^0-9-]', '', request.args.get('fecha_inicio', '')) or 'inicio'
+    hasta = re.sub(r'[^0-9-]', '', request.args.get('fecha_fin', '')) or 'hoy'
+    archivo = f'{nombre}_{desde}_{hasta}.{formato}'
+    return Response(
+        stream_with_context(exportar(query, modelo, formato)),
+        mimetype=FORMATOS[formato],
+        headers={'Content-Disposition': f'attachment; filename="{archivo}"'}
+    )
+
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
@@ -24,38 +117,48 @@ def index():
 @main_bp.route('/dashboard')
 @login_required
 def dashboard():
-    total_personal = Personal.query.count()
-    total_obras = Obra.query.count()
-    total_asignaciones = Asignacion.query.count()
+    # El resto de las métricas las pide la página a /api/tablero
+    totales = tablero.obtener(['totales'])['totales']
     return render_template('dashboard.html', 
-                         total_personal=total_personal,
-                         total_obras=total_obras,
-                         total_asignaciones=total_asignaciones)
+                         total_personal=totales['personal']['total'],
+                         total_obras=totales['obras']['total'],
+                         total_asignaciones=totales['asignaciones']['total'],
+                         asignaciones_vigentes=totales['asignaciones']['vigentes'])
 
 @main_bp.route('/personal')
 @login_required
 def personal_page():
-    return render_template('personal.html')
+    from servicios import fragmentos
+    tabla = fragmentos.primera_pagina(Personal, _es_admin())
+    return render_template('personal.html', tabla=tabla)
 
 @main_bp.route('/obras')
 @login_required
 def obras_page():
-    return render_template('obras.html')
+    from servicios import fragmentos
+    tabla = fragmentos.primera_pagina(Obra, _es_admin())
+    return render_template('obras.html', tabla=tabla)
 
 @main_bp.route('/asignaciones')
 @login_required
 def asignaciones_page():
-    return render_template('asignaciones.html')
+    from servicios import fragmentos
+    tabla = fragmentos.primera_pagina(Asignacion, _es_admin(), sort='-fecha')
+    return render_template('asignaciones.html', tabla=tabla)
 
 @main_bp.route('/presentismo')
 @login_required
 def presentismo_page():
-    return render_template('presentismo.html')
+    from servicios import fragmentos
+    tabla = fragmentos.primera_pagina(Presentismo, _es_admin(), sort='-fecha')
+    return render_template('presentismo.html', tabla=tabla)
 
 @main_bp.route('/ingresos-egresos')
 @login_required
 def ingresos_egresos_page():
-    return render_template('ingresos_egresos.html')
+    from servicios import fragmentos
+    tabla = fragmentos.primera_pagina(IngresoEgreso, _es_admin(), sort='-fecha')
+    return render_template('ingresos_egresos.html', tabla=tabla)
 
 
 personal_bp = Blueprint('personal', __name__, url_prefix='/api/personal')
@@ -63,11 +166,20 @@ personal_bp = Blueprint('personal', __name__, url_prefix='/api/personal')
 @personal_bp.route('', methods=['GET'])
 def get_personal():
     try:
-        personal = Personal.query.all()
-        return jsonify([p.to_dict() for p in personal])
+        return _listado(Personal, delta=True)
     except Exception as e:
         return jsonify({'error': f'Error al obtener personal: {str(e)}'}), 500
 
+@personal_bp.route('/buscar', methods=['GET'])
+def buscar_personal():
+    """Búsqueda por prefijo para selectores (?q=&limit=&estado=)"""
+    resultados = busqueda.buscar_personal(
+        request.args.get('q', ''),
+        limite=request.args.get('limit', 20, type=int),
+        estado=request.args.get('estado')
+    )
+    return jsonify(resultados)
+
 @personal_bp.route('', methods=['POST'])
 @admin_required
 def crear_personal():
@@ -99,6 +211,51 @@ def crear_personal():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@personal_bp.route('/importar', methods=['POST'])
+@admin_required
+def importar_personal():
+    """
+    Importa un CSV o XLSX (campo 'archivo'). Con simular=1 solo valida.
+    Si hay filas rechazadas, la respuesta trae la URL del reporte de errores.
+    """
+    from servicios import importacion
+    archivo = request.files.get('archivo')
+    if archivo is None or not archivo.filename:
+        return jsonify({'error': 'Falta el archivo a importar'}), 400
+    simular = request.form.get('simular', request.args.get('simular', '')).lower() in ('1', 'true', 'si')
+    
+    try:
+        resumen, errores = importacion.importar(
+            importacion.leer(archivo.stream, archivo.filename), simular=simular
+        )
+    except importacion.ArchivoInvalido as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    if simular:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    
+    resumen['reporte'] = None
+    if errores:
+        identificador = importacion.guardar_reporte(errores, _carpeta_reportes())
+        resumen['reporte'] = url_for('personal.reporte_importacion', identificador=identificador)
+    return jsonify(resumen), 200 if simular else 201
+
+@personal_bp.route('/importar/<identificador>/errores', methods=['GET'])
+@admin_required
+def reporte_importacion(identificador):
+    from servicios import importacion
+    ruta = importacion.ruta_reporte(_carpeta_reportes(), identificador)
+    if ruta is None:
+        return jsonify({'error': 'No encontrado'}), 404
+    return send_file(ruta, mimetype='text/csv', as_attachment=True,
+                     download_name=f'errores-importacion-{identificador[:8]}.csv')
+
+def _carpeta_reportes():
+    from servicios import importacion
+    return os.path.join(current_app.instance_path, importacion.CARPETA_REPORTES)
+
 @personal_bp.route('/<int:id>', methods=['GET'])
 def get_personal_id(id):
     personal = Personal.query.get(id)
@@ -146,8 +303,7 @@ obras_bp = Blueprint('obras', __name__, url_prefix='/api/obras')
 
 @obras_bp.route('', methods=['GET'])
 def get_obras():
-    obras = Obra.query.all()
-    return jsonify([o.to_dict() for o in obras])
+    return _listado(Obra, delta=True)
 
 @obras_bp.route('', methods=['POST'])
 @admin_required
@@ -207,20 +363,62 @@ asignaciones_bp = Blueprint('asignaciones', __name__, url_prefix='/api/asignacio
 
 @asignaciones_bp.route('', methods=['GET'])
 def get_asignaciones():
-    asignaciones = Asignacion.query.all()
-    return jsonify([a.to_dict() for a in asignaciones])
+    return _listado(Asignacion)
+
+@asignaciones_bp.route('/vigentes', methods=['GET'])
+def get_asignaciones_vigentes():
+    """Quién está en qué obra en una fecha (?fecha=, por defecto hoy; obra_id o personal_id)"""
+    try:
+        fecha = parsear_fecha(request.args.get('fecha')) or date.today()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    obra_id = request.args.get('obra_id', type=int)
+    personal_id = request.args.get('personal_id', type=int)
+    
+    vigencias.indice.actualizar()
+    if personal_id is not None:
+        vigencia = vigencias.indice.vigente(personal_id, fecha, obra_id)
+        lista = [vigencia] if vigencia else []
+    else:
+        lista = sorted(vigencias.indice.en_fecha(fecha, obra_id), key=lambda v: v.personal_id)
+    return jsonify([vigencias.a_dict(v) for v in lista])
+
+def _verificar_vigencia(asignacion):
+    """Valida el rango de fechas y que no se cruce con otra asignación del empleado"""
+    if not asignacion.fecha_asignacion:
+        raise ValueError('fecha_asignacion es requerida')
+    if asignacion.fecha_fin and asignacion.fecha_fin < asignacion.fecha_asignacion:
+        raise ValueError('fecha_fin debe ser posterior a fecha_asignacion')
+    # Sin autoflush: la consulta no debe ver la propia asignación a medio editar
+    with db.session.no_autoflush:
+        vigencias.verificar(asignacion.personal_id, asignacion.fecha_asignacion,
+                            asignacion.fecha_fin, excluir_id=asignacion.id)
 
 @asignaciones_bp.route('', methods=['POST'])
 @admin_required
 def crear_asignacion():
     data = request.json
+    try:
+        fecha_asignacion = parsear_fecha(data['fecha_asignacion'])
+        fecha_fin = parsear_fecha(data.get('fecha_fin'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     nueva = Asignacion(
         personal_id=data['personal_id'],
         obra_id=data['obra_id'],
-        fecha_asignacion=data['fecha_asignacion'],
+        fecha_asignacion=fecha_asignacion,
+        fecha_fin=fecha_fin,
         puesto=data.get('puesto'),
         salario_diario=data.get('salario_diario')
     )
+    try:
+        _verificar_vigencia(nueva)
+    except vigencias.AsignacionSuperpuesta as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'asignacion_id': e.existente.id}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     db.session.add(nueva)
     db.session.commit()
     return jsonify({'id': nueva.id, 'mensaje': 'Asignación creada'}), 201
@@ -244,9 +442,21 @@ def actualizar_asignacion(id):
     asignacion.obra_id = data.get('obra_id', asignacion.obra_id)
     asignacion.puesto = data.get('puesto', asignacion.puesto)
     asignacion.salario_diario = data.get('salario_diario', asignacion.salario_diario)
-    asignacion.fecha_asignacion = data.get('fecha_asignacion', asignacion.fecha_asignacion)
-    asignacion.fecha_fin = data.get('fecha_fin', asignacion.fecha_fin)
+    try:
+        asignacion.fecha_asignacion = parsear_fecha(data.get('fecha_asignacion', asignacion.fecha_asignacion))
+        asignacion.fecha_fin = parsear_fecha(data.get('fecha_fin', asignacion.fecha_fin))
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     asignacion.estado = data.get('estado', asignacion.estado)
+    try:
+        _verificar_vigencia(asignacion)
+    except vigencias.AsignacionSuperpuesta as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'asignacion_id': e.existente.id}), 409
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     
     db.session.commit()
     return jsonify({'mensaje': 'Actualizado'})
@@ -267,34 +477,104 @@ presentismo_bp = Blueprint('presentismo', __name__, url_prefix='/api/presentismo
 
 @presentismo_bp.route('', methods=['GET'])
 def get_presentismo():
-    obra_id = request.args.get('obra_id')
-    fecha_inicio = request.args.get('fecha_inicio')
-    fecha_fin = request.args.get('fecha_fin')
-    
-    query = Presentismo.query
-    if obra_id:
-        query = query.filter_by(obra_id=obra_id)
-    if fecha_inicio and fecha_fin:
-        query = query.filter(Presentismo.fecha.between(fecha_inicio, fecha_fin))
+    return _listado(Presentismo)
+
+@presentismo_bp.route('/exportar', methods=['GET'])
+@login_required
+def exportar_presentismo():
+    return _exportacion(Presentismo, 'presentismo')
+
+@presentismo_bp.route('/resumen', methods=['GET'])
+def get_resumen_presentismo():
+    """Totales por obra y día leídos de resumen_diario"""
+    try:
+        fecha_inicio = parsear_fecha(request.args.get('fecha_inicio'))
+        fecha_fin = parsear_fecha(request.args.get('fecha_fin'))
+        en_columnas = columnar.solicitado(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    obra_id = request.args.get('obra_id', type=int)
+    filas = [f.to_dict() for f in resumen_diario.consultar(obra_id, fecha_inicio, fecha_fin)]
+    return jsonify(columnar.codificar(filas) if en_columnas else filas)
+
+@presentismo_bp.route('/matriz', methods=['GET'])
+def get_matriz_presentismo():
+    """Empleados por días de una obra en un mes (?obra_id=&mes=YYYY-MM)"""
+    obra_id = request.args.get('obra_id', type=int)
+    if obra_id is None:
+        return jsonify({'error': 'obra_id es requerido'}), 400
+    try:
+        inicio, fin = matriz_presentismo.parsear_mes(request.args.get('mes') or date.today().strftime('%Y-%m'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    presentismo = query.all()
-    return jsonify([p.to_dict() for p in presentismo])
+    version = matriz_presentismo.version(obra_id)
+    etag = f'm{version[0]}-{version[1]}-{inicio:%Y%m}'
+    if request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+    else:
+        respuesta = jsonify(matriz_presentismo.obtener(obra_id, inicio, fin, version))
+    respuesta.set_etag(etag, weak=True)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
 
 @presentismo_bp.route('', methods=['POST'])
 def crear_presentismo():
     data = request.json
-    nuevo = Presentismo(
-        personal_id=data['personal_id'],
-        obra_id=data['obra_id'],
-        fecha=data['fecha'],
-        tipo=data['tipo'],
-        descripcion=data.get('descripcion'),
-        notas=data.get('notas')
-    )
-    db.session.add(nuevo)
+    try:
+        nuevo = asistencia.crear_presentismo(data)
+    except DatosInvalidos as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     db.session.commit()
     return jsonify({'id': nuevo.id, 'mensaje': 'Presentismo registrado'}), 201
 
+@presentismo_bp.route('/lote', methods=['POST'])
+def crear_presentismo_lote():
+    """Registra el presentismo de una cuadrilla completa en una transacción"""
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No se recibieron datos'}), 400
+    
+    try:
+        fecha = parsear_fecha(data.get('fecha'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    obra = Obra.query.get(data.get('obra_id')) if data.get('obra_id') else None
+    if not obra or not fecha:
+        return jsonify({'error': 'obra_id y fecha son requeridos'}), 400
+    registros = data.get('registros')
+    if not isinstance(registros, list) or not registros:
+        return jsonify({'error': 'registros debe ser una lista no vacía'}), 400
+    try:
+        archivo.verificar_abierta('presentismo', fecha)
+    except archivo.PeriodoCerrado as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        resultados = registrar_lote(obra.id, fecha, registros)
+        db.session.commit()
+    except DatosInvalidos as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except IntegrityError:
+        # Un empleado o la obra se borró entre la validación y el insert
+        db.session.rollback()
+        return jsonify({'error': 'El personal o la obra cambiaron mientras se registraba '
+                                 'el lote; vuelva a intentarlo'}), 409
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    return jsonify({
+        'obra_id': obra.id,
+        'fecha': fecha.isoformat(),
+        'resultados': resultados,
+        'creados': sum(1 for r in resultados if r['estado'] == 'creado'),
+        'actualizados': sum(1 for r in resultados if r['estado'] == 'actualizado'),
+        'errores': sum(1 for r in resultados if r['estado'] == 'error')
+    })
+
 @presentismo_bp.route('/<int:id>', methods=['PUT'])
 def actualizar_presentismo(id):
     presentismo = Presentismo.query.get(id)
@@ -302,9 +582,11 @@ def actualizar_presentismo(id):
         return jsonify({'error': 'No encontrado'}), 404
     
     data = request.json
-    presentismo.tipo = data.get('tipo', presentismo.tipo)
-    presentismo.descripcion = data.get('descripcion', presentismo.descripcion)
-    presentismo.notas = data.get('notas', presentismo.notas)
+    try:
+        asistencia.modificar_presentismo(presentismo, data)
+    except DatosInvalidos as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     
     db.session.commit()
     return jsonify({'mensaje': 'Actualizado'})
@@ -315,7 +597,7 @@ def eliminar_presentismo(id):
     if not presentismo:
         return jsonify({'error': 'No encontrado'}), 404
     
-    db.session.delete(presentismo)
+    asistencia.eliminar_presentismo(presentismo)
     db.session.commit()
     return jsonify({'mensaje': 'Eliminado'})
 
@@ -324,32 +606,21 @@ ingresos_egresos_bp = Blueprint('ingresos_egresos', __name__, url_prefix='/api/i
 
 @ingresos_egresos_bp.route('', methods=['GET'])
 def get_ingresos_egresos():
-    obra_id = request.args.get('obra_id')
-    fecha_inicio = request.args.get('fecha_inicio')
-    fecha_fin = request.args.get('fecha_fin')
-    
-    query = IngresoEgreso.query
-    if obra_id:
-        query = query.filter_by(obra_id=obra_id)
-    if fecha_inicio and fecha_fin:
-        query = query.filter(IngresoEgreso.fecha.between(fecha_inicio, fecha_fin))
-    
-    registros = query.all()
-    return jsonify([r.to_dict() for r in registros])
+    return _listado(IngresoEgreso)
+
+@ingresos_egresos_bp.route('/exportar', methods=['GET'])
+@login_required
+def exportar_ingresos_egresos():
+    return _exportacion(IngresoEgreso, 'ingresos_egresos')
 
 @ingresos_egresos_bp.route('', methods=['POST'])
 def crear_ingreso_egreso():
     data = request.json
-    nuevo = IngresoEgreso(
-        personal_id=data['personal_id'],
-        obra_id=data['obra_id'],
-        fecha=data['fecha'],
-        hora_ingreso=data.get('hora_ingreso'),
-        hora_egreso=data.get('hora_egreso'),
-        horas_trabajadas=data.get('horas_trabajadas'),
-        notas=data.get('notas')
-    )
-    db.session.add(nuevo)
+    try:
+        nuevo = asistencia.crear_ingreso_egreso(data)
+    except DatosInvalidos as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     db.session.commit()
     return jsonify({'id': nuevo.id, 'mensaje': 'Registro creado'}), 201
 
@@ -360,10 +631,11 @@ def actualizar_ingreso_egreso(id):
         return jsonify({'error': 'No encontrado'}), 404
     
     data = request.json
-    registro.hora_ingreso = data.get('hora_ingreso', registro.hora_ingreso)
-    registro.hora_egreso = data.get('hora_egreso', registro.hora_egreso)
-    registro.horas_trabajadas = data.get('horas_trabajadas', registro.horas_trabajadas)
-    registro.notas = data.get('notas', registro.notas)
+    try:
+        asistencia.modificar_ingreso_egreso(registro, data)
+    except DatosInvalidos as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
     
     db.session.commit()
     return jsonify({'mensaje': 'Actualizado'})
@@ -374,9 +646,261 @@ def eliminar_ingreso_egreso(id):
     if not registro:
         return jsonify({'error': 'No encontrado'}), 404
     
-    db.session.delete(registro)
+    asistencia.eliminar_ingreso_egreso(registro)
+    db.session.commit()
+    return jsonify({'mensaje': 'Eliminado'})
+
+
+liquidacion_bp = Blueprint('liquidacion', __name__, url_prefix='/api/liquidacion')
+
+def _periodo_liquidacion():
+    """(fecha_inicio, fecha_fin, obra_id, personal_id) o lanza ValueError"""
+    fecha_inicio = parsear_fecha(request.args.get('fecha_inicio'))
+    fecha_fin = parsear_fecha(request.args.get('fecha_fin'))
+    if not fecha_inicio or not fecha_fin:
+        raise ValueError('fecha_inicio y fecha_fin son requeridas')
+    if fecha_inicio > fecha_fin:
+        raise ValueError('fecha_inicio debe ser anterior a fecha_fin')
+    return (fecha_inicio, fecha_fin,
+            request.args.get('obra_id', type=int), request.args.get('personal_id', type=int))
+
+@liquidacion_bp.route('', methods=['GET'])
+@admin_required
+def get_liquidacion():
+    from servicios.liquidacion import calcular_liquidacion, totalizar
+    try:
+        fecha_inicio, fecha_fin, obra_id, personal_id = _periodo_liquidacion()
+        en_columnas = columnar.solicitado(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    filas = calcular_liquidacion(fecha_inicio, fecha_fin, obra_id=obra_id, personal_id=personal_id)
+    return jsonify({
+        'fecha_inicio': fecha_inicio.isoformat(),
+        'fecha_fin': fecha_fin.isoformat(),
+        'items': columnar.codificar(filas) if en_columnas else filas,
+        'totales': totalizar(filas)
+    })
+
+@liquidacion_bp.route('/detalle', methods=['GET'])
+@admin_required
+def get_detalle_liquidacion():
+    """Cada día de presentismo del período con su asignación y salario vigentes"""
+    from servicios.liquidacion import detalle_dias
+    try:
+        fecha_inicio, fecha_fin, obra_id, personal_id = _periodo_liquidacion()
+        en_columnas = columnar.solicitado(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    filas = detalle_dias(fecha_inicio, fecha_fin, obra_id=obra_id, personal_id=personal_id)
+    return jsonify(columnar.codificar(filas) if en_columnas else filas)
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+@sync_bp.route('', methods=['POST'])
+@login_required
+def subir_operaciones():
+    data = request.get_json(silent=True) or {}
+    try:
+        resultados = aplicar_operaciones(data.get('operaciones'), current_user.id)
+        db.session.commit()
+    except LoteInvalido as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception:
+        # Nada del lote queda aplicado: el dispositivo conserva su cola y reintenta
+        db.session.rollback()
+        raise
+    return jsonify({'resultados': resultados, 'version': cambios.version_actual()})
+
+@sync_bp.route('', methods=['GET'])
+@login_required
+def bajar_cambios():
+    since = request.args.get('since', 0, type=int)
+    obra_id = request.args.get('obra_id', type=int)
+    limite = min(max(request.args.get('limit', 500, type=int), 1), 1000)
+    tablas = [t for t in request.args.get('tablas', '').split(',') if t] or list(TABLAS_REFERENCIA)
+    invalidas = [t for t in tablas if t not in TABLAS_DESCARGABLES]
+    if invalidas:
+        return jsonify({'error': f"Tablas no sincronizables: {', '.join(invalidas)}"}), 400
+    
+    if since <= 0:
+        # Primera sincronización: la versión se toma antes de leer las tablas, así
+        # lo que cambie mientras tanto vuelve a llegar en el próximo delta. De las
+        # series (presentismo, fichadas) solo se siguen los cambios desde ahora.
+        version = cambios.version_actual(tablas)
+        return jsonify({
+            'version': version,
+            'instantanea': {tabla: cambios.instantanea(tabla)
+                            for tabla in tablas if tabla in TABLAS_REFERENCIA},
+            'cambios': [],
+            'hay_mas': False
+        })
+    
+    lista, version, hay_mas = cambios.cambios_desde(since, tablas, obra_id=obra_id, limite=limite)
+    return jsonify({'version': version, 'cambios': lista, 'hay_mas': hay_mas})
+
+trabajos_bp = Blueprint('trabajos', __name__, url_prefix='/api/trabajos')
+
+def _trabajo_dict(trabajo):
+    datos = trabajo.to_dict()
+    datos['url'] = url_for('trabajos.get_trabajo', id=trabajo.id)
+    datos['resultado'] = (url_for('trabajos.get_resultado_trabajo', id=trabajo.id)
+                          if trabajo.estado == 'terminado' else None)
+    return datos
+
+def _trabajo_propio(id):
+    """El trabajo si existe y es del usuario actual (o el usuario es admin)"""
+    trabajo = db.session.get(Trabajo, id)
+    if trabajo is None or (trabajo.usuario_id != current_user.id and not current_user.es_admin()):
+        return None
+    return trabajo
+
+@trabajos_bp.route('', methods=['POST'])
+@login_required
+def crear_trabajo():
+    """Encola un reporte o exportación: {"tipo": ..., "parametros": {...}}"""
+    data = request.get_json(silent=True) or {}
+    tipo = trabajos.TIPOS.get(data.get('tipo'))
+    if tipo is not None and tipo.solo_admin and not current_user.es_admin():
+        return jsonify({'error': 'Acceso denegado. Se requieren permisos de administrador.'}), 403
+    try:
+        trabajo = trabajos.encolar(data.get('tipo'), data.get('parametros') or {},
+                                   usuario_id=current_user.id)
+    except DatosInvalidos as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
+    
+    trabajos.despachador.iniciar(current_app._get_current_object())
+    trabajos.despachador.avisar()
+    respuesta = jsonify(_trabajo_dict(trabajo))
+    respuesta.status_code = 202
+    respuesta.headers['Location'] = url_for('trabajos.get_trabajo', id=trabajo.id)
+    return respuesta
+
+@trabajos_bp.route('', methods=['GET'])
+@login_required
+def get_trabajos():
+    """Últimos trabajos del usuario"""
+    consulta = Trabajo.query.filter_by(usuario_id=current_user.id)
+    lista = consulta.order_by(Trabajo.id.desc()).limit(50).all()
+    return jsonify([_trabajo_dict(t) for t in lista])
+
+@trabajos_bp.route('/<int:id>', methods=['GET'])
+@login_required
+def get_trabajo(id):
+    trabajo = _trabajo_propio(id)
+    if trabajo is None:
+        return jsonify({'error': 'No encontrado'}), 404
+    if trabajo.estado == 'pendiente':
+        # Si el proceso que lo encoló se reinició, este lo toma
+        trabajos.despachador.iniciar(current_app._get_current_object())
+    respuesta = jsonify(_trabajo_dict(trabajo))
+    if trabajo.estado not in trabajos.TERMINADOS:
+        respuesta.headers['Retry-After'] = '2'
+    return respuesta
+
+@trabajos_bp.route('/<int:id>/resultado', methods=['GET'])
+@login_required
+def get_resultado_trabajo(id):
+    trabajo = _trabajo_propio(id)
+    if trabajo is None:
+        return jsonify({'error': 'No encontrado'}), 404
+    ruta = trabajos.ruta_resultado(trabajo)
+    if ruta is None:
+        return jsonify({'error': f'El trabajo está {trabajo.estado}', 'estado': trabajo.estado}), 409
+    return send_file(ruta, mimetype=trabajo.tipo_contenido, as_attachment=True,
+                     download_name=f'{trabajo.tipo}-{trabajo.id}{os.path.splitext(ruta)[1]}')
+
+@trabajos_bp.route('/<int:id>', methods=['DELETE'])
+@login_required
+def eliminar_trabajo(id):
+    """Cancela un trabajo pendiente o en curso; uno terminado se borra con su archivo"""
+    trabajo = _trabajo_propio(id)
+    if trabajo is None:
+        return jsonify({'error': 'No encontrado'}), 404
+    if trabajos.cancelar(trabajo):
+        db.session.commit()
+        return jsonify({'mensaje': 'Cancelado'})
+    ruta = trabajos.ruta_resultado(trabajo)
+    db.session.delete(trabajo)
     db.session.commit()
+    if ruta:
+        os.remove(ruta)
     return jsonify({'mensaje': 'Eliminado'})
 
+tablero_bp = Blueprint('tablero', __name__, url_prefix='/api/tablero')
+
+@tablero_bp.route('', methods=['GET'])
+@login_required
+def get_tablero():
+    """Métricas del dashboard (?metricas=totales,dotacion_hoy,...; todas por defecto)"""
+    try:
+        nombres = tablero.parsear_metricas(request.args.get('metricas'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    hoy = date.today()
+    versiones = tablero.version(nombres)
+    # El tramo de VIGENCIA hace que el ETag cambie aunque no haya cambios registrados
+    tramo = int(time.time() // tablero.VIGENCIA)
+    etag = f"t{max(versiones.values())}-{hoy:%Y%m%d}-{tramo}-{'.'.join(nombres)}"
+    if request.if_none_match.contains_weak(etag):
+        respuesta = Response(status=304)
+    else:
+        respuesta = jsonify({'fecha': hoy.isoformat(),
+                             'metricas': tablero.obtener(nombres, hoy, versiones)})
+    respuesta.set_etag(etag, weak=True)
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+eventos_bp = Blueprint('eventos', __name__, url_prefix='/api/eventos')
+
+@eventos_bp.route('', methods=['GET'])
+@login_required
+def get_eventos():
+    """
+    Flujo text/event-stream con las altas, modificaciones y bajas de
+    presentismo y fichadas (?obra_id=&tablas=presentismo,ingresos_egresos).
+    Reanuda desde el header Last-Event-ID o ?desde=<versión>.
+    """
+    obra_id = request.args.get('obra_id', type=int)
+    tablas = [t for t in request.args.get('tablas', '').split(',') if t] or list(eventos.TABLAS_EVENTOS)
+    invalidas = [t for t in tablas if t not in eventos.TABLAS_EVENTOS]
+    if invalidas:
+        return jsonify({'error': f"Tablas sin eventos: {', '.join(invalidas)}"}), 400
+    desde = request.headers.get('Last-Event-ID') or request.args.get('desde')
+    try:
+        desde = int(desde) if desde else None
+    except ValueError:
+        return jsonify({'error': 'La versión desde la que se reanuda debe ser un número entero'}), 400
+    
+    try:
+        suscripcion = eventos.difusor.suscribir(current_app._get_current_object(), obra_id, tablas)
+    except eventos.DifusorSaturado:
+        respuesta = jsonify({'error': 'Demasiadas conexiones en vivo, reintente en unos segundos'})
+        respuesta.status_code = 503
+        respuesta.headers['Retry-After'] = '30'
+        return respuesta
+    try:
+        previos = eventos.reenvio(suscripcion, desde)
+    except Exception:
+        eventos.difusor.desuscribir(suscripcion)
+        raise
+    
+    # Sin stream_with_context: el flujo no usa la base y la sesión del
+    # request se libera antes de empezar a esperar eventos
+    respuesta = Response(
+        eventos.flujo(suscripcion, previos, current_app.config['EVENTOS_LATIDO'],
+                      current_app.config['EVENTOS_DURACION']),
+        mimetype='text/event-stream'
+    )
+    respuesta.call_on_close(lambda: eventos.difusor.desuscribir(suscripcion))
+    respuesta.headers['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule el flujo antes de mandarlo
+    respuesta.headers['X-Accel-Buffering'] = 'no'
+    return respuesta
+
 from routes.auth import auth_bp
 from routes.admin import admin_bp
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, jsonify, redirect, url_fo
 from flask_login import login_required, current_user
 from app import db
 from models.usuario import Usuario
+from servicios.perfilado import estadisticas
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -117,3 +118,26 @@ def crear_usuario():
             return redirect(url_for('admin.crear_usuario'))
     
     return render_template('admin/crear_usuario.html')
+
+@admin_bp.route('/metricas', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def metricas():
+    """Percentiles por endpoint, requests lentos y perfiles de este proceso"""
+    if request.method == 'POST':
+        estadisticas.reiniciar()
+        flash('Métricas reiniciadas', 'success')
+        return redirect(url_for('admin.metricas'))
+    
+    resumen = estadisticas.resumen()
+    if request.args.get('formato') == 'json':
+        return jsonify({
+            'desde': estadisticas.desde.isoformat(timespec='seconds'),
+            'endpoints': resumen,
+            'lentos': [{**l, 'fecha': l['fecha'].isoformat(timespec='seconds')}
+                       for l in estadisticas.lentos],
+        })
+    return render_template('admin/metricas.html', resumen=resumen,
+                           lentos=list(estadisticas.lentos),
+                           perfiles=list(estadisticas.perfiles),
+                           desde=estadisticas.desde)
@@ -0,0 +1,271 @@
+"""
+Archivo histórico de presentismo e ingresos/egresos (separación caliente/frío).
+
+Los meses cerrados se mueven a una segunda base SQLite (ARCHIVO_DB) que se
+adjunta a cada conexión con el nombre 'archivo' y tiene las mismas tablas.
+Las tablas de la base principal quedan con el período abierto, así las
+altas, las verificaciones del día y los listados de fechas recientes no
+recorren el historial.
+
+periodos_archivados, en la base principal, indica hasta qué fecha está
+archivada cada tabla (el corte): lo que tiene fecha <= corte se lee del
+archivo y lo posterior de la tabla caliente. Los reportes que pueden tocar
+meses archivados pasan su consulta por adaptar(), que reemplaza la tabla
+por la unión de las dos partes. En los períodos archivados no se admiten
+altas.
+
+Archivar un mes son dos transacciones, cada una sobre una sola base (en
+modo WAL SQLite no garantiza que un commit sobre bases adjuntas sea
+atómico): primero se copian las filas al archivo; después, en la base
+principal, se compara la copia con el original, se registra el período
+(lo que mueve el corte) y se borran las filas calientes. Si el proceso se
+corta en el medio, lo copiado queda después del corte, no se lee, y la
+siguiente corrida lo reemplaza. Las filas que salen de la tabla caliente
+se anotan como bajas en registro_cambios, en la misma transacción que el
+borrado: cambian la versión y el ETag de los listados, y los dispositivos
+las quitan de su copia en el siguiente delta.
+"""
+
+import calendar
+import hashlib
+import os
+from datetime import timedelta
+
+from flask import current_app
+from sqlalchemy import Column, Index, MetaData, Table, delete, event, func, insert, select, union_all
+from sqlalchemy.sql.util import ClauseAdapter
+
+from app import db
+from models import Presentismo, IngresoEgreso
+from models.archivo import PeriodoArchivado
+from servicios import cambios
+
+ESQUEMA = 'archivo'
+
+TABLAS = {modelo.__tablename__: modelo for modelo in (Presentismo, IngresoEgreso)}
+
+
+class PeriodoCerrado(ValueError):
+    """La fecha pertenece a un período archivado"""
+
+
+class ArchivoNoDisponible(RuntimeError):
+    """La base no es SQLite o no tiene el archivo adjunto"""
+
+
+class CopiaInconsistente(RuntimeError):
+    """Las filas copiadas al archivo no coinciden con las de la tabla caliente"""
+
+
+def _tabla_fria(caliente, metadata):
+    # Mismas columnas, sin claves foráneas ni restricciones: las referencias
+    # a personal y obras no pueden cruzar de base
+    tabla = Table(caliente.name, metadata,
+                  *(Column(c.name, c.type, primary_key=c.primary_key) for c in caliente.c))
+    Index(f'ix_{caliente.name}_obra_fecha', tabla.c.obra_id, tabla.c.fecha)
+    Index(f'ix_{caliente.name}_personal_fecha', tabla.c.personal_id, tabla.c.fecha)
+    Index(f'ix_{caliente.name}_fecha', tabla.c.fecha)
+    return tabla
+
+
+_metadata = MetaData(schema=ESQUEMA)
+_FRIAS = {nombre: _tabla_fria(modelo.__table__, _metadata) for nombre, modelo in TABLAS.items()}
+
+
+def _ultimo_dia(mes):
+    return mes.replace(day=calendar.monthrange(mes.year, mes.month)[1])
+
+
+def _mes_siguiente(mes):
+    return _ultimo_dia(mes) + timedelta(days=1)
+
+
+def disponible():
+    return current_app.config.get('ARCHIVO_DB') is not None
+
+
+def corte(tabla):
+    """Última fecha archivada de la tabla, o None si no hay nada archivado"""
+    mes = db.session.execute(
+        select(func.max(PeriodoArchivado.mes)).where(PeriodoArchivado.tabla == tabla)
+    ).scalar()
+    return _ultimo_dia(mes) if mes else None
+
+
+def verificar_abierta(tabla, fecha):
+    """Lanza PeriodoCerrado si la fecha ya está archivada"""
+    hasta = corte(tabla)
+    if hasta is not None and fecha <= hasta:
+        raise PeriodoCerrado(
+            f'El período hasta el {hasta.isoformat()} está archivado y no admite cambios'
+        )
+
+
+def historico(modelo, hasta):
+    """Filas de la tabla caliente posteriores a hasta más las archivadas hasta esa fecha"""
+    caliente = modelo.__table__
+    fria = _FRIAS[caliente.name]
+    return union_all(
+        select(caliente).where(caliente.c.fecha > hasta),
+        select(*fria.c).where(fria.c.fecha <= hasta),
+    ).subquery(f'{caliente.name}_historico')
+
+
+def adaptar(consulta, *modelos, fecha_inicio=None):
+    """
+    Devuelve la consulta leyendo también del archivo las tablas de los
+    modelos indicados, si tienen meses archivados desde fecha_inicio (o en
+    cualquier fecha, si no se indica). Si no, la devuelve sin cambios.
+    """
+    for modelo in modelos:
+        if modelo.__tablename__ not in TABLAS:
+            continue
+        hasta = corte(modelo.__tablename__)
+        if hasta is None or (fecha_inicio is not None and fecha_inicio > hasta):
+            continue
+        # La unión deriva de la tabla caliente: el adaptador reemplaza la
+        # tabla y sus columnas en el FROM, el WHERE y las subconsultas
+        consulta = ClauseAdapter(historico(modelo, hasta)).traverse(consulta)
+    return consulta
+
+
+# ------------------------------------------------------------ archivado
+
+def _resumen(consulta):
+    """(filas, SHA-256) de una consulta ordenada por id"""
+    suma = hashlib.sha256()
+    filas = 0
+    for fila in db.session.execute(consulta.execution_options(yield_per=5000)):
+        suma.update(repr(tuple(fila)).encode())
+        filas += 1
+    return filas, suma.hexdigest()
+
+
+def preparar():
+    """Crea las tablas del archivo si faltan. Hace commit."""
+    if not disponible():
+        raise ArchivoNoDisponible('El archivo histórico solo está disponible con SQLite')
+    if current_app.config.get('SQLITE_AJUSTES', True):
+        # El modo del journal no se puede cambiar dentro de una transacción
+        conexion = db.engine.raw_connection()
+        try:
+            conexion.driver_connection.execute(f'PRAGMA {ESQUEMA}.journal_mode=WAL')
+        finally:
+            conexion.close()
+    _metadata.create_all(db.session.connection(), checkfirst=True)
+    db.session.commit()
+
+
+def meses_pendientes(tabla, hasta):
+    """Primeros días de los meses con filas calientes desde el corte hasta el mes de hasta"""
+    anterior = corte(tabla)
+    if anterior is not None:
+        mes = anterior + timedelta(days=1)
+    else:
+        primera = db.session.execute(select(func.min(TABLAS[tabla].fecha))).scalar()
+        if primera is None:
+            return []
+        mes = primera.replace(day=1)
+    meses = []
+    while mes <= hasta:
+        meses.append(mes)
+        mes = _mes_siguiente(mes)
+    return meses
+
+
+def archivar_mes(tabla, mes):
+    """
+    Mueve un mes de la tabla al archivo. Debe ser el mes siguiente al corte.
+    Hace commit (dos veces, ver el comentario del módulo).
+    """
+    caliente = TABLAS[tabla].__table__
+    fria = _FRIAS[tabla]
+    fin = _ultimo_dia(mes)
+
+    # 1) Copia: solo escribe en el archivo. Primero se descarta lo que haya
+    # quedado de una corrida interrumpida
+    db.session.execute(delete(fria).where(fria.c.fecha.between(mes, fin)))
+    db.session.execute(insert(fria).from_select(
+        [c.name for c in caliente.c],
+        select(caliente).where(caliente.c.fecha.between(mes, fin)),
+    ))
+    db.session.commit()
+
+    # 2) Corte: solo escribe en la principal. El registro del período se
+    # inserta primero para tomar el lock de escritura antes de comparar, así
+    # nadie modifica el mes entre la comparación y el borrado
+    periodo = PeriodoArchivado(tabla=tabla, mes=mes, filas=0, suma='')
+    db.session.add(periodo)
+    db.session.flush()
+    original = _resumen(select(caliente).where(caliente.c.fecha.between(mes, fin))
+                        .order_by(caliente.c.id))
+    copia = _resumen(select(*fria.c).where(fria.c.fecha.between(mes, fin))
+                     .order_by(fria.c.id))
+    if original != copia:
+        db.session.rollback()
+        raise CopiaInconsistente(
+            f'{tabla} {mes:%Y-%m}: {original[0]} filas calientes y {copia[0]} en el archivo '
+            f'no coinciden; el mes sigue sin archivar'
+        )
+    periodo.filas, periodo.suma = original
+    cambios.registrar_bajas(tabla, select(caliente.c.id, caliente.c.obra_id)
+                            .where(caliente.c.fecha.between(mes, fin)))
+    db.session.execute(delete(caliente).where(caliente.c.fecha.between(mes, fin)))
+    db.session.commit()
+    return periodo
+
+
+def verificar():
+    """
+    Compara cada período archivado con lo guardado en el archivo y busca
+    filas calientes en fechas archivadas. Devuelve (períodos revisados, problemas).
+    """
+    problemas = []
+    periodos = PeriodoArchivado.query.order_by(PeriodoArchivado.tabla,
+                                               PeriodoArchivado.mes).all()
+    for periodo in periodos:
+        fria = _FRIAS[periodo.tabla]
+        filas, suma = _resumen(
+            select(*fria.c).where(fria.c.fecha.between(periodo.mes, _ultimo_dia(periodo.mes)))
+            .order_by(fria.c.id)
+        )
+        if (filas, suma) != (periodo.filas, periodo.suma):
+            problemas.append(f'{periodo.tabla} {periodo.mes:%Y-%m}: el archivo tiene {filas} '
+                             f'filas y se archivaron {periodo.filas}, o el contenido cambió')
+
+    for tabla, modelo in TABLAS.items():
+        hasta = corte(tabla)
+        if hasta is None:
+            continue
+        calientes = db.session.execute(
+            select(func.count()).where(modelo.fecha <= hasta)
+        ).scalar()
+        if calientes:
+            problemas.append(f'{tabla}: {calientes} filas calientes con fecha archivada '
+                             f'(hasta {hasta.isoformat()}); no aparecen en los reportes')
+    return len(periodos), problemas
+
+
+def init_app(app):
+    """
+    Adjunta la base de archivo a cada conexión. Requiere un app context y
+    debe llamarse antes de la primera conexión.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        app.config['ARCHIVO_DB'] = None
+        return
+    ruta = app.config.get('ARCHIVO_DB')
+    if not ruta:
+        principal = db.engine.url.database
+        if not principal or principal == ':memory:' or 'mode=memory' in str(db.engine.url):
+            ruta = ':memory:'
+        else:
+            base, extension = os.path.splitext(principal)
+            ruta = f'{base}_archivo{extension or ".db"}'
+    app.config['ARCHIVO_DB'] = ruta
+
+    @event.listens_for(db.engine, 'connect')
+    def adjuntar(conexion_dbapi, registro):
+        cursor = conexion_dbapi.cursor()
+        cursor.execute(f'ATTACH DATABASE ? AS {ESQUEMA}', (ruta,))
+        cursor.close()
@@ -0,0 +1,230 @@
+"""
+Altas, modificaciones y bajas de presentismo e ingresos/egresos.
+
+Las usan tanto los endpoints REST como la sincronización de dispositivos,
+así ambos caminos validan igual y mantienen el resumen diario. Ninguna de
+estas funciones hace commit.
+
+Las horas de las fichadas se calculan acá (ver servicios/horas.py): si
+vienen ingreso y egreso, el valor de horas_trabajadas que mande el cliente
+se ignora.
+"""
+
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from app import db
+from models import Presentismo, IngresoEgreso, TIPOS_PRESENTISMO
+from servicios.fechas import parsear_fecha, parsear_hora
+from servicios import resumen_diario, horas, archivo
+
+
+class DatosInvalidos(ValueError):
+    """Los datos recibidos no permiten registrar la operación"""
+
+
+def _requerido(datos, campo):
+    valor = datos.get(campo)
+    if valor in (None, ''):
+        raise DatosInvalidos(f'{campo} es requerido')
+    return valor
+
+
+def _fecha(valor):
+    try:
+        return parsear_fecha(valor)
+    except ValueError as e:
+        raise DatosInvalidos(str(e))
+
+
+def _fecha_abierta(valor, tabla):
+    """Fecha de un alta: no puede caer en un período archivado"""
+    fecha = _fecha(valor)
+    try:
+        archivo.verificar_abierta(tabla, fecha)
+    except archivo.PeriodoCerrado as e:
+        raise DatosInvalidos(str(e))
+    return fecha
+
+
+def _hora(valor):
+    try:
+        return parsear_hora(valor)
+    except ValueError as e:
+        raise DatosInvalidos(str(e))
+
+
+def _tipo(valor):
+    if valor not in TIPOS_PRESENTISMO:
+        raise DatosInvalidos(f'Tipo de presentismo inválido: {valor}')
+    return valor
+
+
+def crear_presentismo(datos, reemplazar=False):
+    """
+    Registra un presentismo. Con reemplazar=True, si ya existe uno para el
+    mismo empleado, obra y fecha se actualiza en lugar de fallar.
+    """
+    personal_id = _requerido(datos, 'personal_id')
+    obra_id = _requerido(datos, 'obra_id')
+    fecha = _fecha_abierta(_requerido(datos, 'fecha'), 'presentismo')
+    tipo = _tipo(datos.get('tipo'))
+
+    if reemplazar:
+        existente = Presentismo.query.filter_by(
+            personal_id=personal_id, obra_id=obra_id, fecha=fecha
+        ).first()
+        if existente:
+            return modificar_presentismo(existente, datos)
+
+    nuevo = Presentismo(
+        personal_id=personal_id,
+        obra_id=obra_id,
+        fecha=fecha,
+        tipo=tipo,
+        descripcion=datos.get('descripcion'),
+        notas=datos.get('notas')
+    )
+    db.session.add(nuevo)
+    resumen_diario.registrar_presentismo(nuevo.obra_id, nuevo.fecha, nuevo.tipo)
+    return nuevo
+
+
+def modificar_presentismo(presentismo, datos):
+    tipo = _tipo(datos.get('tipo', presentismo.tipo))
+    resumen_diario.cambiar_tipo_presentismo(presentismo.obra_id, presentismo.fecha,
+                                            presentismo.tipo, tipo)
+    presentismo.tipo = tipo
+    presentismo.descripcion = datos.get('descripcion', presentismo.descripcion)
+    presentismo.notas = datos.get('notas', presentismo.notas)
+    return presentismo
+
+
+def eliminar_presentismo(presentismo):
+    db.session.delete(presentismo)
+    resumen_diario.registrar_presentismo(presentismo.obra_id, presentismo.fecha,
+                                         presentismo.tipo, signo=-1)
+
+
+def _horas(hora_ingreso, hora_egreso, horas_trabajadas):
+    try:
+        if hora_ingreso is None and hora_egreso is None:
+            return horas.horas_manuales(horas_trabajadas)
+        calculadas = horas.calcular(hora_ingreso, hora_egreso)
+    except horas.TurnoInvalido as e:
+        raise DatosInvalidos(str(e))
+    del calculadas['cruza_medianoche']
+    return calculadas
+
+
+def _verificar_conflictos(personal_id, fecha, hora_ingreso, hora_egreso, excluir_id=None):
+    """
+    Rechaza una fichada duplicada o superpuesta con otra del mismo empleado.
+    Se miran el día anterior y el siguiente por los turnos que cruzan la
+    medianoche (una consulta sobre ix_ingresos_egresos_personal_fecha).
+    """
+    if hora_ingreso is None:
+        return
+    query = (
+        select(IngresoEgreso.id, IngresoEgreso.personal_id, IngresoEgreso.fecha,
+               IngresoEgreso.hora_ingreso, IngresoEgreso.hora_egreso)
+        .where(IngresoEgreso.personal_id == personal_id,
+               IngresoEgreso.fecha.between(fecha - timedelta(days=1), fecha + timedelta(days=1)))
+    )
+    if excluir_id is not None:
+        query = query.where(IngresoEgreso.id != excluir_id)
+    turnos = [tuple(fila) for fila in db.session.execute(query)]
+    turnos.append((None, personal_id, fecha, hora_ingreso, hora_egreso))
+    for clave, otra, motivo in horas.conflictos(turnos):
+        if clave is None or otra is None:
+            conflicto = otra if clave is None else clave
+            raise DatosInvalidos(f'Fichada {motivo} con el registro {conflicto}')
+
+
+def claves_en_conflicto(fichadas):
+    """
+    Verificación de un lote de fichadas (sincronización). fichadas es una
+    lista de (clave, personal_id, fecha, hora_ingreso, hora_egreso,
+    registro_id), con registro_id el de la fichada que se modifica o None en
+    un alta. Carga en una consulta las guardadas de esos empleados en los
+    días vecinos y hace un solo barrido con todas juntas.
+
+    Devuelve las claves que aparecen en algún conflicto: solo esas hace
+    falta verificarlas una por una, en el orden del lote. Las demás no
+    chocan con ninguna fichada del lote ni de la base, en ningún orden.
+    """
+    fichadas = [f for f in fichadas if f[3] is not None]
+    if not fichadas:
+        return set()
+    dias = {(personal_id, fecha + timedelta(days=delta))
+            for _, personal_id, fecha, _, _, _ in fichadas for delta in (-1, 0, 1)}
+    # (personal_id, fecha) IN (VALUES ...) recorre todo el índice en SQLite:
+    # se busca por empleado y rango de fechas y se filtran los días acá
+    fechas = [fecha for _, fecha in dias]
+    query = (
+        select(IngresoEgreso.id, IngresoEgreso.personal_id, IngresoEgreso.fecha,
+               IngresoEgreso.hora_ingreso, IngresoEgreso.hora_egreso)
+        .where(IngresoEgreso.personal_id.in_({personal_id for personal_id, _ in dias}),
+               IngresoEgreso.fecha.between(min(fechas), max(fechas)))
+    )
+    turnos = [tuple(fila) for fila in db.session.execute(query) if (fila[1], fila[2]) in dias]
+    turnos.extend(f[:5] for f in fichadas)
+
+    # Una modificación no choca con la versión guardada del mismo registro
+    modificados = {clave: registro_id for clave, _, _, _, _, registro_id in fichadas}
+    claves = set()
+    for clave, otra, _ in horas.conflictos(turnos):
+        if modificados.get(clave, clave) == otra or modificados.get(otra, otra) == clave:
+            continue
+        claves.update((clave, otra))
+    return claves & set(modificados)
+
+
+def crear_ingreso_egreso(datos, verificar=True):
+    """verificar=False omite la verificación de conflictos ya hecha para el lote"""
+    personal_id = _requerido(datos, 'personal_id')
+    fecha = _fecha_abierta(_requerido(datos, 'fecha'), 'ingresos_egresos')
+    hora_ingreso = _hora(datos.get('hora_ingreso'))
+    hora_egreso = _hora(datos.get('hora_egreso'))
+    calculadas = _horas(hora_ingreso, hora_egreso, datos.get('horas_trabajadas'))
+    if verificar:
+        _verificar_conflictos(personal_id, fecha, hora_ingreso, hora_egreso)
+
+    nuevo = IngresoEgreso(
+        personal_id=personal_id,
+        obra_id=_requerido(datos, 'obra_id'),
+        fecha=fecha,
+        hora_ingreso=hora_ingreso,
+        hora_egreso=hora_egreso,
+        notas=datos.get('notas'),
+        **calculadas
+    )
+    db.session.add(nuevo)
+    resumen_diario.registrar_ingreso(nuevo.obra_id, nuevo.fecha, nuevo.horas_trabajadas)
+    return nuevo
+
+
+def modificar_ingreso_egreso(registro, datos, verificar=True):
+    hora_ingreso = _hora(datos.get('hora_ingreso', registro.hora_ingreso))
+    hora_egreso = _hora(datos.get('hora_egreso', registro.hora_egreso))
+    calculadas = _horas(hora_ingreso, hora_egreso,
+                        datos.get('horas_trabajadas', registro.horas_trabajadas))
+    if verificar:
+        _verificar_conflictos(registro.personal_id, registro.fecha, hora_ingreso, hora_egreso,
+                              excluir_id=registro.id)
+    resumen_diario.cambiar_horas_ingreso(registro.obra_id, registro.fecha,
+                                         registro.horas_trabajadas,
+                                         calculadas['horas_trabajadas'])
+    registro.hora_ingreso = hora_ingreso
+    registro.hora_egreso = hora_egreso
+    for campo, valor in calculadas.items():
+        setattr(registro, campo, valor)
+    registro.notas = datos.get('notas', registro.notas)
+    return registro
+
+
+def eliminar_ingreso_egreso(registro):
+    db.session.delete(registro)
+    resumen_diario.registrar_ingreso(registro.obra_id, registro.fecha,
+                                     registro.horas_trabajadas, signo=-1)
@@ -0,0 +1,63 @@
+"""
+Ajustes de conexión para SQLite en producción.
+
+En cada conexión nueva se activan WAL (lectores y un escritor en paralelo,
+sin que las lecturas vean "database is locked") y los pragmas configurados
+en config.py.
+
+Además las transacciones de requests que escriben (POST, PUT, PATCH,
+DELETE) empiezan con BEGIN IMMEDIATE. Con el BEGIN diferido por defecto,
+una transacción que primero lee (por ejemplo el usuario de la sesión) y
+después escribe falla al instante con "database is locked" si otro
+escritor hizo commit en el medio, sin respetar busy_timeout. Tomando el
+lock de escritura al empezar, los escritores esperan su turno.
+"""
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+from app import db
+from config import es_sqlite_en_memoria
+
+METODOS_DE_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _pragmas(config):
+    if config['SQLITE_SYNCHRONOUS'] not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+        raise ValueError(f"SQLITE_SYNCHRONOUS inválido: {config['SQLITE_SYNCHRONOUS']}")
+    return [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA busy_timeout={config['SQLITE_BUSY_TIMEOUT_MS']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA cache_size=-{config['SQLITE_CACHE_KIB']}",
+        f"PRAGMA mmap_size={config['SQLITE_MMAP_BYTES']}",
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def init_app(app):
+    """
+    Registra los eventos del engine. Requiere un app context y debe llamarse
+    antes de la primera conexión.
+    """
+    if db.engine.dialect.name != 'sqlite' or not app.config.get('SQLITE_AJUSTES', True):
+        return
+    if es_sqlite_en_memoria(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    pragmas = _pragmas(app.config)
+    motor = db.engine
+
+    @event.listens_for(motor, 'connect')
+    def al_conectar(conexion_dbapi, registro):
+        # El driver no abre transacciones solo: las maneja el evento begin
+        conexion_dbapi.isolation_level = None
+        cursor = conexion_dbapi.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(motor, 'begin')
+    def al_empezar(conexion):
+        escritura = has_request_context() and request.method not in METODOS_DE_LECTURA
+        conexion.exec_driver_sql('BEGIN IMMEDIATE' if escritura else 'BEGIN')
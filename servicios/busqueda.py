@@ -0,0 +1,123 @@
+"""
+Búsqueda de personal por nombre, apellido, DNI, email o ciudad.
+
+En SQLite se usa una tabla FTS5 (personal_fts) con índice de prefijos y
+sin distinguir acentos: "gonza" encuentra a González. La mantienen
+triggers sobre personal, así cualquier escritura (endpoints, importación,
+generador de datos) queda indexada en la misma transacción. Los
+resultados se ordenan por relevancia (bm25), pesando más apellido y DNI.
+
+Los DNI se indexan sin puntos ni guiones: "30.123.456" se encuentra con
+"30123456" y con "30.123". En otros motores, o si SQLite no tiene FTS5,
+se busca por prefijo con LIKE.
+"""
+
+import re
+
+from sqlalchemy import column, event, or_, select, table, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from models import Personal
+
+MAXIMO_RESULTADOS = 50
+MAXIMO_TERMINOS = 6
+
+# Columnas indexadas y su peso en bm25, en el orden de la tabla FTS
+_COLUMNAS = (('nombre', 8.0), ('apellido', 10.0), ('dni', 10.0), ('email', 2.0), ('ciudad', 1.0))
+
+_DNI_NORMALIZADO = "replace(replace({}.dni, '.', ''), '-', '')"
+
+
+def _valores(origen):
+    return ', '.join(_DNI_NORMALIZADO.format(origen) if columna == 'dni' else f'{origen}.{columna}'
+                     for columna, _ in _COLUMNAS)
+
+
+_LISTA_COLUMNAS = ', '.join(columna for columna, _ in _COLUMNAS)
+
+SENTENCIAS_INDICE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS personal_fts USING fts5({_LISTA_COLUMNAS}, "
+    f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS personal_fts_alta AFTER INSERT ON personal BEGIN "
+    f"INSERT INTO personal_fts (rowid, {_LISTA_COLUMNAS}) VALUES (new.id, {_valores('new')}); END",
+    f"CREATE TRIGGER IF NOT EXISTS personal_fts_modificacion "
+    f"AFTER UPDATE OF {_LISTA_COLUMNAS} ON personal BEGIN "
+    f"DELETE FROM personal_fts WHERE rowid = old.id; "
+    f"INSERT INTO personal_fts (rowid, {_LISTA_COLUMNAS}) VALUES (new.id, {_valores('new')}); END",
+    f"CREATE TRIGGER IF NOT EXISTS personal_fts_baja AFTER DELETE ON personal BEGIN "
+    f"DELETE FROM personal_fts WHERE rowid = old.id; END",
+)
+
+_disponible = {}
+
+
+def crear_indice(conexion):
+    """Crea personal_fts con sus triggers y la llena con el personal actual"""
+    if conexion.dialect.name != 'sqlite':
+        return False
+    try:
+        for sentencia in SENTENCIAS_INDICE:
+            conexion.execute(text(sentencia))
+    except OperationalError:
+        # SQLite compilado sin FTS5: queda la búsqueda con LIKE
+        return False
+    conexion.execute(text('DELETE FROM personal_fts'))
+    conexion.execute(text(
+        f'INSERT INTO personal_fts (rowid, {_LISTA_COLUMNAS}) '
+        f'SELECT personal.id, {_valores("personal")} FROM personal'
+    ))
+    return True
+
+
+@event.listens_for(Personal.__table__, 'after_create')
+def _al_crear_personal(tabla, conexion, **kwargs):
+    crear_indice(conexion)
+
+
+def _con_indice():
+    motor = db.engine
+    if motor not in _disponible:
+        _disponible[motor] = motor.dialect.name == 'sqlite' and db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'personal_fts'"
+        )).first() is not None
+    return _disponible[motor]
+
+
+def terminos(texto):
+    """Palabras de la búsqueda, con los números de DNI sin separadores"""
+    texto = re.sub(r'(?<=\d)[.\-](?=\d)', '', texto or '')
+    return re.findall(r'\w+', texto)[:MAXIMO_TERMINOS]
+
+
+def buscar_personal(texto, limite=20, estado=None):
+    """
+    Empleados que tienen alguna columna que empieza con cada término, por
+    relevancia. Devuelve una lista de dicts con los datos para un selector.
+    """
+    palabras = terminos(texto)
+    if not palabras:
+        return []
+    limite = max(1, min(limite, MAXIMO_RESULTADOS))
+    columnas = (Personal.id, Personal.nombre, Personal.apellido, Personal.dni,
+                Personal.ciudad, Personal.estado)
+
+    if _con_indice():
+        fts = table('personal_fts', column('rowid'))
+        pesos = ', '.join(str(peso) for _, peso in _COLUMNAS)
+        consulta = (
+            select(*columnas)
+            .join_from(Personal, fts, fts.c.rowid == Personal.id)
+            .where(text('personal_fts MATCH :busqueda').bindparams(
+                busqueda=' '.join(f'"{p}"*' for p in palabras)))
+            .order_by(text(f'bm25(personal_fts, {pesos})'))
+        )
+    else:
+        consulta = select(*columnas).where(*(
+            or_(*(getattr(Personal, columna).ilike(f'{p}%') for columna, _ in _COLUMNAS))
+            for p in palabras
+        )).order_by(Personal.apellido, Personal.nombre)
+
+    if estado:
+        consulta = consulta.where(Personal.estado == estado)
+    return [fila._asdict() for fila in db.session.execute(consulta.limit(limite))]
@@ -0,0 +1,213 @@
+"""
+Seguimiento de cambios para sincronización.
+
+Cada flush que inserta, modifica o borra registros de las tablas seguidas
+agrega una fila a registro_cambios en la misma transacción. La columna
+version es creciente, así un dispositivo puede pedir solo lo que cambió
+desde la última versión que vio.
+
+Las escrituras que no pasan por el ORM (inserts masivos, el archivado de
+meses) deben llamar a registrar() o registrar_bajas() explícitamente.
+
+Un cliente que leyó hasta la versión N no vuelve a pedir las anteriores:
+las versiones tienen que hacerse visibles en orden. En SQLite hay un solo
+escritor a la vez y eso ya se cumple. En una base de servidor dos
+transacciones podrían tomar las versiones 10 y 11 y hacer commit en el
+orden inverso; por eso las que registran cambios bloquean la fila de
+secuencia_cambios hasta el commit. Los requests que escriben la toman al
+empezar la transacción, como BEGIN IMMEDIATE en SQLite
+(servicios/base_datos.py), para que nadie espere ese lock teniendo
+tomadas filas que otro necesita.
+"""
+
+import hashlib
+from datetime import datetime
+
+from flask import has_request_context, request
+from sqlalchemy import event, insert, literal, select, func, or_
+
+from app import db
+from models import Personal, Obra, Asignacion, Presentismo, IngresoEgreso
+from models.sincronizacion import RegistroCambio, SecuenciaCambios
+from servicios.base_datos import METODOS_DE_LECTURA
+from servicios.serializacion import consulta_plana, fila_a_dict
+
+ALTA = 'alta'
+MODIFICACION = 'modificacion'
+BAJA = 'baja'
+
+MODELOS = {
+    modelo.__tablename__: modelo
+    for modelo in (Personal, Obra, Asignacion, Presentismo, IngresoEgreso)
+}
+
+
+def _fila_cambio(objeto, operacion):
+    return {
+        'tabla': objeto.__tablename__,
+        'registro_id': objeto.id,
+        'operacion': operacion,
+        'obra_id': objeto.id if isinstance(objeto, Obra) else getattr(objeto, 'obra_id', None),
+    }
+
+
+def _ordenar_versiones(conexion):
+    """En una base de servidor, bloquea secuencia_cambios hasta el fin de la transacción"""
+    if conexion.dialect.name != 'sqlite':
+        conexion.execute(select(SecuenciaCambios.id).with_for_update())
+
+
+def _al_empezar(conexion):
+    if has_request_context() and request.method not in METODOS_DE_LECTURA:
+        _ordenar_versiones(conexion)
+
+
+def _despues_del_flush(session, contexto):
+    filas = []
+    for objeto in session.new:
+        if type(objeto).__tablename__ in MODELOS:
+            filas.append(_fila_cambio(objeto, ALTA))
+    for objeto in session.dirty:
+        if type(objeto).__tablename__ in MODELOS and \
+                session.is_modified(objeto, include_collections=False):
+            filas.append(_fila_cambio(objeto, MODIFICACION))
+    for objeto in session.deleted:
+        if type(objeto).__tablename__ in MODELOS:
+            filas.append(_fila_cambio(objeto, BAJA))
+
+    if filas:
+        conexion = session.connection()
+        _ordenar_versiones(conexion)
+        conexion.execute(RegistroCambio.__table__.insert(), filas)
+
+
+def init_app(app):
+    """Registra el listener de cambios sobre la sesión de Flask-SQLAlchemy"""
+    if not event.contains(db.session, 'after_flush', _despues_del_flush):
+        event.listen(db.session, 'after_flush', _despues_del_flush)
+    if db.engine.dialect.name != 'sqlite' and \
+            not event.contains(db.engine, 'begin', _al_empezar):
+        event.listen(db.engine, 'begin', _al_empezar)
+
+
+def registrar(tabla, ids, operacion, obra_id=None):
+    """Registra cambios hechos sin el ORM (por ejemplo inserts masivos)"""
+    filas = [
+        {'tabla': tabla, 'registro_id': registro_id, 'operacion': operacion, 'obra_id': obra_id}
+        for registro_id in ids
+    ]
+    if filas:
+        _ordenar_versiones(db.session.connection())
+        db.session.execute(RegistroCambio.__table__.insert(), filas)
+
+
+def registrar_bajas(tabla, consulta):
+    """
+    Registra como bajas las filas (id, obra_id) de la consulta con un solo
+    INSERT ... SELECT, para borrados masivos sin el ORM
+    """
+    filas = consulta.subquery()
+    _ordenar_versiones(db.session.connection())
+    db.session.execute(insert(RegistroCambio).from_select(
+        ['tabla', 'registro_id', 'operacion', 'obra_id', 'fecha'],
+        select(literal(tabla), filas.c[0], literal(BAJA), filas.c[1],
+               literal(datetime.now(), RegistroCambio.fecha.type)),
+    ))
+
+
+def version_actual(tablas=None):
+    """Última versión registrada (de todas las tablas o de las indicadas)"""
+    if not tablas:
+        return db.session.execute(select(func.max(RegistroCambio.version))).scalar() or 0
+    return max(versiones(tablas).values())
+
+
+def versiones(tablas):
+    """Última versión de cada tabla indicada, en una sola consulta"""
+    tablas = list(tablas)
+    # Un MAX por tabla: cada uno se resuelve con una búsqueda en el índice
+    # (tabla, version) en lugar de recorrer todos los cambios de las tablas
+    maximos = db.session.execute(select(*(
+        select(func.max(RegistroCambio.version))
+        .where(RegistroCambio.tabla == tabla)
+        .scalar_subquery()
+        for tabla in tablas
+    ))).one()
+    return {tabla: v or 0 for tabla, v in zip(tablas, maximos)}
+
+
+def version_obra(tabla, obra_id):
+    """Última versión de los cambios de una tabla en una obra"""
+    # Se resuelve con ix_registro_cambios_tabla_obra_version
+    return db.session.execute(
+        select(func.max(RegistroCambio.version))
+        .where(RegistroCambio.tabla == tabla, RegistroCambio.obra_id == obra_id)
+    ).scalar() or 0
+
+
+def etiqueta(tablas, parametros):
+    """
+    ETag de un listado: cambia cuando cambia alguna de las tablas o los
+    parámetros del pedido. Devuelve (etag, versión).
+    """
+    version = version_actual(tablas)
+    resumen = hashlib.sha1(parametros).hexdigest()[:16]
+    return f'v{version}-{resumen}', version
+
+
+def _filas_actuales(tabla, ids):
+    modelo = MODELOS[tabla]
+    query = modelo.query.filter(modelo.id.in_(ids))
+    return {fila['id']: fila for fila in map(fila_a_dict, consulta_plana(query, modelo))}
+
+
+def cambios_desde(version, tablas, obra_id=None, limite=500):
+    """
+    Devuelve (cambios, última versión incluida, hay_mas).
+
+    Cada cambio es {'tabla', 'id', 'operacion', 'obra_id', 'datos'} con el
+    estado actual del registro, o datos=None si fue dado de baja. Varios
+    cambios del mismo registro dentro de la página se resumen en uno solo;
+    obra_id es la del último.
+    """
+    query = (
+        select(RegistroCambio.version, RegistroCambio.tabla,
+               RegistroCambio.registro_id, RegistroCambio.operacion, RegistroCambio.obra_id)
+        .where(RegistroCambio.version > version, RegistroCambio.tabla.in_(tablas))
+        .order_by(RegistroCambio.version)
+        .limit(limite + 1)
+    )
+    if obra_id is not None:
+        # Los cambios sin obra (por ejemplo de personal) se envían a todos
+        query = query.where(or_(RegistroCambio.obra_id == obra_id,
+                                RegistroCambio.obra_id.is_(None)))
+    filas = db.session.execute(query).all()
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    ultima = filas[-1].version if filas else version
+
+    ultimos = {}
+    for fila in filas:
+        ultimos.pop((fila.tabla, fila.registro_id), None)
+        ultimos[(fila.tabla, fila.registro_id)] = (fila.operacion, fila.obra_id)
+
+    vigentes = {}
+    for tabla in {t for t, _ in ultimos}:
+        ids = [i for (t, i), (op, _) in ultimos.items() if t == tabla and op != BAJA]
+        vigentes[tabla] = _filas_actuales(tabla, ids) if ids else {}
+
+    cambios = []
+    for (tabla, registro_id), (operacion, obra) in ultimos.items():
+        datos = vigentes[tabla].get(registro_id)
+        if datos is None:
+            operacion = BAJA
+        cambios.append({'tabla': tabla, 'id': registro_id, 'operacion': operacion,
+                        'obra_id': obra, 'datos': datos})
+    return cambios, ultima, hay_mas
+
+
+def instantanea(tabla):
+    """Todas las filas actuales de una tabla, para la primera sincronización"""
+    modelo = MODELOS[tabla]
+    return [fila_a_dict(f) for f in consulta_plana(modelo.query.order_by(modelo.id), modelo)]
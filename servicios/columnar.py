@@ -0,0 +1,67 @@
+"""
+Formato columnar para listados y reportes (?format=columnar).
+
+En lugar de una lista de objetos, que repite en cada fila los nombres de
+las claves y los nombres de empleados y obras, se devuelve un arreglo por
+columna:
+
+    {"formato": "columnar", "cantidad": 2,
+     "columnas": {"id": [1, 2], "personal_id": [7, 7],
+                  "tipo": {"valores": ["presente"], "indices": [0, 0]}, ...},
+     "personal": {"7": {"nombre": "Juan", "apellido": "Pérez"}},
+     "obras": {"3": {"nombre": "Torre Norte"}}}
+
+Los nombres de personal y obras salen de las columnas y pasan a las
+tablas de referencia, indexadas por personal_id y obra_id. Las columnas
+de texto con muchos valores repetidos (fechas, tipos, puestos) se
+codifican con un diccionario: valores distintos más el índice de cada fila.
+"""
+
+FORMATOS = ('json', 'columnar')
+
+# (tabla de referencia, columna con el id, {columna de la fila: campo de la tabla})
+REFERENCIAS = (
+    ('personal', 'personal_id', {'personal_nombre': 'nombre', 'personal_apellido': 'apellido'}),
+    ('obras', 'obra_id', {'obra_nombre': 'nombre'}),
+)
+
+
+def solicitado(args):
+    """True si el pedido indica format=columnar; ValueError si el formato no existe"""
+    formato = args.get('format', 'json')
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato}. Válidos: {', '.join(FORMATOS)}")
+    return formato == 'columnar'
+
+
+def _diccionario(valores):
+    """Codifica la columna con un diccionario si tiene a lo sumo la mitad de valores distintos"""
+    if not all(v is None or isinstance(v, str) for v in valores):
+        return valores
+    indices = {}
+    codigos = [indices.setdefault(v, len(indices)) for v in valores]
+    if len(indices) * 2 > len(valores):
+        return valores
+    return {'valores': list(indices), 'indices': codigos}
+
+
+def codificar(filas):
+    """Convierte una lista de dicts con las mismas claves en el formato columnar"""
+    claves = list(filas[0]) if filas else []
+    resultado = {'formato': 'columnar', 'cantidad': len(filas), 'columnas': {}}
+
+    for tabla, columna_id, campos in REFERENCIAS:
+        presentes = [c for c in campos if c in claves]
+        if columna_id not in claves or not presentes:
+            continue
+        referencia = {}
+        for fila in filas:
+            identificador = fila[columna_id]
+            if identificador is not None and identificador not in referencia:
+                referencia[identificador] = {campos[c]: fila[c] for c in presentes}
+        resultado[tabla] = {str(i): datos for i, datos in referencia.items()}
+        claves = [c for c in claves if c not in presentes]
+
+    for clave in claves:
+        resultado['columnas'][clave] = _diccionario([fila[clave] for fila in filas])
+    return resultado
@@ -0,0 +1,60 @@
+"""
+Compresión de las respuestas (gzip, o brotli si está instalado).
+
+Se comprimen las respuestas de texto (JSON, HTML, CSV, JS, CSS) que
+superan COMPRESION_MINIMA bytes, cuando el cliente lo acepta en
+Accept-Encoding. No se tocan las respuestas en streaming (exportaciones,
+eventos) ni los archivos estáticos, que se envían sin pasar por memoria.
+"""
+
+import gzip
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TIPOS_COMPRIMIBLES = frozenset((
+    'application/json', 'text/html', 'text/csv', 'text/plain', 'text/css',
+    'text/javascript', 'application/javascript',
+))
+
+CALIDAD_BROTLI = 5
+
+
+def _codificaciones():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def comprimir(respuesta):
+    """after_request: comprime el cuerpo si corresponde"""
+    if respuesta.mimetype not in TIPOS_COMPRIMIBLES or respuesta.status_code != 200 \
+            or respuesta.direct_passthrough or respuesta.is_streamed \
+            or 'Content-Encoding' in respuesta.headers:
+        return respuesta
+    # La respuesta depende del header aunque esta vez no se comprima
+    respuesta.vary.add('Accept-Encoding')
+
+    config = current_app.config
+    datos = respuesta.get_data()
+    if len(datos) < config['COMPRESION_MINIMA']:
+        return respuesta
+    codificacion = request.accept_encodings.best_match(_codificaciones())
+    if codificacion == 'br':
+        datos = brotli.compress(datos, quality=CALIDAD_BROTLI)
+    elif codificacion == 'gzip':
+        datos = gzip.compress(datos, compresslevel=config['COMPRESION_NIVEL'])
+    else:
+        return respuesta
+    respuesta.set_data(datos)
+    respuesta.headers['Content-Encoding'] = codificacion
+    return respuesta
+
+
+def init_app(app):
+    """Registra la compresión de respuestas"""
+    app.config.setdefault('COMPRESION_MINIMA', 1024)
+    app.config.setdefault('COMPRESION_NIVEL', 6)
+    app.after_request(comprimir)
@@ -0,0 +1,205 @@
+"""
+Eventos en vivo de presentismo y fichadas (Server-Sent Events).
+
+Un solo hilo por proceso (el difusor) lee registro_cambios cada
+EVENTOS_INTERVALO segundos y deja los cambios nuevos en la cola de cada
+suscriptor, filtrados por obra y tabla. Las conexiones abiertas solo
+esperan en su cola: no consultan la base ni retienen una sesión. Con el
+worker gevent de gunicorn (WEB_WORKER_CLASS=gevent) esa espera es una
+greenlet y no un hilo, así decenas de pantallas abiertas no le quitan
+hilos a la API. Con gthread cada conexión abierta ocupa uno de los
+WEB_THREADS hilos del worker: por defecto se admite una cada cuatro hilos
+y las pantallas rechazadas (503) siguen los cambios consultando /api/sync.
+El hilo se detiene cuando no queda ningún suscriptor.
+
+El id de cada evento es la versión de registro_cambios hasta la que llega.
+Al reconectarse, EventSource manda Last-Event-ID y se reenvía lo que pasó
+mientras tanto; si es demasiado se manda un evento 'recargar'.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+
+from app import db
+from config import con_gevent
+from servicios import cambios
+
+TABLAS_EVENTOS = ('presentismo', 'ingresos_egresos')
+
+# Mensajes en cola por suscriptor; si el cliente no los lee a tiempo se
+# corta la conexión y al reconectar recibe lo pendiente desde la base
+MAXIMO_PENDIENTES = 100
+
+# Cambios que se reenvían al reconectar; con más, el cliente recarga la tabla
+MAXIMO_REENVIO = 1000
+
+# Milisegundos que EventSource espera antes de reconectarse
+RECONEXION_MS = 3000
+
+
+class DifusorSaturado(Exception):
+    """Se alcanzó EVENTOS_MAXIMO_SUSCRIPTORES en este proceso"""
+
+
+class Suscripcion:
+    """Conexión abierta de una pantalla: su filtro y su cola de mensajes"""
+
+    __slots__ = ('obra_id', 'tablas', 'version', 'cola', 'cortada')
+
+    def __init__(self, obra_id, tablas, version):
+        self.obra_id = obra_id
+        self.tablas = tablas
+        self.version = version  # los mensajes de la cola son posteriores a esta versión
+        self.cola = queue.Queue(MAXIMO_PENDIENTES)
+        self.cortada = False
+
+    def filtrar(self, lista):
+        return [c for c in lista if c['tabla'] in self.tablas and
+                (self.obra_id is None or c['obra_id'] == self.obra_id)]
+
+
+class Difusor:
+    """Hilo que lee registro_cambios y reparte los cambios entre las suscripciones"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._version = 0
+        self._hilo = None
+        self._pid = None
+        self._detener = None
+
+    def suscribir(self, app, obra_id=None, tablas=TABLAS_EVENTOS):
+        """Registra una suscripción y arranca el hilo si no corre en este proceso"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Después de un fork: el hilo y las conexiones eran del padre
+                self._suscripciones, self._hilo = set(), None
+            if len(self._suscripciones) >= app.config['EVENTOS_MAXIMO_SUSCRIPTORES']:
+                raise DifusorSaturado()
+            if self._hilo is None:
+                self._version = cambios.version_actual(TABLAS_EVENTOS)
+                self._pid = os.getpid()
+                # El Event se crea acá y no en __init__: con gevent tiene que
+                # ser el de después del monkey patching del worker
+                self._detener = threading.Event()
+                self._hilo = threading.Thread(target=self._ciclo, args=(app,),
+                                              name='eventos', daemon=True)
+                self._hilo.start()
+            suscripcion = Suscripcion(obra_id, frozenset(tablas), self._version)
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def detener(self, espera=None):
+        hilo = self._hilo
+        if hilo is not None:
+            self._detener.set()
+            hilo.join(espera)
+
+    def _repartir(self):
+        hay_mas = True
+        while hay_mas:
+            lista, ultima, hay_mas = cambios.cambios_desde(self._version, TABLAS_EVENTOS,
+                                                           limite=MAXIMO_REENVIO)
+            with self._lock:
+                self._version = ultima
+                suscripciones = list(self._suscripciones)
+            if not lista:
+                return
+            for suscripcion in suscripciones:
+                propios = suscripcion.filtrar(lista)
+                if not propios:
+                    continue
+                try:
+                    suscripcion.cola.put_nowait((ultima, propios))
+                except queue.Full:
+                    suscripcion.cortada = True
+
+    def _ciclo(self, app):
+        intervalo = app.config['EVENTOS_INTERVALO']
+        detener = self._detener
+        with app.app_context():
+            while not detener.wait(intervalo):
+                with self._lock:
+                    if not self._suscripciones:
+                        self._hilo = None
+                        return
+                try:
+                    self._repartir()
+                except Exception:
+                    app.logger.exception('Error en el difusor de eventos')
+                finally:
+                    db.session.remove()
+
+
+difusor = Difusor()
+
+
+def _mensaje(evento, version, datos):
+    return f'id: {version}\nevent: {evento}\ndata: {json.dumps(datos, separators=(",", ":"))}\n\n'
+
+
+def reenvio(suscripcion, desde):
+    """
+    Mensajes con lo que cambió entre desde y la versión de la suscripción,
+    leídos de la base. Se llama en el request, antes de empezar el flujo.
+    """
+    if desde is None or desde >= suscripcion.version:
+        return []
+    lista, ultima, hay_mas = cambios.cambios_desde(desde, list(suscripcion.tablas),
+                                                   obra_id=suscripcion.obra_id,
+                                                   limite=MAXIMO_REENVIO)
+    if hay_mas and ultima < suscripcion.version:
+        return [_mensaje('recargar', suscripcion.version, {'version': suscripcion.version})]
+    lista = suscripcion.filtrar(lista)
+    if not lista:
+        return []
+    return [_mensaje('cambios', ultima, {'version': ultima, 'cambios': lista})]
+
+
+def flujo(suscripcion, previos, latido, duracion):
+    """
+    Cuerpo de la respuesta text/event-stream. Termina a los duracion
+    segundos (el navegador se reconecta solo) o si la suscripción se cortó.
+    Quien arma la respuesta desuscribe al cerrarse la conexión.
+    """
+    enviada = suscripcion.version
+    fin = time.monotonic() + duracion
+    yield f'retry: {RECONEXION_MS}\n\n'
+    yield from previos
+    while not suscripcion.cortada and time.monotonic() < fin:
+        try:
+            version, lista = suscripcion.cola.get(timeout=latido)
+        except queue.Empty:
+            # Comentario SSE: mantiene viva la conexión a través de proxies
+            yield ': latido\n\n'
+            continue
+        if version <= enviada:
+            continue
+        enviada = version
+        yield _mensaje('cambios', version, {'version': version, 'cambios': lista})
+
+
+def _maximo_suscriptores():
+    """Conexiones en vivo por proceso si no se configura EVENTOS_MAXIMO_SUSCRIPTORES"""
+    if con_gevent():
+        return 100
+    # Con gthread quedan al menos tres de cada cuatro hilos para la API
+    return max(1, int(os.environ.get('WEB_THREADS', 4)) // 4)
+
+
+def init_app(app):
+    """Valores por defecto de la configuración de eventos en vivo"""
+    app.config.setdefault('EVENTOS_INTERVALO', 1.0)
+    app.config.setdefault('EVENTOS_LATIDO', 15)
+    app.config.setdefault('EVENTOS_DURACION', 300)
+    app.config.setdefault('EVENTOS_MAXIMO_SUSCRIPTORES',
+                          int(os.environ.get('EVENTOS_MAXIMO_SUSCRIPTORES',
+                                             _maximo_suscriptores())))
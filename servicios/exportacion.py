@@ -0,0 +1,63 @@
+"""
+Exportación en streaming (NDJSON y CSV) de listados grandes.
+
+La query se recorre con yield_per y cada fila se escribe apenas se lee,
+así la memoria no depende del tamaño del rango exportado. Presentismo y
+fichadas incluyen los períodos archivados (servicios/archivo.py).
+"""
+
+import csv
+import io
+import json
+
+from app import db
+from servicios.serializacion import COLUMNAS, consulta_plana, fila_a_dict
+from servicios import archivo
+
+FORMATOS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Filas leídas de la base por tanda
+TAMANO_TANDA = 1000
+
+
+def _filas(query, modelo):
+    consulta = archivo.adaptar(consulta_plana(query, modelo).statement, modelo)
+    return db.session.execute(consulta.execution_options(yield_per=TAMANO_TANDA))
+
+
+def _ndjson(query, modelo, avance):
+    for i, fila in enumerate(_filas(query, modelo), start=1):
+        yield json.dumps(fila_a_dict(fila), ensure_ascii=False, default=str) + '\n'
+        if avance and i % TAMANO_TANDA == 0:
+            avance(i)
+
+
+def _csv(query, modelo, avance):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([c.key for c in COLUMNAS[modelo]])
+
+    for i, fila in enumerate(_filas(query, modelo), start=1):
+        escritor.writerow(fila_a_dict(fila).values())
+        if i % TAMANO_TANDA == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if avance:
+                avance(i)
+    yield buffer.getvalue()
+
+
+def exportar(query, modelo, formato, avance=None):
+    """
+    Devuelve un generador de fragmentos de texto en el formato pedido.
+    avance, si se indica, se llama con las filas escritas en cada tanda.
+    """
+    if formato == 'ndjson':
+        return _ndjson(query, modelo, avance)
+    if formato == 'csv':
+        return _csv(query, modelo, avance)
+    raise ValueError(f'Formato no soportado: {formato}')
@@ -0,0 +1,38 @@
+"""Conversión de fechas y horas recibidas como texto en la API"""
+
+from datetime import date, datetime, time
+
+
+def parsear_fecha(valor):
+    """Convierte 'YYYY-MM-DD' en date. Vacío o None devuelve None."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(str(valor)[:10])
+    except ValueError:
+        raise ValueError(f'Fecha inválida: {valor}')
+
+
+def parsear_hora(valor):
+    """Convierte 'HH:MM' o 'HH:MM:SS' en time. Vacío o None devuelve None."""
+    if valor is None or valor == '':
+        return None
+    if isinstance(valor, time):
+        return valor
+    try:
+        return time.fromisoformat(str(valor))
+    except ValueError:
+        raise ValueError(f'Hora inválida: {valor}')
+
+
+def formatear(valor):
+    """Formato de salida de la API: fechas ISO y horas HH:MM"""
+    if isinstance(valor, time):
+        return valor.strftime('%H:%M')
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
@@ -0,0 +1,85 @@
+"""
+Filas de los listados renderizadas en el servidor.
+
+Las páginas de gestión (personal, obras, asignaciones, presentismo y
+fichadas) llegan con la primera página de la tabla ya armada en el HTML, y
+las siguientes se piden como fragmentos (?format=html en el listado). Así
+el navegador muestra datos sin esperar a descargar JSON y armar las filas
+en JavaScript. Las plantillas de filas están en templates/parciales.
+
+Los fragmentos quedan en memoria por (tabla, parámetros, rol) junto con la
+versión de registro_cambios de las tablas que leen (las del listado más
+personal y obras, por los nombres): cualquier alta, modificación o baja
+sube la versión y el fragmento se vuelve a renderizar en el siguiente
+pedido. El rol entra en la clave porque los botones de edición solo se
+muestran a los administradores.
+"""
+
+import threading
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import Markup
+
+from models import Personal, Obra, Asignacion, Presentismo, IngresoEgreso
+from servicios import cambios
+from servicios.listados import listar
+from servicios.serializacion import tablas_consultadas
+
+PLANTILLAS = {
+    Personal: 'parciales/filas_personal.html',
+    Obra: 'parciales/filas_obras.html',
+    Asignacion: 'parciales/filas_asignaciones.html',
+    Presentismo: 'parciales/filas_presentismo.html',
+    IngresoEgreso: 'parciales/filas_ingresos_egresos.html',
+}
+
+# Filas por página; igual al pageSize por defecto de PagedTable (main.js)
+TAMANO_PAGINA = 50
+
+MAXIMO_FRAGMENTOS = 256
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def _parametros(args):
+    # El formato no cambia el contenido; los vacíos equivalen a no mandarlos
+    return tuple(sorted((clave, str(valor)) for clave, valor in args.items()
+                        if clave != 'format' and valor not in (None, '')))
+
+
+def renderizar(modelo, args, version, es_admin):
+    """
+    (html, cursor siguiente) de una página del listado. version es la de
+    cambios.version_actual(tablas_consultadas(modelo)). Lanza
+    ParametroInvalido como listar().
+    """
+    clave = (modelo.__tablename__, _parametros(args), es_admin)
+    with _lock:
+        guardado = _cache.get(clave)
+        if guardado is not None and guardado[0] == version:
+            _cache.move_to_end(clave)
+            return guardado[1], guardado[2]
+
+    filas, siguiente = listar(modelo, args)
+    html = render_template(PLANTILLAS[modelo], filas=filas, es_admin=es_admin)
+    with _lock:
+        _cache[clave] = (version, html, siguiente)
+        _cache.move_to_end(clave)
+        while len(_cache) > MAXIMO_FRAGMENTOS:
+            _cache.popitem(last=False)
+    return html, siguiente
+
+
+def primera_pagina(modelo, es_admin, **parametros):
+    """
+    Datos para incluir la tabla en la página: filas renderizadas, cursor
+    siguiente, versión (desde la que se siguen los cambios en vivo) y los
+    parámetros con los que se pidió.
+    """
+    parametros.setdefault('limit', TAMANO_PAGINA)
+    version = cambios.version_actual(tablas_consultadas(modelo))
+    html, siguiente = renderizar(modelo, parametros, version, es_admin)
+    return {'html': Markup(html), 'siguiente': siguiente, 'version': version,
+            'parametros': parametros}
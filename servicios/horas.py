@@ -0,0 +1,153 @@
+"""
+Cálculo de horas a partir de las fichadas de ingreso y egreso.
+
+Las horas trabajadas, nocturnas y extra se calculan en el servidor al
+escribir, así los reportes de liquidación solo suman columnas. Un egreso
+anterior o igual al ingreso se toma como un turno que cruza la medianoche.
+
+Todo se trabaja en minutos desde el comienzo del día de la fichada: un
+turno de 22:00 a 06:00 es el intervalo [1320, 1800).
+"""
+
+from datetime import datetime, timedelta
+
+MINUTOS_DIA = 24 * 60
+
+# Jornada legal: lo que la supera en un turno se paga como hora extra
+JORNADA_HORAS = 8
+# Horario nocturno: de 21 a 6 del día siguiente
+NOCTURNO_DESDE = 21 * 60
+NOCTURNO_HASTA = 6 * 60
+# Un turno más largo casi siempre es un egreso mal cargado
+MAXIMO_TURNO_HORAS = 16
+
+# Franjas nocturnas que puede tocar un turno de hasta 48 horas de extensión
+_FRANJAS_NOCTURNAS = (
+    (0, NOCTURNO_HASTA),
+    (NOCTURNO_DESDE, MINUTOS_DIA + NOCTURNO_HASTA),
+    (MINUTOS_DIA + NOCTURNO_DESDE, 2 * MINUTOS_DIA),
+)
+
+
+class TurnoInvalido(ValueError):
+    """Las horas de ingreso y egreso no forman un turno válido"""
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute + hora.second / 60
+
+
+def _redondear(horas):
+    return round(horas, 2)
+
+
+def intervalo(hora_ingreso, hora_egreso):
+    """
+    (inicio, fin) en minutos desde el comienzo del día. fin es None si el
+    turno sigue abierto; si el egreso no es posterior al ingreso, cruza
+    la medianoche.
+    """
+    inicio = _minutos(hora_ingreso)
+    if hora_egreso is None:
+        return inicio, None
+    fin = _minutos(hora_egreso)
+    if fin <= inicio:
+        fin += MINUTOS_DIA
+    return inicio, fin
+
+
+def calcular(hora_ingreso, hora_egreso, jornada=JORNADA_HORAS):
+    """
+    Devuelve {'horas_trabajadas', 'horas_nocturnas', 'horas_extra',
+    'cruza_medianoche'}. Sin egreso (turno abierto) las horas son None.
+    """
+    if hora_ingreso is None:
+        if hora_egreso is not None:
+            raise TurnoInvalido('Hay hora de egreso sin hora de ingreso')
+        return {'horas_trabajadas': None, 'horas_nocturnas': None,
+                'horas_extra': None, 'cruza_medianoche': False}
+
+    inicio, fin = intervalo(hora_ingreso, hora_egreso)
+    if fin is None:
+        return {'horas_trabajadas': None, 'horas_nocturnas': None,
+                'horas_extra': None, 'cruza_medianoche': False}
+    if _minutos(hora_egreso) == inicio:
+        raise TurnoInvalido('La hora de egreso es igual a la de ingreso')
+
+    trabajadas = (fin - inicio) / 60
+    if trabajadas > MAXIMO_TURNO_HORAS:
+        raise TurnoInvalido(
+            f'Turno de {trabajadas:.1f} horas: supera el máximo de {MAXIMO_TURNO_HORAS}'
+        )
+    nocturnas = sum(max(0, min(fin, hasta) - max(inicio, desde))
+                    for desde, hasta in _FRANJAS_NOCTURNAS) / 60
+    return {
+        'horas_trabajadas': _redondear(trabajadas),
+        'horas_nocturnas': _redondear(nocturnas),
+        'horas_extra': _redondear(max(0.0, trabajadas - jornada)),
+        'cruza_medianoche': fin > MINUTOS_DIA,
+    }
+
+
+def horas_manuales(horas, jornada=JORNADA_HORAS):
+    """Horas cargadas a mano, sin fichadas: solo se valida el rango"""
+    if horas in (None, ''):
+        return {'horas_trabajadas': None, 'horas_nocturnas': None, 'horas_extra': None}
+    try:
+        horas = float(horas)
+    except (TypeError, ValueError):
+        raise TurnoInvalido(f'horas_trabajadas inválidas: {horas}')
+    if not 0 < horas <= MAXIMO_TURNO_HORAS:
+        raise TurnoInvalido(f'horas_trabajadas debe estar entre 0 y {MAXIMO_TURNO_HORAS}')
+    return {'horas_trabajadas': _redondear(horas), 'horas_nocturnas': None,
+            'horas_extra': _redondear(max(0.0, horas - jornada))}
+
+
+def conflictos(turnos):
+    """
+    Detecta fichadas duplicadas o superpuestas de un mismo empleado.
+
+    turnos es una lista de (clave, personal_id, fecha, hora_ingreso,
+    hora_egreso). Se ordenan una vez por empleado e inicio y se recorren
+    en una sola pasada comparando cada turno con el que termina más tarde
+    de los anteriores. Devuelve [(clave, clave_en_conflicto, motivo)].
+
+    Un turno abierto (sin egreso) todavía no terminó: se lo toma como si
+    durara MAXIMO_TURNO_HORAS, lo más que puede durar al cerrarlo, y choca
+    con los turnos que empiezan dentro de ese plazo.
+    """
+    abierto_hasta = timedelta(hours=MAXIMO_TURNO_HORAS)
+    eventos = []
+    for clave, personal_id, fecha, hora_ingreso, hora_egreso in turnos:
+        if hora_ingreso is None:
+            continue
+        inicio, fin = intervalo(hora_ingreso, hora_egreso)
+        base = datetime.combine(fecha, datetime.min.time())
+        comienzo = base + timedelta(minutes=inicio)
+        final = comienzo + abierto_hasta if fin is None else base + timedelta(minutes=fin)
+        eventos.append((personal_id, comienzo, final, fin is None, fecha, clave))
+    eventos.sort(key=lambda e: (e[0], e[1]))
+
+    encontrados = []
+    anterior = None       # turno que termina más tarde entre los ya vistos
+    abierto = {}          # (empleado, fecha) -> clave de la fichada sin egreso
+    for personal_id, comienzo, final, sin_egreso, fecha, clave in eventos:
+        cantidad = len(encontrados)
+        if anterior is not None and anterior[0] == personal_id:
+            _, comienzo_previo, final_previo, clave_previa = anterior
+            if comienzo == comienzo_previo:
+                encontrados.append((clave, clave_previa, 'duplicada'))
+            elif comienzo < final_previo:
+                encontrados.append((clave, clave_previa, 'superpuesta'))
+        else:
+            anterior = None
+
+        if sin_egreso:
+            # Dos turnos abiertos el mismo día aunque estén más lejos que el máximo
+            if (personal_id, fecha) in abierto and len(encontrados) == cantidad:
+                encontrados.append((clave, abierto[(personal_id, fecha)], 'duplicada'))
+            abierto[(personal_id, fecha)] = clave
+
+        if anterior is None or final > anterior[2]:
+            anterior = (personal_id, comienzo, final, clave)
+    return encontrados
@@ -0,0 +1,385 @@
+"""
+Importación masiva de personal (y opcionalmente sus asignaciones) desde
+CSV o XLSX.
+
+El archivo se lee fila por fila: las filas válidas se acumulan en tandas de
+TAMANO_TANDA y cada tanda entra con un único executemany. Antes de empezar
+se cargan en memoria los DNI existentes (normalizados, sin puntos ni
+guiones) y las obras: validar una fila no consulta la base, y un DNI
+repetido se detecta tanto contra la base como dentro del mismo archivo.
+
+Columnas reconocidas (la primera fila es el encabezado; no importan
+mayúsculas, acentos ni espacios):
+    nombre, apellido                 requeridas
+    dni, email, telefono, fecha_nacimiento, domicilio, ciudad, provincia,
+    codigo_postal, fecha_ingreso     opcionales
+    obra_id u obra (nombre), puesto, salario_diario, fecha_asignacion
+                                     si hay obra se crea la asignación
+
+Una fila con un DNI ya cargado en la base y con obra solo agrega la
+asignación al empleado existente (si no se superpone con otra suya, ver
+servicios/vigencias.py); sin obra es un error. Las filas con
+error no se insertan y se devuelven para el reporte (ver reporte_csv).
+"""
+
+import csv
+import io
+import os
+import re
+import unicodedata
+import uuid
+from datetime import date, datetime
+
+from sqlalchemy import insert, select
+
+from app import db
+from models import Personal, Obra, Asignacion
+from servicios import cambios, vigencias
+
+# Filas válidas por executemany
+TAMANO_TANDA = 1000
+
+EXTENSIONES = ('.csv', '.xlsx')
+
+_LONGITUDES = {
+    'nombre': 100, 'apellido': 100, 'email': 100, 'telefono': 20, 'dni': 20,
+    'domicilio': 200, 'ciudad': 100, 'provincia': 100, 'codigo_postal': 10,
+    'puesto': 100,
+}
+_COLUMNAS_PERSONAL = ('nombre', 'apellido', 'email', 'telefono', 'dni', 'fecha_nacimiento',
+                      'domicilio', 'ciudad', 'provincia', 'codigo_postal', 'fecha_ingreso')
+
+# Encabezados alternativos habituales en planillas
+_ALIAS = {
+    'documento': 'dni',
+    'nro_documento': 'dni',
+    'correo': 'email',
+    'mail': 'email',
+    'cp': 'codigo_postal',
+    'nacimiento': 'fecha_nacimiento',
+    'fecha_de_nacimiento': 'fecha_nacimiento',
+    'ingreso': 'fecha_ingreso',
+    'fecha_de_ingreso': 'fecha_ingreso',
+    'fecha_de_asignacion': 'fecha_asignacion',
+    'salario': 'salario_diario',
+    'obra_nombre': 'obra',
+}
+
+COLUMNAS_REPORTE = ('fila', 'dni', 'error')
+
+
+class ArchivoInvalido(ValueError):
+    """El archivo no se puede leer o no tiene las columnas requeridas"""
+
+
+def normalizar_dni(valor):
+    return re.sub(r'[\s.\-]', '', valor or '')
+
+
+def _encabezado(valor):
+    texto = unicodedata.normalize('NFKD', str(valor or '')).encode('ascii', 'ignore').decode()
+    texto = re.sub(r'[^a-z0-9]+', '_', texto.strip().lower()).strip('_')
+    return _ALIAS.get(texto, texto)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        # Números de planilla: 30123456.0 -> '30123456'
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _fecha(valor):
+    """Fecha ISO; acepta también DD/MM/YYYY y las fechas de una planilla"""
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = _texto(valor)
+    if not texto:
+        return None
+    for formato in ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y'):
+        try:
+            return datetime.strptime(texto[:10], formato).date()
+        except ValueError:
+            pass
+    raise ValueError(f'Fecha inválida: {texto}')
+
+
+def _numero(valor):
+    """Acepta 1234.5 y el formato local 1.234,50"""
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = _texto(valor)
+    if not texto:
+        return None
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    return float(texto)
+
+
+# ---------------------------------------------------------------- lectura
+
+def _filas_csv(flujo):
+    """flujo es un archivo binario; se decodifica de a poco"""
+    texto = io.TextIOWrapper(flujo, encoding='utf-8-sig', newline='')
+    try:
+        muestra = texto.readline()
+    except UnicodeDecodeError:
+        raise ArchivoInvalido('El CSV debe estar codificado en UTF-8')
+    # Las planillas en castellano suelen exportar con punto y coma
+    separador = ';' if muestra.count(';') > muestra.count(',') else ','
+    encabezados = next(csv.reader([muestra], delimiter=separador), None)
+    if not encabezados:
+        raise ArchivoInvalido('El archivo está vacío')
+    yield [_encabezado(e) for e in encabezados]
+    try:
+        yield from csv.reader(texto, delimiter=separador)
+    except UnicodeDecodeError:
+        raise ArchivoInvalido('El CSV debe estar codificado en UTF-8')
+
+
+def _filas_xlsx(flujo):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ArchivoInvalido('Para importar XLSX hace falta openpyxl (pip install openpyxl); '
+                              'o exporte la planilla como CSV')
+    try:
+        libro = openpyxl.load_workbook(flujo, read_only=True, data_only=True)
+    except Exception as e:
+        raise ArchivoInvalido(f'No se pudo leer la planilla: {e}')
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+        encabezados = next(filas, None)
+        if not encabezados:
+            raise ArchivoInvalido('La planilla está vacía')
+        yield [_encabezado(e) for e in encabezados]
+        yield from filas
+    finally:
+        libro.close()
+
+
+def leer(flujo, nombre_archivo):
+    """
+    Generador de (número de fila, dict columna -> valor) del archivo.
+    El número de fila es el de la planilla: el encabezado es la fila 1.
+    """
+    extension = os.path.splitext(nombre_archivo or '')[1].lower()
+    if extension not in EXTENSIONES:
+        raise ArchivoInvalido(f"Formato no soportado: '{extension}' (se acepta CSV o XLSX)")
+    filas = _filas_xlsx(flujo) if extension == '.xlsx' else _filas_csv(flujo)
+
+    encabezados = next(filas)
+    faltantes = {'nombre', 'apellido'} - set(encabezados)
+    if faltantes:
+        raise ArchivoInvalido(f"Faltan columnas requeridas: {', '.join(sorted(faltantes))}")
+
+    for numero, valores in enumerate(filas, start=2):
+        if not any(_texto(v) for v in valores):
+            continue
+        yield numero, dict(zip(encabezados, valores))
+
+
+# ------------------------------------------------------------- validación
+
+def _insertar_todos(modelo, filas):
+    """
+    Inserta las filas en un executemany y devuelve los ids en el mismo orden.
+
+    RETURNING no garantiza el orden de las filas, pero los ids nuevos se
+    asignan crecientes en el orden del insert: alcanza con ordenarlos.
+    (sort_by_parameter_order haría que SQLite inserte fila por fila.)
+    """
+    return sorted(db.session.scalars(insert(modelo).returning(modelo.id), filas))
+
+
+class _Importacion:
+    def __init__(self, simular):
+        self.simular = simular
+        self.filas = 0
+        self.personal_creado = 0
+        self.asignaciones_creadas = 0
+        self.errores = []
+        self.tanda = []
+        # DNI normalizado -> id (None mientras la fila espera su tanda)
+        self.dnis = {}
+        for personal_id, dni in db.session.execute(select(Personal.id, Personal.dni)
+                                                   .where(Personal.dni.is_not(None))):
+            if normalizar_dni(dni):
+                self.dnis[normalizar_dni(dni)] = personal_id
+        self.obras_por_id = set()
+        self.obras_por_nombre = {}
+        for obra_id, nombre in db.session.execute(select(Obra.id, Obra.nombre)):
+            self.obras_por_id.add(obra_id)
+            self.obras_por_nombre[(nombre or '').strip().lower()] = obra_id
+        # Antes de insertar nada: el índice no debe ver cambios sin commit
+        vigencias.indice.actualizar()
+
+    def _obra(self, fila):
+        obra_id, nombre = _texto(fila.get('obra_id')), _texto(fila.get('obra'))
+        if obra_id:
+            if not obra_id.isdigit() or int(obra_id) not in self.obras_por_id:
+                raise ValueError(f'Obra {obra_id} inexistente')
+            return int(obra_id)
+        if nombre:
+            if nombre.lower() not in self.obras_por_nombre:
+                raise ValueError(f'Obra "{nombre}" inexistente')
+            return self.obras_por_nombre[nombre.lower()]
+        return None
+
+    def validar(self, numero, fila):
+        """Devuelve la fila lista para insertar; ValueError con el motivo si no es válida"""
+        datos = {columna: _texto(fila.get(columna)) or None for columna in _COLUMNAS_PERSONAL}
+        if not datos['nombre'] or not datos['apellido']:
+            raise ValueError('Nombre y Apellido son requeridos')
+        for columna, maximo in _LONGITUDES.items():
+            valor = datos.get(columna) if columna in datos else _texto(fila.get(columna))
+            if valor and len(valor) > maximo:
+                raise ValueError(f'{columna} supera los {maximo} caracteres')
+        if datos['email'] and '@' not in datos['email']:
+            raise ValueError(f"Email inválido: {datos['email']}")
+        for columna in ('fecha_nacimiento', 'fecha_ingreso'):
+            fecha = _fecha(fila.get(columna))
+            # En personal las fechas se guardan como texto ISO
+            datos[columna] = fecha.isoformat() if fecha else None
+
+        obra_id = self._obra(fila)
+        asignacion = None
+        if obra_id is not None:
+            try:
+                salario = _numero(fila.get('salario_diario'))
+            except ValueError:
+                raise ValueError(f"salario_diario inválido: {_texto(fila.get('salario_diario'))}")
+            if salario is not None and salario < 0:
+                raise ValueError('salario_diario no puede ser negativo')
+            asignacion = {
+                'obra_id': obra_id,
+                'fecha_asignacion': _fecha(fila.get('fecha_asignacion'))
+                                    or _fecha(datos['fecha_ingreso']) or date.today(),
+                'puesto': _texto(fila.get('puesto')) or None,
+                'salario_diario': salario,
+            }
+
+        dni = normalizar_dni(datos['dni'])
+        if datos['dni'] and not dni.isalnum():
+            raise ValueError(f"DNI inválido: {datos['dni']}")
+        existente = None
+        if dni and dni in self.dnis:
+            existente = self.dnis[dni]
+            if existente is None:
+                raise ValueError(f"DNI {datos['dni']} repetido en el archivo")
+            if asignacion is None:
+                raise ValueError(f"DNI {datos['dni']} ya registrado")
+            intervalos = vigencias.indice.intervalos(existente)
+            superpuesta = intervalos and next(
+                intervalos.superpuestas(asignacion['fecha_asignacion']), None)
+            if superpuesta:
+                raise vigencias.AsignacionSuperpuesta(superpuesta)
+        if dni:
+            # Un segundo renglón del mismo DNI en el archivo es un error
+            self.dnis[dni] = None
+        return {'fila': numero, 'personal': datos, 'personal_id': existente,
+                'asignacion': asignacion}
+
+    def agregar(self, numero, fila):
+        self.filas += 1
+        try:
+            self.tanda.append(self.validar(numero, fila))
+        except ValueError as e:
+            self.errores.append({'fila': numero, 'dni': _texto(fila.get('dni')), 'error': str(e)})
+            return
+        if len(self.tanda) >= TAMANO_TANDA:
+            self.insertar()
+
+    def insertar(self):
+        tanda, self.tanda = self.tanda, []
+        nuevos = [f for f in tanda if f['personal_id'] is None]
+        self.personal_creado += len(nuevos)
+        self.asignaciones_creadas += sum(1 for f in tanda if f['asignacion'])
+        if self.simular or not tanda:
+            return
+
+        if nuevos:
+            ids = _insertar_todos(Personal, [f['personal'] for f in nuevos])
+            for fila, personal_id in zip(nuevos, ids):
+                fila['personal_id'] = personal_id
+                dni = normalizar_dni(fila['personal']['dni'])
+                if dni:
+                    self.dnis[dni] = personal_id
+            # El executemany no pasa por el ORM: los cambios se registran a mano
+            cambios.registrar('personal', ids, cambios.ALTA)
+
+        asignaciones = [dict(f['asignacion'], personal_id=f['personal_id'])
+                        for f in tanda if f['asignacion']]
+        if asignaciones:
+            ids = _insertar_todos(Asignacion, asignaciones)
+            por_obra = {}
+            for asignacion, asignacion_id in zip(asignaciones, ids):
+                por_obra.setdefault(asignacion['obra_id'], []).append(asignacion_id)
+            for obra_id, ids_obra in por_obra.items():
+                cambios.registrar('asignaciones', ids_obra, cambios.ALTA, obra_id)
+
+    def resumen(self):
+        return {
+            'filas': self.filas,
+            'personal_creado': self.personal_creado,
+            'asignaciones_creadas': self.asignaciones_creadas,
+            'errores': len(self.errores),
+            'simulacion': self.simular,
+        }
+
+
+def importar(filas, simular=False):
+    """
+    Valida e inserta las filas de leer(). No hace commit. Con simular=True
+    solo valida. Devuelve (resumen, errores) con un error por fila
+    rechazada: {'fila', 'dni', 'error'}.
+    """
+    importacion = _Importacion(simular)
+    for numero, fila in filas:
+        importacion.agregar(numero, fila)
+    importacion.insertar()
+    return importacion.resumen(), importacion.errores
+
+
+def reporte_csv(errores, destino):
+    """Escribe el reporte de errores en un archivo de texto abierto"""
+    escritor = csv.DictWriter(destino, fieldnames=COLUMNAS_REPORTE)
+    escritor.writeheader()
+    escritor.writerows(errores)
+
+
+# ---------------------------------------------------------------- reportes
+
+CARPETA_REPORTES = 'importaciones'
+# Los reportes viejos se borran al guardar uno nuevo
+DIAS_REPORTES = 7
+
+
+def guardar_reporte(errores, carpeta):
+    """Guarda el reporte en la carpeta y devuelve su identificador"""
+    os.makedirs(carpeta, exist_ok=True)
+    limite = datetime.now().timestamp() - DIAS_REPORTES * 86400
+    for nombre in os.listdir(carpeta):
+        ruta = os.path.join(carpeta, nombre)
+        try:
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+        except OSError:
+            pass
+    identificador = uuid.uuid4().hex
+    with open(os.path.join(carpeta, f'{identificador}.csv'), 'w',
+              encoding='utf-8', newline='') as destino:
+        reporte_csv(errores, destino)
+    return identificador
+
+
+def ruta_reporte(carpeta, identificador):
+    """Ruta del reporte guardado, o None si el identificador no es válido o no existe"""
+    if not re.fullmatch(r'[0-9a-f]{32}', identificador or ''):
+        return None
+    ruta = os.path.join(carpeta, f'{identificador}.csv')
+    return ruta if os.path.exists(ruta) else None
@@ -0,0 +1,216 @@
+"""
+Liquidación de haberes por empleado y obra para un período.
+
+Todo el cálculo se hace con agregaciones en SQL (GROUP BY personal, obra):
+una consulta para el presentismo, otra para las horas y una para los
+nombres. Python solo combina los resultados ya agrupados. Las horas
+nocturnas y extra se suman tal como quedaron guardadas en cada fichada.
+
+El monto se calcula día por día con el salario diario de la asignación
+vigente en cada fecha, de modo que un cambio de salario a mitad del período
+se liquida correctamente. El detalle por día (detalle_dias) une cada fila
+de presentismo con su asignación vigente usando el índice en memoria de
+servicios/vigencias.py, con la misma regla que la subconsulta.
+
+Los períodos archivados se leen de la base de archivo (servicios/archivo.py).
+"""
+
+from sqlalchemy import select, func, case, or_
+
+from app import db
+from models import Personal, Obra, Asignacion, Presentismo, IngresoEgreso
+from servicios import vigencias, archivo
+
+# Tipos de presentismo que se pagan con el salario diario de la asignación
+TIPOS_REMUNERADOS = ('presente', 'vacacion')
+
+# Horas de las fichadas, ya calculadas al escribir (servicios/horas.py)
+CAMPOS_HORAS = ('horas_trabajadas', 'horas_nocturnas', 'horas_extra')
+
+# Columna de salida por cada tipo de presentismo
+_CONTADORES = {
+    'presente': 'dias_presentes',
+    'ausente_justificado': 'ausencias_justificadas',
+    'ausente_sin_aviso': 'ausencias_injustificadas',
+    'art': 'dias_art',
+    'vacacion': 'dias_vacaciones',
+    'franco': 'dias_franco',
+}
+
+
+def _contar(columna, valor):
+    return func.sum(case((columna == valor, 1), else_=0))
+
+
+def _salario_vigente(presentismo):
+    """
+    Subconsulta con el salario diario de la asignación vigente en la fecha.
+    Para los totales es más rápida que traer cada día a Python: se resuelve
+    con ix_asignaciones_personal_fecha sin salir de SQLite.
+    """
+    asignaciones = Asignacion.__table__
+    return (
+        select(asignaciones.c.salario_diario)
+        .where(
+            asignaciones.c.personal_id == presentismo.c.personal_id,
+            asignaciones.c.obra_id == presentismo.c.obra_id,
+            asignaciones.c.fecha_asignacion <= presentismo.c.fecha,
+            or_(asignaciones.c.fecha_fin.is_(None),
+                asignaciones.c.fecha_fin >= presentismo.c.fecha),
+        )
+        .order_by(asignaciones.c.fecha_asignacion.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _consulta_presentismo(fecha_inicio, fecha_fin, filtros):
+    presentismo = Presentismo.__table__
+    dias = (
+        select(
+            presentismo.c.personal_id,
+            presentismo.c.obra_id,
+            presentismo.c.tipo,
+            _salario_vigente(presentismo).label('salario'),
+        )
+        .where(presentismo.c.fecha.between(fecha_inicio, fecha_fin), *filtros(presentismo))
+        .subquery()
+    )
+    remunerado = dias.c.tipo.in_(TIPOS_REMUNERADOS)
+
+    return (
+        select(
+            dias.c.personal_id,
+            dias.c.obra_id,
+            *(_contar(dias.c.tipo, tipo).label(nombre)
+              for tipo, nombre in _CONTADORES.items()),
+            func.sum(case((remunerado, 1), else_=0)).label('dias_remunerados'),
+            func.sum(case((remunerado, func.coalesce(dias.c.salario, 0)), else_=0)).label('monto'),
+            func.max(dias.c.salario).label('salario_diario'),
+        )
+        .group_by(dias.c.personal_id, dias.c.obra_id)
+    )
+
+
+def _consulta_horas(fecha_inicio, fecha_fin, filtros):
+    registros = IngresoEgreso.__table__
+    return (
+        select(
+            registros.c.personal_id,
+            registros.c.obra_id,
+            *(func.coalesce(func.sum(registros.c[campo]), 0).label(campo)
+              for campo in CAMPOS_HORAS),
+        )
+        .where(registros.c.fecha.between(fecha_inicio, fecha_fin), *filtros(registros))
+        .group_by(registros.c.personal_id, registros.c.obra_id)
+    )
+
+
+def _fila_vacia(personal_id, obra_id):
+    fila = {'personal_id': personal_id, 'obra_id': obra_id}
+    fila.update({nombre: 0 for nombre in _CONTADORES.values()})
+    fila.update({'dias_remunerados': 0, 'monto': 0.0, 'salario_diario': None})
+    fila.update({campo: 0.0 for campo in CAMPOS_HORAS})
+    return fila
+
+
+def calcular_liquidacion(fecha_inicio, fecha_fin, obra_id=None, personal_id=None):
+    """
+    Devuelve una lista de dicts, uno por (empleado, obra) con actividad en
+    el período, ordenada por apellido, nombre y obra.
+    """
+    def filtros(tabla):
+        condiciones = []
+        if obra_id is not None:
+            condiciones.append(tabla.c.obra_id == obra_id)
+        if personal_id is not None:
+            condiciones.append(tabla.c.personal_id == personal_id)
+        return condiciones
+
+    filas = {}
+    consulta = archivo.adaptar(_consulta_presentismo(fecha_inicio, fecha_fin, filtros),
+                               Presentismo, fecha_inicio=fecha_inicio)
+    for fila in db.session.execute(consulta):
+        datos = fila._asdict()
+        datos['monto'] = float(datos['monto'] or 0)
+        filas[(datos['personal_id'], datos['obra_id'])] = {
+            **_fila_vacia(datos['personal_id'], datos['obra_id']), **datos
+        }
+
+    consulta = archivo.adaptar(_consulta_horas(fecha_inicio, fecha_fin, filtros),
+                               IngresoEgreso, fecha_inicio=fecha_inicio)
+    for fila in db.session.execute(consulta):
+        clave = (fila.personal_id, fila.obra_id)
+        if clave not in filas:
+            filas[clave] = _fila_vacia(*clave)
+        for campo in CAMPOS_HORAS:
+            filas[clave][campo] = float(getattr(fila, campo))
+
+    if not filas:
+        return []
+
+    personal_ids = {p for p, _ in filas}
+    obra_ids = {o for _, o in filas}
+    personal = {
+        f.id: f for f in db.session.execute(
+            select(Personal.id, Personal.nombre, Personal.apellido)
+            .where(Personal.id.in_(personal_ids))
+        )
+    }
+    obras = dict(db.session.execute(
+        select(Obra.id, Obra.nombre).where(Obra.id.in_(obra_ids))
+    ).all())
+
+    resultado = []
+    for (pid, oid), fila in filas.items():
+        empleado = personal.get(pid)
+        fila['personal_nombre'] = empleado.nombre if empleado else None
+        fila['personal_apellido'] = empleado.apellido if empleado else None
+        fila['obra_nombre'] = obras.get(oid)
+        resultado.append(fila)
+
+    resultado.sort(key=lambda f: (f['personal_apellido'] or '', f['personal_nombre'] or '',
+                                  f['obra_nombre'] or ''))
+    return resultado
+
+
+def totalizar(filas):
+    """Suma los contadores, horas y montos de todas las filas"""
+    campos = list(_CONTADORES.values()) + ['dias_remunerados', *CAMPOS_HORAS, 'monto']
+    return {campo: sum(f[campo] for f in filas) for campo in campos}
+
+
+def detalle_dias(fecha_inicio, fecha_fin, obra_id=None, personal_id=None):
+    """
+    Una fila por registro de presentismo del período con la asignación
+    vigente ese día (id, puesto y salario diario) y el monto que aporta.
+    """
+    presentismo = Presentismo.__table__
+    consulta = (
+        select(presentismo.c.personal_id, presentismo.c.obra_id,
+               presentismo.c.fecha, presentismo.c.tipo)
+        .where(presentismo.c.fecha.between(fecha_inicio, fecha_fin))
+        .order_by(presentismo.c.personal_id, presentismo.c.fecha)
+    )
+    if obra_id is not None:
+        consulta = consulta.where(presentismo.c.obra_id == obra_id)
+    if personal_id is not None:
+        consulta = consulta.where(presentismo.c.personal_id == personal_id)
+
+    consulta = archivo.adaptar(consulta, Presentismo, fecha_inicio=fecha_inicio)
+    filas = db.session.execute(consulta).all()
+    resultado = []
+    dias = vigencias.vigentes((f.personal_id, f.obra_id, f.fecha) for f in filas)
+    for fila, vigencia in zip(filas, dias):
+        salario = vigencia.salario_diario if vigencia else None
+        resultado.append({
+            'personal_id': fila.personal_id,
+            'obra_id': fila.obra_id,
+            'fecha': fila.fecha.isoformat(),
+            'tipo': fila.tipo,
+            'asignacion_id': vigencia.id if vigencia else None,
+            'puesto': vigencia.puesto if vigencia else None,
+            'salario_diario': salario,
+            'monto': float(salario or 0) if fila.tipo in TIPOS_REMUNERADOS else 0.0,
+        })
+    return resultado
@@ -0,0 +1,165 @@
+"""
+Filtros, orden y paginación por cursor (keyset) para los listados de la API.
+
+Parámetros aceptados en la query string:
+    limit          cantidad de filas por página (por defecto 100, máximo 1000)
+    after          cursor devuelto en el header X-Siguiente-Cursor
+    sort           id, -id, fecha o -fecha (fecha solo en tablas con fecha)
+    personal_id, obra_id, estado, tipo    filtros por igualdad
+    fecha_inicio, fecha_fin               rango de fechas (ambos opcionales)
+
+Presentismo y fichadas incluyen los meses archivados cuando el rango los
+alcanza: sin fecha_inicio, o con una fecha_inicio anterior al corte.
+"""
+
+import base64
+import json
+
+from sqlalchemy import Date, tuple_
+
+from app import db
+from models import Personal, Obra, Asignacion, Presentismo, IngresoEgreso
+from servicios import archivo
+from servicios.serializacion import consulta_plana, fila_a_dict
+from servicios.fechas import parsear_fecha
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 1000
+
+
+class ParametroInvalido(ValueError):
+    """Parámetro de listado mal formado"""
+
+
+# Columna de fecha (para rango y orden) y filtros por igualdad de cada modelo.
+# Solo se ordena por fecha en tablas donde la columna es obligatoria.
+_LISTADOS = {
+    Personal: {'fecha': Personal.fecha_ingreso, 'ordenable': False,
+               'filtros': ('estado',)},
+    Obra: {'fecha': Obra.fecha_inicio, 'ordenable': False,
+           'filtros': ('estado',)},
+    Asignacion: {'fecha': Asignacion.fecha_asignacion, 'ordenable': True,
+                 'filtros': ('personal_id', 'obra_id', 'estado')},
+    Presentismo: {'fecha': Presentismo.fecha, 'ordenable': True,
+                  'filtros': ('personal_id', 'obra_id', 'tipo')},
+    IngresoEgreso: {'fecha': IngresoEgreso.fecha, 'ordenable': True,
+                    'filtros': ('personal_id', 'obra_id')},
+}
+
+_FILTROS_ENTEROS = ('personal_id', 'obra_id')
+
+
+def _entero(nombre, valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ParametroInvalido(f'{nombre} debe ser un número entero')
+
+
+def _valor_fecha(columna, valor):
+    """Convierte el texto recibido al tipo de la columna de fecha"""
+    if not isinstance(columna.type, Date):
+        return valor
+    try:
+        return parsear_fecha(valor)
+    except ValueError as e:
+        raise ParametroInvalido(str(e))
+
+
+def codificar_cursor(valores):
+    texto = json.dumps(valores, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except ValueError:
+        raise ParametroInvalido('Cursor inválido')
+    if not isinstance(valores, list):
+        raise ParametroInvalido('Cursor inválido')
+    return valores
+
+
+def filtrar(modelo, args):
+    """Devuelve la query del modelo con los filtros de args aplicados"""
+    config = _LISTADOS[modelo]
+    query = modelo.query
+
+    for nombre in config['filtros']:
+        valor = args.get(nombre)
+        if not valor:
+            continue
+        if nombre in _FILTROS_ENTEROS:
+            valor = _entero(nombre, valor)
+        query = query.filter(getattr(modelo, nombre) == valor)
+
+    fecha_inicio = args.get('fecha_inicio')
+    fecha_fin = args.get('fecha_fin')
+    if fecha_inicio:
+        query = query.filter(config['fecha'] >= _valor_fecha(config['fecha'], fecha_inicio))
+    if fecha_fin:
+        query = query.filter(config['fecha'] <= _valor_fecha(config['fecha'], fecha_fin))
+    return query
+
+
+def _orden(modelo, args):
+    """Devuelve (columnas de orden, descendente) según el parámetro sort"""
+    config = _LISTADOS[modelo]
+    sort = args.get('sort', 'id')
+    descendente = sort.startswith('-')
+    campo = sort.lstrip('-')
+
+    if campo == 'id':
+        return (modelo.id,), descendente
+    if campo == 'fecha' and config['ordenable']:
+        return (config['fecha'], modelo.id), descendente
+    raise ParametroInvalido(f'Orden no soportado: {sort}')
+
+
+def paginar(query, modelo, args):
+    """
+    Aplica orden y cursor a una query filtrada.
+    Devuelve (filas como dicts, cursor siguiente o None).
+    """
+    limite = _entero('limit', args.get('limit', LIMITE_POR_DEFECTO))
+    if limite < 1:
+        raise ParametroInvalido('limit debe ser mayor a cero')
+    limite = min(limite, LIMITE_MAXIMO)
+
+    columnas, descendente = _orden(modelo, args)
+
+    after = args.get('after')
+    if after:
+        valores = decodificar_cursor(after)
+        if len(valores) != len(columnas):
+            raise ParametroInvalido('El cursor no corresponde al orden pedido')
+        valores = [_valor_fecha(c, v) for c, v in zip(columnas, valores)]
+        clave = tuple_(*columnas) if len(columnas) > 1 else columnas[0]
+        limite_cursor = tuple_(*valores) if len(valores) > 1 else valores[0]
+        query = query.filter(clave < limite_cursor if descendente else clave > limite_cursor)
+
+    query = query.order_by(*(c.desc() if descendente else c.asc() for c in columnas))
+
+    # Se pide una fila extra para saber si hay una página siguiente
+    consulta = consulta_plana(query, modelo).limit(limite + 1)
+    if modelo.__tablename__ in archivo.TABLAS:
+        # adaptar() deja la consulta como está si el rango empieza después del corte
+        fecha_inicio = args.get('fecha_inicio')
+        desde = _valor_fecha(_LISTADOS[modelo]['fecha'], fecha_inicio) if fecha_inicio else None
+        consulta = db.session.execute(archivo.adaptar(consulta.statement, modelo,
+                                                      fecha_inicio=desde))
+    filas = [fila_a_dict(f) for f in consulta]
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        ultima = filas[-1]
+        nombres_orden = [c.key for c in columnas]
+        siguiente = codificar_cursor([ultima[n] for n in nombres_orden])
+    return filas, siguiente
+
+
+def listar(modelo, args):
+    """Filtra y pagina un listado a partir de los parámetros del request"""
+    return paginar(filtrar(modelo, args), modelo, args)
@@ -0,0 +1,116 @@
+"""
+Carga de presentismo de toda una cuadrilla en una sola transacción.
+
+Las filas se validan juntas (una consulta para verificar los empleados y
+otra para ver cuáles ya tenían registro ese día) y las válidas se insertan
+con un único executemany que hace upsert sobre uq_presentismo.
+"""
+
+from sqlalchemy import select
+
+from app import db
+from models import Personal, Presentismo, TIPOS_PRESENTISMO
+from servicios.upsert import insert
+from servicios import resumen_diario, cambios
+
+
+def _validar(registros):
+    """Devuelve (válidos por personal_id, errores por posición)"""
+    errores = {}
+    validos = {}
+    for i, registro in enumerate(registros):
+        if not isinstance(registro, dict):
+            errores[i] = 'Registro inválido'
+            continue
+        try:
+            personal_id = int(registro.get('personal_id'))
+        except (TypeError, ValueError):
+            errores[i] = 'personal_id es requerido'
+            continue
+        if registro.get('tipo') not in TIPOS_PRESENTISMO:
+            errores[i] = f"Tipo de presentismo inválido: {registro.get('tipo')}"
+        elif personal_id in validos:
+            errores[i] = 'Empleado repetido en el lote'
+        else:
+            validos[personal_id] = (i, registro)
+    return validos, errores
+
+
+def registrar_lote(obra_id, fecha, registros):
+    """
+    Inserta o actualiza el presentismo de cada empleado de la lista para la
+    obra y fecha dadas. No hace commit. Devuelve un resultado por registro,
+    en el mismo orden recibido.
+    """
+    validos, errores = _validar(registros)
+
+    if validos:
+        existentes_personal = set(db.session.scalars(
+            select(Personal.id).where(Personal.id.in_(validos))
+        ))
+        for personal_id in list(validos):
+            if personal_id not in existentes_personal:
+                i, _ = validos.pop(personal_id)
+                errores[i] = f'Empleado {personal_id} inexistente'
+
+    resultados = [None] * len(registros)
+    for i, mensaje in errores.items():
+        personal_id = registros[i].get('personal_id') if isinstance(registros[i], dict) else None
+        resultados[i] = {'personal_id': personal_id, 'estado': 'error', 'error': mensaje}
+
+    if not validos:
+        return resultados
+
+    previos = set(db.session.scalars(
+        select(Presentismo.personal_id).where(
+            Presentismo.obra_id == obra_id,
+            Presentismo.fecha == fecha,
+            Presentismo.personal_id.in_(validos),
+        )
+    ))
+
+    stmt = insert(Presentismo)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['personal_id', 'obra_id', 'fecha'],
+        set_={
+            'tipo': stmt.excluded.tipo,
+            'descripcion': stmt.excluded.descripcion,
+            'notas': stmt.excluded.notas,
+        }
+    )
+    db.session.execute(stmt, [
+        {
+            'personal_id': personal_id,
+            'obra_id': obra_id,
+            'fecha': fecha,
+            'tipo': registro['tipo'],
+            'descripcion': registro.get('descripcion'),
+            'notas': registro.get('notas'),
+        }
+        for personal_id, (_, registro) in validos.items()
+    ])
+
+    ids = dict(db.session.execute(
+        select(Presentismo.personal_id, Presentismo.id).where(
+            Presentismo.obra_id == obra_id,
+            Presentismo.fecha == fecha,
+            Presentismo.personal_id.in_(validos),
+        )
+    ).all())
+
+    for personal_id, (i, _) in validos.items():
+        resultados[i] = {
+            'personal_id': personal_id,
+            'id': ids.get(personal_id),
+            'estado': 'actualizado' if personal_id in previos else 'creado',
+        }
+
+    # El upsert no pasa por el ORM: los cambios se registran a mano
+    creados = [ids[p] for p in validos if p not in previos and p in ids]
+    actualizados = [ids[p] for p in validos if p in previos and p in ids]
+    cambios.registrar('presentismo', creados, cambios.ALTA, obra_id)
+    cambios.registrar('presentismo', actualizados, cambios.MODIFICACION, obra_id)
+
+    # El día completo se recalcula desde el origen: es una sola consulta
+    resumen_diario.reconstruir(obra_id=obra_id, fecha_inicio=fecha, fecha_fin=fecha)
+    return resultados
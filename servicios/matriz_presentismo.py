@@ -0,0 +1,127 @@
+"""
+Matriz de presentismo de una obra para un mes: empleados por días.
+
+Se arma con una sola consulta (presentismo de la obra en el mes, unido a
+personal y ordenado por apellido) y se devuelve en formato columnar: una
+cadena por empleado con un código por día, más los totales por empleado y
+por día para cada tipo. Para una obra de 300 empleados son unos pocos KiB
+en lugar de miles de objetos del listado plano.
+
+Las matrices quedan en memoria por (obra, mes) junto con la versión de los
+cambios de presentismo de esa obra y la de personal (nombres). Un alta,
+modificación o baja de presentismo en la obra sube esa versión y la
+matriz se rearma en el siguiente pedido; como la versión se lee de
+registro_cambios, vale también entre workers.
+"""
+
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from sqlalchemy import select
+
+from app import db
+from models import Personal, Presentismo
+from servicios import cambios, archivo
+
+# Un carácter por tipo de presentismo; VACIO si no hay registro ese día
+CODIGOS = {
+    'presente': 'P',
+    'ausente_justificado': 'J',
+    'ausente_sin_aviso': 'A',
+    'art': 'T',
+    'vacacion': 'V',
+    'franco': 'F',
+}
+VACIO = '-'
+
+MAXIMO_MATRICES = 200
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def parsear_mes(valor):
+    """Convierte 'YYYY-MM' en (primer día, último día)"""
+    try:
+        anio, mes = (int(parte) for parte in str(valor).split('-'))
+        inicio = date(anio, mes, 1)
+    except (TypeError, ValueError):
+        raise ValueError(f'Mes inválido: {valor} (se espera YYYY-MM)')
+    return inicio, inicio.replace(day=calendar.monthrange(anio, mes)[1])
+
+
+def version(obra_id):
+    """Versión de los datos de la matriz de una obra (cualquier mes)"""
+    return (cambios.version_obra('presentismo', obra_id), cambios.version_actual(['personal']))
+
+
+def _armar(obra_id, inicio, fin):
+    dias = fin.day
+    consulta = (
+        select(Presentismo.personal_id, Personal.apellido, Personal.nombre,
+               Presentismo.fecha, Presentismo.tipo)
+        .join(Personal, Presentismo.personal_id == Personal.id)
+        .where(Presentismo.obra_id == obra_id, Presentismo.fecha.between(inicio, fin))
+        .order_by(Personal.apellido, Personal.nombre, Presentismo.personal_id)
+    )
+    filas = db.session.execute(archivo.adaptar(consulta, Presentismo, fecha_inicio=inicio))
+
+    ids, apellidos, nombres, celdas = [], [], [], []
+    por_empleado = {codigo: [] for codigo in CODIGOS.values()}
+    por_dia = {codigo: [0] * dias for codigo in CODIGOS.values()}
+    fila_actual = None
+    for personal_id, apellido, nombre, fecha, tipo in filas:
+        if not ids or personal_id != ids[-1]:
+            if fila_actual is not None:
+                celdas.append(''.join(fila_actual))
+            ids.append(personal_id)
+            apellidos.append(apellido)
+            nombres.append(nombre)
+            fila_actual = [VACIO] * dias
+            for totales in por_empleado.values():
+                totales.append(0)
+        codigo = CODIGOS.get(tipo)
+        if codigo is None:
+            continue
+        fila_actual[fecha.day - 1] = codigo
+        por_empleado[codigo][-1] += 1
+        por_dia[codigo][fecha.day - 1] += 1
+    if fila_actual is not None:
+        celdas.append(''.join(fila_actual))
+
+    return {
+        'obra_id': obra_id,
+        'mes': inicio.strftime('%Y-%m'),
+        'dias': dias,
+        'codigos': {codigo: tipo for tipo, codigo in CODIGOS.items()},
+        'vacio': VACIO,
+        'empleados': {'id': ids, 'apellido': apellidos, 'nombre': nombres},
+        'celdas': celdas,
+        'totales_empleado': por_empleado,
+        'totales_dia': por_dia,
+    }
+
+
+def obtener(obra_id, inicio, fin, version_vigente=None):
+    """
+    Matriz de la obra para el mes que empieza en inicio. version_vigente es
+    el resultado de version(obra_id) si el llamador ya lo consultó.
+    """
+    version_vigente = version_vigente or version(obra_id)
+    clave = (obra_id, inicio)
+    with _lock:
+        guardada = _cache.get(clave)
+        if guardada is not None and guardada[0] == version_vigente:
+            _cache.move_to_end(clave)
+            return guardada[1]
+
+    matriz = _armar(obra_id, inicio, fin)
+    with _lock:
+        _cache[clave] = (version_vigente, matriz)
+        _cache.move_to_end(clave)
+        while len(_cache) > MAXIMO_MATRICES:
+            _cache.popitem(last=False)
+    return matriz
+
@@ -0,0 +1,224 @@
+"""
+Instrumentación por request.
+
+Para cada request registra el tiempo total, la cantidad y el tiempo de las
+sentencias SQL (eventos del engine de SQLAlchemy), el tiempo de
+serialización JSON y el tamaño de la respuesta, agrupado por blueprint y
+endpoint. Los requests que superan PERFILADO_UMBRAL_LENTO_MS quedan en un
+log de lentos con sus sentencias más costosas. Con PERFILADO_MUESTREO > 0
+esa fracción de los requests se ejecuta bajo cProfile.
+
+Las estadísticas viven en memoria de cada proceso y se consultan en
+/admin/metricas.
+
+Configuración (app.config):
+    PERFILADO_ACTIVO            activa la instrumentación (por defecto True)
+    PERFILADO_UMBRAL_LENTO_MS   umbral del log de lentos (por defecto 500)
+    PERFILADO_MUESTREO          fracción de requests con cProfile (por defecto 0)
+"""
+
+import heapq
+import io
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('nomina.perfilado')
+
+MUESTRAS_POR_ENDPOINT = 1000
+MAXIMO_LENTOS = 100
+MAXIMO_PERFILES = 20
+SENTENCIAS_POR_LENTO = 5
+
+
+class Estadisticas:
+    """Muestras recientes por endpoint, log de lentos y perfiles de cProfile"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.endpoints = {}
+            self.totales = {}
+            self.lentos = deque(maxlen=MAXIMO_LENTOS)
+            self.perfiles = deque(maxlen=MAXIMO_PERFILES)
+            self.desde = datetime.now()
+
+    def registrar(self, clave, muestra):
+        with self._lock:
+            muestras = self.endpoints.get(clave)
+            if muestras is None:
+                muestras = self.endpoints[clave] = deque(maxlen=MUESTRAS_POR_ENDPOINT)
+            muestras.append(muestra)
+            self.totales[clave] = self.totales.get(clave, 0) + 1
+
+    def registrar_lento(self, detalle):
+        with self._lock:
+            self.lentos.appendleft(detalle)
+
+    def registrar_perfil(self, detalle):
+        with self._lock:
+            self.perfiles.appendleft(detalle)
+
+    def resumen(self):
+        """Percentiles y promedios por endpoint, ordenados por p95 descendente"""
+        with self._lock:
+            copia = {clave: list(muestras) for clave, muestras in self.endpoints.items()}
+            totales = dict(self.totales)
+
+        filas = []
+        for (blueprint, endpoint), muestras in copia.items():
+            tiempos = sorted(m['ms'] for m in muestras)
+            cantidad = len(muestras)
+            tamanos = [m['bytes'] for m in muestras if m['bytes'] is not None]
+            filas.append({
+                'blueprint': blueprint,
+                'endpoint': endpoint,
+                'requests': totales[(blueprint, endpoint)],
+                'p50_ms': round(_percentil(tiempos, 50), 1),
+                'p95_ms': round(_percentil(tiempos, 95), 1),
+                'p99_ms': round(_percentil(tiempos, 99), 1),
+                'max_ms': round(tiempos[-1], 1),
+                'sql_promedio': round(sum(m['sql'] for m in muestras) / cantidad, 1),
+                'sql_ms_promedio': round(sum(m['sql_ms'] for m in muestras) / cantidad, 1),
+                'serializacion_ms_promedio': round(
+                    sum(m['serializacion_ms'] for m in muestras) / cantidad, 1),
+                'bytes_promedio': round(sum(tamanos) / len(tamanos)) if tamanos else None,
+            })
+        return sorted(filas, key=lambda f: f['p95_ms'], reverse=True)
+
+
+estadisticas = Estadisticas()
+
+
+def _percentil(ordenados, p):
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def _perfil_actual():
+    if has_request_context():
+        return g.get('_perfil')
+    return None
+
+
+class ProveedorJSONMedido(DefaultJSONProvider):
+    """Proveedor JSON de Flask que acumula el tiempo de serialización"""
+
+    def dumps(self, obj, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            perfil = _perfil_actual()
+            if perfil is not None:
+                perfil['serializacion_ms'] += (time.perf_counter() - inicio) * 1000
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_sentencia(conexion, cursor, sentencia, parametros, contexto, executemany):
+    if _perfil_actual() is not None:
+        conexion.info.setdefault('_perfilado_inicio', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_sentencia(conexion, cursor, sentencia, parametros, contexto, executemany):
+    perfil = _perfil_actual()
+    inicios = conexion.info.get('_perfilado_inicio')
+    if perfil is None or not inicios:
+        return
+    ms = (time.perf_counter() - inicios.pop()) * 1000
+    perfil['sql'] += 1
+    perfil['sql_ms'] += ms
+    # Solo se conservan las más lentas, para no acumular miles en requests masivos
+    entrada = (ms, perfil['sql'], sentencia)
+    if len(perfil['sentencias']) < SENTENCIAS_POR_LENTO:
+        heapq.heappush(perfil['sentencias'], entrada)
+    else:
+        heapq.heappushpop(perfil['sentencias'], entrada)
+
+
+def _antes_del_request():
+    g._perfil = {
+        'inicio': time.perf_counter(),
+        'sql': 0,
+        'sql_ms': 0.0,
+        'serializacion_ms': 0.0,
+        'sentencias': [],
+        'profiler': None,
+    }
+    muestreo = current_app.config['PERFILADO_MUESTREO']
+    if muestreo and random.random() < muestreo:
+        import cProfile  # solo si el muestreo está activo
+        g._perfil['profiler'] = cProfile.Profile()
+        g._perfil['profiler'].enable()
+
+
+def _despues_del_request(respuesta):
+    perfil = g.pop('_perfil', None)
+    if perfil is None:
+        return respuesta
+    ms = (time.perf_counter() - perfil['inicio']) * 1000
+    endpoint = request.endpoint or 'sin_ruta'
+    blueprint = request.blueprint or '-'
+    tamano = None if respuesta.is_streamed else respuesta.calculate_content_length()
+
+    estadisticas.registrar((blueprint, endpoint), {
+        'ms': ms,
+        'sql': perfil['sql'],
+        'sql_ms': perfil['sql_ms'],
+        'serializacion_ms': perfil['serializacion_ms'],
+        'bytes': tamano,
+    })
+    respuesta.headers['Server-Timing'] = (
+        f"app;dur={ms:.1f}, db;dur={perfil['sql_ms']:.1f}, "
+        f"json;dur={perfil['serializacion_ms']:.1f}"
+    )
+
+    ruta = request.full_path.rstrip('?')
+    if perfil['profiler'] is not None:
+        import pstats
+        perfil['profiler'].disable()
+        salida = io.StringIO()
+        pstats.Stats(perfil['profiler'], stream=salida).sort_stats('cumulative').print_stats(25)
+        estadisticas.registrar_perfil({
+            'fecha': datetime.now(), 'metodo': request.method, 'ruta': ruta,
+            'ms': round(ms, 1), 'texto': salida.getvalue(),
+        })
+
+    if ms >= current_app.config['PERFILADO_UMBRAL_LENTO_MS']:
+        peores = sorted(perfil['sentencias'], reverse=True)
+        detalle = {
+            'fecha': datetime.now(), 'metodo': request.method, 'ruta': ruta,
+            'endpoint': endpoint, 'estado': respuesta.status_code, 'ms': round(ms, 1),
+            'sql': perfil['sql'], 'sql_ms': round(perfil['sql_ms'], 1),
+            'sentencias': [{'ms': round(t, 1), 'sql': s} for t, _, s in peores],
+        }
+        estadisticas.registrar_lento(detalle)
+        logger.warning('Request lento %s %s: %.0f ms, %d SQL (%.0f ms)%s',
+                       request.method, ruta, ms, perfil['sql'], perfil['sql_ms'],
+                       ''.join(f"\n  [{s['ms']} ms] {s['sql']}" for s in detalle['sentencias']))
+    return respuesta
+
+
+def init_app(app):
+    """Registra la instrumentación en la aplicación"""
+    app.config.setdefault('PERFILADO_ACTIVO', True)
+    app.config.setdefault('PERFILADO_UMBRAL_LENTO_MS', 500)
+    app.config.setdefault('PERFILADO_MUESTREO', 0.0)
+    if not app.config['PERFILADO_ACTIVO']:
+        return
+
+    app.json = ProveedorJSONMedido(app)
+    app.before_request(_antes_del_request)
+    app.after_request(_despues_del_request)
@@ -0,0 +1,125 @@
+"""
+Mantenimiento incremental de la tabla resumen_diario.
+
+Los handlers de escritura de presentismo e ingresos/egresos llaman a estas
+funciones antes del commit, dentro de la misma transacción, con la
+diferencia que produce cada alta, modificación o baja. Los reportes leen
+una fila por obra y día en lugar de recorrer todos los registros.
+"""
+
+from sqlalchemy import select, func, delete, and_
+
+from app import db
+from models import Presentismo, IngresoEgreso, ResumenDiario, TIPOS_PRESENTISMO
+from servicios.upsert import insert
+from servicios import archivo
+
+_CONTADORES = TIPOS_PRESENTISMO + ('dotacion', 'registros_ingreso', 'horas_totales')
+
+
+def sumar(obra_id, fecha, **deltas):
+    """Suma los deltas a la fila (obra_id, fecha), creándola si no existe"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+    tabla = ResumenDiario.__table__
+    stmt = insert(ResumenDiario).values(obra_id=obra_id, fecha=fecha, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['obra_id', 'fecha'],
+        set_={k: tabla.c[k] + stmt.excluded[k] for k in deltas}
+    )
+    db.session.execute(stmt)
+
+
+def registrar_presentismo(obra_id, fecha, tipo, signo=1):
+    """Alta (signo=1) o baja (signo=-1) de un registro de presentismo"""
+    deltas = {'dotacion': signo}
+    if tipo in TIPOS_PRESENTISMO:
+        deltas[tipo] = signo
+    sumar(obra_id, fecha, **deltas)
+
+
+def cambiar_tipo_presentismo(obra_id, fecha, tipo_anterior, tipo_nuevo):
+    if tipo_anterior == tipo_nuevo:
+        return
+    deltas = {}
+    if tipo_anterior in TIPOS_PRESENTISMO:
+        deltas[tipo_anterior] = -1
+    if tipo_nuevo in TIPOS_PRESENTISMO:
+        deltas[tipo_nuevo] = deltas.get(tipo_nuevo, 0) + 1
+    sumar(obra_id, fecha, **deltas)
+
+
+def registrar_ingreso(obra_id, fecha, horas, signo=1):
+    """Alta (signo=1) o baja (signo=-1) de una fichada"""
+    sumar(obra_id, fecha, registros_ingreso=signo, horas_totales=signo * (horas or 0))
+
+
+def cambiar_horas_ingreso(obra_id, fecha, horas_anteriores, horas_nuevas):
+    sumar(obra_id, fecha, horas_totales=(horas_nuevas or 0) - (horas_anteriores or 0))
+
+
+def reconstruir(obra_id=None, fecha_inicio=None, fecha_fin=None):
+    """
+    Recalcula el resumen desde las tablas de origen para el rango pedido
+    (todo el historial si no se pasan filtros). Devuelve las filas escritas.
+    """
+    def condiciones(fecha, obra):
+        resultado = []
+        if obra_id is not None:
+            resultado.append(obra == obra_id)
+        if fecha_inicio is not None:
+            resultado.append(fecha >= fecha_inicio)
+        if fecha_fin is not None:
+            resultado.append(fecha <= fecha_fin)
+        return resultado
+
+    filas = {}
+
+    def fila(obra, fecha):
+        clave = (obra, fecha)
+        if clave not in filas:
+            filas[clave] = {'obra_id': obra, 'fecha': fecha, **{c: 0 for c in _CONTADORES}}
+        return filas[clave]
+
+    presentismo = (
+        select(Presentismo.obra_id, Presentismo.fecha, Presentismo.tipo, func.count())
+        .where(*condiciones(Presentismo.fecha, Presentismo.obra_id))
+        .group_by(Presentismo.obra_id, Presentismo.fecha, Presentismo.tipo)
+    )
+    presentismo = archivo.adaptar(presentismo, Presentismo, fecha_inicio=fecha_inicio)
+    for obra, fecha, tipo, cantidad in db.session.execute(presentismo):
+        actual = fila(obra, fecha)
+        actual['dotacion'] += cantidad
+        if tipo in TIPOS_PRESENTISMO:
+            actual[tipo] += cantidad
+
+    horas = (
+        select(IngresoEgreso.obra_id, IngresoEgreso.fecha, func.count(),
+               func.coalesce(func.sum(IngresoEgreso.horas_trabajadas), 0))
+        .where(*condiciones(IngresoEgreso.fecha, IngresoEgreso.obra_id))
+        .group_by(IngresoEgreso.obra_id, IngresoEgreso.fecha)
+    )
+    horas = archivo.adaptar(horas, IngresoEgreso, fecha_inicio=fecha_inicio)
+    for obra, fecha, cantidad, total in db.session.execute(horas):
+        actual = fila(obra, fecha)
+        actual['registros_ingreso'] = cantidad
+        actual['horas_totales'] = float(total)
+
+    db.session.execute(delete(ResumenDiario).where(
+        and_(True, *condiciones(ResumenDiario.fecha, ResumenDiario.obra_id))
+    ))
+    if filas:
+        db.session.execute(db.insert(ResumenDiario), list(filas.values()))
+    return len(filas)
+
+
+def consultar(obra_id=None, fecha_inicio=None, fecha_fin=None):
+    query = ResumenDiario.query
+    if obra_id is not None:
+        query = query.filter(ResumenDiario.obra_id == obra_id)
+    if fecha_inicio is not None:
+        query = query.filter(ResumenDiario.fecha >= fecha_inicio)
+    if fecha_fin is not None:
+        query = query.filter(ResumenDiario.fecha <= fecha_fin)
+    return query.order_by(ResumenDiario.fecha, ResumenDiario.obra_id).all()
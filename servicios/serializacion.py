@@ -0,0 +1,81 @@
+"""
+Serialización de listados a partir de filas planas.
+
+Los to_dict() de los modelos acceden a self.personal y self.obra, lo que
+dispara un SELECT perezoso por fila. Para los listados se arma una única
+consulta con JOIN a personal y obras y se construyen los diccionarios
+directamente desde las tuplas, sin instanciar objetos ORM.
+"""
+
+from models import Personal, Obra, Asignacion, Presentismo, IngresoEgreso
+from servicios.fechas import formatear
+
+_NOMBRES_RELACIONADOS = (
+    Personal.nombre.label('personal_nombre'),
+    Personal.apellido.label('personal_apellido'),
+    Obra.nombre.label('obra_nombre'),
+)
+
+# Columnas por modelo, en el mismo orden que sus to_dict()
+COLUMNAS = {
+    Personal: (
+        Personal.id, Personal.nombre, Personal.apellido, Personal.email,
+        Personal.telefono, Personal.dni, Personal.fecha_nacimiento,
+        Personal.domicilio, Personal.ciudad, Personal.provincia,
+        Personal.codigo_postal, Personal.estado, Personal.fecha_ingreso,
+    ),
+    Obra: (
+        Obra.id, Obra.nombre, Obra.descripcion, Obra.ubicacion,
+        Obra.fecha_inicio, Obra.fecha_fin_estimada, Obra.estado,
+        Obra.responsable,
+    ),
+    Asignacion: (
+        Asignacion.id, Asignacion.personal_id, Asignacion.obra_id,
+        *_NOMBRES_RELACIONADOS,
+        Asignacion.fecha_asignacion, Asignacion.fecha_fin, Asignacion.puesto,
+        Asignacion.salario_diario, Asignacion.estado,
+    ),
+    Presentismo: (
+        Presentismo.id, Presentismo.personal_id, Presentismo.obra_id,
+        *_NOMBRES_RELACIONADOS,
+        Presentismo.fecha, Presentismo.tipo, Presentismo.descripcion,
+        Presentismo.notas,
+    ),
+    IngresoEgreso: (
+        IngresoEgreso.id, IngresoEgreso.personal_id, IngresoEgreso.obra_id,
+        *_NOMBRES_RELACIONADOS,
+        IngresoEgreso.fecha, IngresoEgreso.hora_ingreso,
+        IngresoEgreso.hora_egreso, IngresoEgreso.horas_trabajadas,
+        IngresoEgreso.horas_nocturnas, IngresoEgreso.horas_extra,
+        IngresoEgreso.notas,
+    ),
+}
+
+# Modelos que referencian a personal y obras
+_CON_RELACIONES = (Asignacion, Presentismo, IngresoEgreso)
+
+
+def consulta_plana(query, modelo):
+    """Convierte una query del modelo en una consulta de columnas planas"""
+    if modelo in _CON_RELACIONES:
+        query = query.join(Personal, modelo.personal_id == Personal.id) \
+                     .join(Obra, modelo.obra_id == Obra.id)
+    return query.with_entities(*COLUMNAS[modelo])
+
+
+def tablas_consultadas(modelo):
+    """Tablas que lee consulta_plana para el modelo (la propia y las de los joins)"""
+    tablas = [modelo.__tablename__]
+    if modelo in _CON_RELACIONES:
+        tablas += [Personal.__tablename__, Obra.__tablename__]
+    return tablas
+
+
+def fila_a_dict(fila):
+    """Convierte una fila de consulta_plana en el diccionario de la API"""
+    return {clave: formatear(valor) for clave, valor in fila._mapping.items()}
+
+
+def serializar(query, modelo):
+    """Ejecuta la query en una sola sentencia y devuelve la lista de dicts"""
+    return [fila_a_dict(fila) for fila in consulta_plana(query, modelo)]
@@ -0,0 +1,146 @@
+"""
+Caché de usuarios para Flask-Login.
+
+Cada request autenticado resuelve current_user con load_user; sin caché
+eso es una consulta a usuarios por request (y una página hace 3 o 4
+fetches a la API). Acá se guardan las columnas de cada usuario en memoria
+y se arma una instancia nueva, fuera de la sesión, por request.
+
+Invalidación:
+    - Un commit que agrega, modifica o borra un Usuario (cambio de rol,
+      activar/desactivar, contraseña) vacía el caché al terminar.
+    - El commit además actualiza la fecha de un archivo sello en instance/.
+      Cada búsqueda compara esa fecha (un stat, sin tocar la base): así los
+      demás workers de gunicorn también descartan su copia.
+    - Las entradas vencen a los USUARIOS_CACHE_TTL segundos (por defecto 60),
+      por si la tabla se modifica por fuera de la aplicación.
+
+Los usuarios desactivados no se cargan: su sesión deja de valer en el
+siguiente request. Con USUARIOS_CACHE_TTL = 0 se consulta siempre la base.
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import event, inspect
+
+from app import db
+from models.usuario import Usuario
+
+ARCHIVO_SELLO = 'usuarios.sello'
+
+
+class CacheUsuarios:
+    """Columnas de usuarios por id, con vencimiento y sello entre procesos"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._generacion = 0
+        self._sello_visto = None
+        self.ruta_sello = None
+        self.ttl = 60
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _sello(self):
+        try:
+            return os.stat(self.ruta_sello).st_mtime_ns
+        except OSError:
+            return 0
+
+    def vaciar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._generacion += 1
+
+    def invalidar(self):
+        """Vacía este proceso y avisa a los demás por el archivo sello"""
+        self.vaciar()
+        if self.ruta_sello is None:
+            return
+        # Fecha explícita en ns: dos invalidaciones seguidas nunca dejan el mismo sello
+        ahora = max(time.time_ns(), self._sello() + 1)
+        try:
+            with open(self.ruta_sello, 'a'):
+                os.utime(self.ruta_sello, ns=(ahora, ahora))
+        except OSError:
+            pass
+
+    def obtener(self, usuario_id):
+        """Usuario (transitorio, fuera de la sesión) o None si no existe o está inactivo"""
+        if self.ttl <= 0:
+            return _consultar(usuario_id)
+
+        sello = self._sello()
+        with self._lock:
+            if sello != self._sello_visto:
+                self._entradas.clear()
+                self._generacion += 1
+                self._sello_visto = sello
+            entrada = self._entradas.get(usuario_id)
+            generacion = self._generacion
+
+        if entrada is not None and entrada[0] > time.monotonic():
+            self.aciertos += 1
+            datos = entrada[1]
+            return Usuario(**datos) if datos is not None else None
+
+        self.fallos += 1
+        usuario = _consultar(usuario_id)
+        datos = None if usuario is None else {
+            columna.key: getattr(usuario, columna.key)
+            for columna in inspect(Usuario).column_attrs
+        }
+        with self._lock:
+            # Si hubo una invalidación durante la consulta, el dato puede estar viejo
+            if generacion == self._generacion:
+                self._entradas[usuario_id] = (time.monotonic() + self.ttl, datos)
+        return usuario
+
+
+cache = CacheUsuarios()
+
+
+def _consultar(usuario_id):
+    usuario = db.session.get(Usuario, usuario_id)
+    if usuario is None or not usuario.activo:
+        return None
+    return usuario
+
+
+def cargar_usuario(usuario_id):
+    """Callback de login_manager.user_loader"""
+    return cache.obtener(usuario_id)
+
+
+def _despues_del_flush(session, contexto):
+    for objeto in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(objeto, Usuario):
+            session.info['_usuarios_modificados'] = True
+            return
+
+
+def _despues_del_commit(session):
+    if session.info.pop('_usuarios_modificados', False):
+        cache.invalidar()
+
+
+def _despues_del_rollback(session, transaccion):
+    session.info.pop('_usuarios_modificados', None)
+
+
+def init_app(app):
+    """Configura el caché y registra la invalidación sobre la sesión"""
+    app.config.setdefault('USUARIOS_CACHE_TTL', 60)
+    cache.ttl = app.config['USUARIOS_CACHE_TTL']
+    os.makedirs(app.instance_path, exist_ok=True)
+    cache.ruta_sello = os.path.join(app.instance_path, ARCHIVO_SELLO)
+    cache.vaciar()
+
+    for nombre, funcion in (('after_flush', _despues_del_flush),
+                            ('after_commit', _despues_del_commit),
+                            ('after_soft_rollback', _despues_del_rollback)):
+        if not event.contains(db.session, nombre, funcion):
+            event.listen(db.session, nombre, funcion)
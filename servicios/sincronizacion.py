@@ -0,0 +1,222 @@
+"""
+Protocolo de sincronización para dispositivos en obra con conectividad
+intermitente.
+
+Subida: el dispositivo envía su cola de operaciones, cada una con una clave
+de idempotencia generada en el cliente. El lote completo se aplica en una
+sola transacción; las claves que el mismo usuario ya envió devuelven el
+resultado guardado sin volver a aplicarse, así un reintento después de un
+corte no duplica datos.
+
+Bajada: con since=<version> el dispositivo recibe solo los registros que
+cambiaron desde esa versión (ver servicios/cambios.py).
+"""
+
+import json
+
+from sqlalchemy import select
+
+from app import db
+from models import Personal, Obra, Presentismo, IngresoEgreso
+from models.sincronizacion import OperacionSync
+from servicios import asistencia
+from servicios.asistencia import DatosInvalidos, claves_en_conflicto
+from servicios.fechas import parsear_fecha, parsear_hora
+
+ENTIDADES = {
+    'presentismo': (
+        Presentismo,
+        lambda datos: asistencia.crear_presentismo(datos, reemplazar=True),
+        asistencia.modificar_presentismo,
+        asistencia.eliminar_presentismo,
+    ),
+    'ingresos_egresos': (
+        IngresoEgreso,
+        asistencia.crear_ingreso_egreso,
+        asistencia.modificar_ingreso_egreso,
+        asistencia.eliminar_ingreso_egreso,
+    ),
+}
+
+ACCIONES = ('crear', 'actualizar', 'eliminar')
+
+# Tablas que un dispositivo puede descargar completas en la primera sincronización
+TABLAS_REFERENCIA = ('personal', 'obras', 'asignaciones')
+TABLAS_DESCARGABLES = TABLAS_REFERENCIA + ('presentismo', 'ingresos_egresos')
+
+MAXIMO_OPERACIONES = 500
+
+# Ids de referencia de los datos; desde formularios suelen llegar como texto
+CAMPOS_ID = ('personal_id', 'obra_id')
+
+
+class LoteInvalido(ValueError):
+    """El lote de operaciones no tiene el formato esperado"""
+
+
+def _validar_formato(operaciones):
+    if not isinstance(operaciones, list):
+        raise LoteInvalido('operaciones debe ser una lista')
+    if len(operaciones) > MAXIMO_OPERACIONES:
+        raise LoteInvalido(f'Máximo {MAXIMO_OPERACIONES} operaciones por lote')
+    claves = set()
+    for operacion in operaciones:
+        clave = operacion.get('clave') if isinstance(operacion, dict) else None
+        if not clave or not isinstance(clave, str) or len(clave) > 64:
+            raise LoteInvalido('Cada operación necesita una clave de hasta 64 caracteres')
+        if clave in claves:
+            raise LoteInvalido(f'Clave repetida en el lote: {clave}')
+        claves.add(clave)
+    return claves
+
+
+def _id(valor):
+    """Un texto de dígitos ('12') se convierte en entero; cualquier otro valor queda igual"""
+    if isinstance(valor, str) and valor.strip().isdigit():
+        return int(valor)
+    return valor
+
+
+def _es_id(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool)
+
+
+def _normalizar(operacion):
+    """Copia de la operación con los ids que llegaron como texto convertidos a enteros"""
+    datos = operacion.get('datos')
+    if isinstance(datos, dict):
+        datos = {**datos, **{campo: _id(datos[campo]) for campo in CAMPOS_ID if campo in datos}}
+    return {**operacion, 'id': _id(operacion.get('id')), 'datos': datos}
+
+
+def _referencias_existentes(operaciones):
+    """Ids de personal y obras mencionados en el lote que existen (dos consultas)"""
+    personal_ids, obra_ids = set(), set()
+    for operacion in operaciones:
+        datos = operacion.get('datos') or {}
+        if isinstance(datos, dict):
+            if _es_id(datos.get('personal_id')):
+                personal_ids.add(datos['personal_id'])
+            if _es_id(datos.get('obra_id')):
+                obra_ids.add(datos['obra_id'])
+    personal = set(db.session.scalars(select(Personal.id).where(Personal.id.in_(personal_ids)))) \
+        if personal_ids else set()
+    obras = set(db.session.scalars(select(Obra.id).where(Obra.id.in_(obra_ids)))) \
+        if obra_ids else set()
+    return personal, obras
+
+
+def _fichadas(operaciones):
+    """
+    Fichadas que dejarían las altas y modificaciones de ingresos/egresos del
+    lote, para verificar los conflictos de todas juntas. Los registros que
+    se modifican se cargan en una consulta. Las operaciones con datos
+    inválidos se saltean: fallan al aplicarse.
+    """
+    operaciones = [o for o in operaciones if o.get('entidad') == 'ingresos_egresos'
+                   and isinstance(o.get('datos') or {}, dict)]
+    ids = {o.get('id') for o in operaciones
+           if o.get('accion') == 'actualizar' and _es_id(o.get('id'))}
+    registros = {r.id: r for r in IngresoEgreso.query.filter(IngresoEgreso.id.in_(ids))} \
+        if ids else {}
+
+    fichadas = []
+    for operacion in operaciones:
+        datos = operacion.get('datos') or {}
+        try:
+            if operacion.get('accion') == 'crear':
+                if not _es_id(datos.get('personal_id')):
+                    continue
+                fichadas.append((operacion['clave'], datos['personal_id'],
+                                 parsear_fecha(datos.get('fecha')),
+                                 parsear_hora(datos.get('hora_ingreso')),
+                                 parsear_hora(datos.get('hora_egreso')), None))
+            elif operacion.get('accion') == 'actualizar' and operacion.get('id') in registros:
+                registro = registros[operacion['id']]
+                fichadas.append((operacion['clave'], registro.personal_id, registro.fecha,
+                                 parsear_hora(datos.get('hora_ingreso', registro.hora_ingreso)),
+                                 parsear_hora(datos.get('hora_egreso', registro.hora_egreso)),
+                                 registro.id))
+        except (ValueError, TypeError):
+            continue
+    return [f for f in fichadas if f[2] is not None]
+
+
+def _aplicar(operacion, personal, obras, verificar=True):
+    entidad = operacion.get('entidad')
+    accion = operacion.get('accion')
+    datos = operacion.get('datos') or {}
+    if entidad not in ENTIDADES:
+        raise DatosInvalidos(f'Entidad desconocida: {entidad}')
+    if accion not in ACCIONES:
+        raise DatosInvalidos(f'Acción desconocida: {accion}')
+    if not isinstance(datos, dict):
+        raise DatosInvalidos('datos debe ser un objeto')
+
+    modelo, crear, modificar, eliminar = ENTIDADES[entidad]
+    # Las fichadas que el barrido del lote ya dio por libres no se vuelven a verificar
+    opciones = {'verificar': verificar} if entidad == 'ingresos_egresos' else {}
+
+    if accion == 'crear':
+        for campo in CAMPOS_ID:
+            if datos.get(campo) in (None, ''):
+                raise DatosInvalidos(f'{campo} es requerido')
+            if not _es_id(datos[campo]):
+                raise DatosInvalidos(f'{campo} debe ser un número entero: {datos[campo]!r}')
+        if datos.get('personal_id') not in personal:
+            raise DatosInvalidos(f"Empleado inexistente: {datos.get('personal_id')}")
+        if datos.get('obra_id') not in obras:
+            raise DatosInvalidos(f"Obra inexistente: {datos.get('obra_id')}")
+        registro = crear(datos, **opciones)
+        db.session.flush()
+        return registro.id
+
+    if operacion.get('id') is not None and not _es_id(operacion['id']):
+        raise DatosInvalidos(f"id debe ser un número entero: {operacion['id']!r}")
+    registro = db.session.get(modelo, operacion.get('id')) if operacion.get('id') else None
+    if accion == 'eliminar':
+        # Borrar algo que ya no existe deja el estado pedido: no es un error
+        if registro:
+            eliminar(registro)
+        return operacion.get('id')
+    if not registro:
+        raise DatosInvalidos(f"Registro inexistente: {operacion.get('id')}")
+    modificar(registro, datos, **opciones)
+    return registro.id
+
+
+def aplicar_operaciones(operaciones, usuario_id):
+    """
+    Aplica el lote y registra cada resultado con su clave. No hace commit.
+    Devuelve la lista de resultados en el orden recibido.
+    """
+    claves = _validar_formato(operaciones)
+    operaciones = [_normalizar(o) for o in operaciones]
+
+    previas = {
+        o.clave: json.loads(o.resultado)
+        for o in OperacionSync.query.filter(OperacionSync.usuario_id == usuario_id,
+                                            OperacionSync.clave.in_(claves))
+    }
+    pendientes = [o for o in operaciones if o['clave'] not in previas]
+    personal, obras = _referencias_existentes(pendientes)
+    fichadas = _fichadas(pendientes)
+    libres = {f[0] for f in fichadas} - claves_en_conflicto(fichadas)
+
+    resultados = []
+    for operacion in operaciones:
+        clave = operacion['clave']
+        if clave in previas:
+            resultados.append({**previas[clave], 'repetida': True})
+            continue
+
+        try:
+            registro_id = _aplicar(operacion, personal, obras, verificar=clave not in libres)
+            resultado = {'clave': clave, 'estado': 'aplicada', 'id': registro_id}
+        except DatosInvalidos as e:
+            resultado = {'clave': clave, 'estado': 'rechazada', 'error': str(e)}
+
+        db.session.add(OperacionSync(clave=clave, usuario_id=usuario_id,
+                                     resultado=json.dumps(resultado)))
+        resultados.append(resultado)
+    return resultados
@@ -0,0 +1,171 @@
+"""
+Métricas del tablero (dashboard).
+
+Cada métrica se calcula con una o dos consultas agregadas (los totales del
+día y de la semana salen de resumen_diario, no de recorrer presentismo) y
+queda en memoria del proceso junto con la versión de los cambios de cada
+tabla de la que depende. Los handlers de escritura dejan su cambio en
+registro_cambios en la misma transacción, así la siguiente lectura ve la
+versión nueva y recalcula solo las métricas afectadas; como la versión se
+lee de la base, vale también entre workers. Lo que se escribe sin pasar
+por registro_cambios (reconstruir_resumen.py) se ve al vencer VIGENCIA.
+
+Las métricas del día se guardan por fecha: al cambiar el día se recalculan.
+"""
+
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select, func
+
+from app import db
+from models import Personal, Obra, Asignacion, Presentismo, ResumenDiario, TIPOS_PRESENTISMO
+from servicios import cambios
+
+# Segundos que una métrica se sirve sin recalcular aunque no haya cambios
+VIGENCIA = 300
+
+# Cantidad máxima de ausentes listados con nombre
+MAXIMO_AUSENTES = 100
+
+TIPOS_AUSENCIA = ('ausente_justificado', 'ausente_sin_aviso')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def _totales(hoy):
+    personal = db.session.execute(select(
+        func.count(), func.count().filter(Personal.estado == 'activo')
+    )).one()
+    obras = db.session.execute(select(
+        func.count(), func.count().filter(Obra.estado == 'activa')
+    )).one()
+    vigente = (Asignacion.fecha_asignacion <= hoy) & \
+        (Asignacion.fecha_fin.is_(None) | (Asignacion.fecha_fin >= hoy))
+    asignaciones = db.session.execute(select(
+        func.count(), func.count().filter(vigente)
+    )).one()
+    return {
+        'personal': {'total': personal[0], 'activos': personal[1]},
+        'obras': {'total': obras[0], 'activas': obras[1]},
+        'asignaciones': {'total': asignaciones[0], 'vigentes': asignaciones[1]},
+    }
+
+
+def _dotacion_hoy(hoy):
+    contadores = [getattr(ResumenDiario, tipo) for tipo in TIPOS_PRESENTISMO]
+    filas = db.session.execute(
+        select(ResumenDiario.obra_id, Obra.nombre, ResumenDiario.dotacion, *contadores)
+        .join(Obra, ResumenDiario.obra_id == Obra.id)
+        .where(ResumenDiario.fecha == hoy, ResumenDiario.dotacion > 0)
+        .order_by(Obra.nombre)
+    )
+    obras = []
+    total = dict.fromkeys(('dotacion',) + TIPOS_PRESENTISMO, 0)
+    for fila in filas:
+        datos = {'obra_id': fila.obra_id, 'obra': fila.nombre, 'dotacion': fila.dotacion}
+        datos.update({tipo: getattr(fila, tipo) for tipo in TIPOS_PRESENTISMO})
+        for clave in total:
+            total[clave] += datos[clave]
+        obras.append(datos)
+    return {'obras': obras, 'total': total}
+
+
+def _ausentes_hoy(hoy):
+    # Solo las obras que tienen ausentes hoy según el resumen; así la
+    # consulta de presentismo usa ix_presentismo_obra_fecha
+    obra_ids = list(db.session.scalars(
+        select(ResumenDiario.obra_id).where(
+            ResumenDiario.fecha == hoy,
+            (ResumenDiario.ausente_justificado + ResumenDiario.ausente_sin_aviso) > 0,
+        )
+    ))
+    if not obra_ids:
+        return {'total': 0, 'empleados': []}
+    condicion = (Presentismo.obra_id.in_(obra_ids), Presentismo.fecha == hoy,
+                 Presentismo.tipo.in_(TIPOS_AUSENCIA))
+    total = db.session.execute(select(func.count()).where(*condicion)).scalar()
+    filas = db.session.execute(
+        select(Presentismo.personal_id, Personal.apellido, Personal.nombre,
+               Presentismo.obra_id, Obra.nombre.label('obra'), Presentismo.tipo)
+        .join(Personal, Presentismo.personal_id == Personal.id)
+        .join(Obra, Presentismo.obra_id == Obra.id)
+        .where(*condicion)
+        .order_by(Personal.apellido, Personal.nombre, Presentismo.personal_id)
+        .limit(MAXIMO_AUSENTES)
+    )
+    return {'total': total, 'empleados': [dict(fila._mapping) for fila in filas]}
+
+
+def _horas_semana(hoy):
+    lunes = hoy - timedelta(days=hoy.weekday())
+    filas = db.session.execute(
+        select(ResumenDiario.obra_id, Obra.nombre,
+               func.sum(ResumenDiario.horas_totales).label('horas'))
+        .join(Obra, ResumenDiario.obra_id == Obra.id)
+        .where(ResumenDiario.fecha.between(lunes, hoy))
+        .group_by(ResumenDiario.obra_id, Obra.nombre)
+        .having(func.sum(ResumenDiario.horas_totales) > 0)
+        .order_by(Obra.nombre)
+    )
+    obras = [{'obra_id': f.obra_id, 'obra': f.nombre, 'horas': round(f.horas, 2)} for f in filas]
+    return {
+        'desde': lunes.isoformat(),
+        'obras': obras,
+        'total': round(sum(o['horas'] for o in obras), 2),
+    }
+
+
+# nombre: (tablas de registro_cambios de las que depende, función)
+METRICAS = {
+    'totales': (('personal', 'obras', 'asignaciones'), _totales),
+    'dotacion_hoy': (('presentismo', 'obras'), _dotacion_hoy),
+    'ausentes_hoy': (('presentismo', 'personal', 'obras'), _ausentes_hoy),
+    'horas_semana': (('ingresos_egresos', 'obras'), _horas_semana),
+}
+
+
+def parsear_metricas(valor):
+    """Convierte 'a,b' en la lista de métricas; todas si no se indica"""
+    if not valor:
+        return list(METRICAS)
+    nombres = [n.strip() for n in valor.split(',') if n.strip()]
+    desconocidas = [n for n in nombres if n not in METRICAS]
+    if desconocidas:
+        raise ValueError(f"Métricas desconocidas: {', '.join(desconocidas)}. "
+                         f"Válidas: {', '.join(METRICAS)}")
+    return nombres
+
+
+def version(nombres):
+    """Versiones de las tablas de las métricas indicadas ({tabla: versión})"""
+    tablas = sorted({tabla for nombre in nombres for tabla in METRICAS[nombre][0]})
+    return cambios.versiones(tablas)
+
+
+def obtener(nombres=None, hoy=None, versiones=None):
+    """
+    {métrica: valor} de las métricas indicadas (todas por defecto).
+    versiones es el resultado de version(nombres) si el llamador ya lo consultó.
+    """
+    nombres = nombres or list(METRICAS)
+    hoy = hoy or date.today()
+    versiones = versiones or version(nombres)
+    ahora = time.monotonic()
+    resultado = {}
+    for nombre in nombres:
+        tablas, calcular = METRICAS[nombre]
+        vigente = tuple(versiones[tabla] for tabla in tablas)
+        with _lock:
+            guardada = _cache.get(nombre)
+        if guardada is not None and guardada[:2] == (hoy, vigente) and guardada[2] > ahora:
+            resultado[nombre] = guardada[3]
+            continue
+        valor = calcular(hoy)
+        with _lock:
+            _cache[nombre] = (hoy, vigente, ahora + VIGENCIA, valor)
+        resultado[nombre] = valor
+    return resultado
+
@@ -0,0 +1,449 @@
+"""
+Trabajos en segundo plano: reportes y exportaciones grandes.
+
+Pedir un trabajo guarda una fila en la tabla trabajos y responde enseguida.
+Lo ejecuta un hilo del despachador de algún proceso: los workers web
+arrancan TRABAJOS_HILOS hilos con el primer pedido a /api/trabajos, y
+python trabajador.py corre un proceso dedicado (en producción conviene
+TRABAJOS_HILOS = 0 y el trabajador aparte, así el cálculo no compite por
+el GIL con los requests). Cada trabajo se reserva con un único UPDATE
+condicionado al estado: aunque varios procesos lean la misma cola, nunca lo
+ejecutan dos.
+
+El trabajo informa su avance (progreso y mensaje) con escrituras cortas en
+otra conexión, que además son su latido: uno en curso sin latido por
+TRABAJOS_VENCIMIENTO segundos (el proceso murió) vuelve a la cola, hasta
+MAXIMO_INTENTOS veces. Si mientras tanto lo cancelaron, el siguiente aviso
+de avance lo corta. Los hilos de trabajos no tienen request: sus lecturas
+empiezan con BEGIN diferido y no frenan a los que cargan asistencia.
+
+El resultado se escribe en instance/trabajos/ con un nombre temporal y se
+renombra al terminar. Los trabajos terminados y sus archivos se borran a
+los TRABAJOS_RETENCION_DIAS días.
+"""
+
+import csv
+import json
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update, func
+
+from app import db
+from config import con_gevent
+from models import Presentismo, IngresoEgreso
+from models.trabajos import Trabajo
+from servicios.asistencia import DatosInvalidos
+from servicios import archivo
+from servicios.fechas import parsear_fecha
+from servicios.listados import filtrar, ParametroInvalido
+from servicios.exportacion import exportar, FORMATOS
+
+CARPETA_RESULTADOS = 'trabajos'
+
+MAXIMO_INTENTOS = 2
+# Pendientes o en curso por usuario
+MAXIMO_PENDIENTES_USUARIO = 5
+# Segundos mínimos entre dos escrituras de avance del mismo trabajo
+INTERVALO_AVANCE = 1.0
+# Cada cuánto se revisan los trabajos colgados y los vencidos
+INTERVALO_MANTENIMIENTO = 60
+
+TERMINADOS = ('terminado', 'error', 'cancelado')
+
+
+class TrabajoCancelado(Exception):
+    """El trabajo se canceló mientras se ejecutaba"""
+
+
+# ------------------------------------------------------------------ tipos
+
+TipoTrabajo = namedtuple('TipoTrabajo', 'validar ejecutar formatos solo_admin')
+
+TIPOS = {}
+
+
+def tipo_trabajo(nombre, formatos, validar, solo_admin=False):
+    """
+    Registra un tipo de trabajo. La función decorada recibe (parámetros,
+    archivo de texto abierto, avance) y avance(fracción, mensaje) informa
+    el progreso. validar(parámetros) devuelve los parámetros normalizados
+    (con 'formato', una clave de formatos) o lanza DatosInvalidos.
+    """
+    def registrar(ejecutar):
+        TIPOS[nombre] = TipoTrabajo(validar, ejecutar, formatos, solo_admin)
+        return ejecutar
+    return registrar
+
+
+def _formato(parametros, formatos):
+    formato = parametros.get('formato') or next(iter(formatos))
+    if formato not in formatos:
+        raise DatosInvalidos(f'Formato no soportado: {formato}')
+    return formato
+
+
+def _periodo(parametros):
+    try:
+        fecha_inicio = parsear_fecha(parametros.get('fecha_inicio'))
+        fecha_fin = parsear_fecha(parametros.get('fecha_fin'))
+    except ValueError as e:
+        raise DatosInvalidos(str(e))
+    if not fecha_inicio or not fecha_fin:
+        raise DatosInvalidos('fecha_inicio y fecha_fin son requeridas')
+    if fecha_inicio > fecha_fin:
+        raise DatosInvalidos('fecha_inicio debe ser anterior a fecha_fin')
+    return fecha_inicio, fecha_fin
+
+
+def _entero_opcional(parametros, nombre):
+    valor = parametros.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise DatosInvalidos(f'{nombre} debe ser un número entero')
+
+
+_FORMATOS_LIQUIDACION = {'csv': 'text/csv', 'json': 'application/json'}
+
+
+def _validar_liquidacion(parametros):
+    fecha_inicio, fecha_fin = _periodo(parametros)
+    return {
+        'fecha_inicio': fecha_inicio.isoformat(),
+        'fecha_fin': fecha_fin.isoformat(),
+        'obra_id': _entero_opcional(parametros, 'obra_id'),
+        'personal_id': _entero_opcional(parametros, 'personal_id'),
+        'formato': _formato(parametros, _FORMATOS_LIQUIDACION),
+    }
+
+
+@tipo_trabajo('liquidacion', _FORMATOS_LIQUIDACION, _validar_liquidacion, solo_admin=True)
+def _liquidacion(parametros, destino, avance):
+    # Se importa acá y no al iniciar: solo la usan los trabajos de liquidación
+    from servicios.liquidacion import calcular_liquidacion, totalizar
+    avance(0.05, 'Calculando liquidación')
+    filas = calcular_liquidacion(
+        parsear_fecha(parametros['fecha_inicio']), parsear_fecha(parametros['fecha_fin']),
+        obra_id=parametros['obra_id'], personal_id=parametros['personal_id']
+    )
+    avance(0.8, f'Escribiendo {len(filas)} filas')
+    if parametros['formato'] == 'json':
+        json.dump({
+            'fecha_inicio': parametros['fecha_inicio'],
+            'fecha_fin': parametros['fecha_fin'],
+            'items': filas,
+            'totales': totalizar(filas),
+        }, destino, ensure_ascii=False)
+    elif filas:
+        escritor = csv.DictWriter(destino, fieldnames=list(filas[0]))
+        escritor.writeheader()
+        escritor.writerows(filas)
+
+
+_TABLAS_EXPORTABLES = {'presentismo': Presentismo, 'ingresos_egresos': IngresoEgreso}
+_FILTROS_EXPORTACION = ('personal_id', 'obra_id', 'tipo', 'fecha_inicio', 'fecha_fin')
+
+
+def _validar_exportacion(parametros):
+    tabla = parametros.get('tabla')
+    if tabla not in _TABLAS_EXPORTABLES:
+        raise DatosInvalidos(f"tabla debe ser una de: {', '.join(_TABLAS_EXPORTABLES)}")
+    normalizados = {'tabla': tabla, 'formato': _formato(parametros, FORMATOS)}
+    normalizados.update({clave: str(parametros[clave]) for clave in _FILTROS_EXPORTACION
+                         if parametros.get(clave) not in (None, '')})
+    try:
+        # Arma la consulta para validar los filtros antes de encolar
+        filtrar(_TABLAS_EXPORTABLES[tabla], normalizados)
+    except ParametroInvalido as e:
+        raise DatosInvalidos(str(e))
+    return normalizados
+
+
+@tipo_trabajo('exportacion', FORMATOS, _validar_exportacion)
+def _exportacion(parametros, destino, avance):
+    modelo = _TABLAS_EXPORTABLES[parametros['tabla']]
+    query = filtrar(modelo, parametros)
+    avance(0.01, 'Contando filas')
+    # Cuenta también lo archivado: exportar() lo incluye
+    consulta = archivo.adaptar(query.order_by(None).statement, modelo)
+    total = db.session.execute(select(func.count()).select_from(consulta.subquery())).scalar() or 1
+
+    def por_tanda(filas):
+        avance(min(filas / total, 0.99), f'{filas} de {total} filas')
+
+    for fragmento in exportar(query.order_by(modelo.fecha, modelo.id), modelo,
+                              parametros['formato'], avance=por_tanda):
+        destino.write(fragmento)
+
+
+# ----------------------------------------------------------------- cola
+
+def encolar(nombre_tipo, parametros, usuario_id=None):
+    """Valida y agrega un trabajo pendiente. No hace commit."""
+    tipo = TIPOS.get(nombre_tipo)
+    if tipo is None:
+        raise DatosInvalidos(f"Tipo de trabajo desconocido: {nombre_tipo}")
+    if not isinstance(parametros, dict):
+        raise DatosInvalidos('parametros debe ser un objeto')
+    parametros = tipo.validar(parametros)
+
+    if usuario_id is not None:
+        activos = db.session.execute(
+            select(func.count(Trabajo.id))
+            .where(Trabajo.usuario_id == usuario_id, Trabajo.estado.in_(('pendiente', 'en_curso')))
+        ).scalar()
+        if activos >= MAXIMO_PENDIENTES_USUARIO:
+            raise DatosInvalidos(f'Ya tiene {activos} trabajos en espera: aguarde a que terminen')
+
+    trabajo = Trabajo(tipo=nombre_tipo, parametros=json.dumps(parametros),
+                      usuario_id=usuario_id, mensaje='En espera')
+    db.session.add(trabajo)
+    return trabajo
+
+
+def cancelar(trabajo):
+    """Cancela un trabajo pendiente o en curso. No hace commit."""
+    if trabajo.estado in TERMINADOS:
+        return False
+    trabajo.estado = 'cancelado'
+    trabajo.mensaje = 'Cancelado'
+    trabajo.fecha_fin = datetime.now()
+    return True
+
+
+def carpeta_resultados(app=None):
+    return os.path.join((app or current_app).instance_path, CARPETA_RESULTADOS)
+
+
+def ruta_resultado(trabajo):
+    if trabajo.estado != 'terminado' or not trabajo.archivo:
+        return None
+    ruta = os.path.join(carpeta_resultados(), trabajo.archivo)
+    return ruta if os.path.exists(ruta) else None
+
+
+def _tabla():
+    return Trabajo.__table__
+
+
+def _tomar(proceso):
+    """Reserva el pendiente más antiguo para este proceso; devuelve su id o None"""
+    tabla = _tabla()
+    with db.engine.connect() as conexion:
+        # Lectura barata primero: sin pendientes no se toma el lock de escritura
+        hay = conexion.execute(
+            select(tabla.c.id).where(tabla.c.estado == 'pendiente').limit(1)
+        ).first()
+        conexion.rollback()
+        if hay is None:
+            return None
+        with conexion.begin():
+            ahora = datetime.now()
+            siguiente = (select(tabla.c.id).where(tabla.c.estado == 'pendiente')
+                         .order_by(tabla.c.id).limit(1).scalar_subquery())
+            return conexion.execute(
+                update(tabla)
+                .where(tabla.c.id == siguiente, tabla.c.estado == 'pendiente')
+                .values(estado='en_curso', proceso=proceso, intentos=tabla.c.intentos + 1,
+                        fecha_inicio=ahora, fecha_actualizacion=ahora, progreso=0.0,
+                        mensaje='Iniciando', error=None)
+                .returning(tabla.c.id)
+            ).scalar()
+
+
+def _actualizar(trabajo_id, proceso, **valores):
+    """UPDATE del trabajo solo si sigue en curso en este proceso; False si no"""
+    tabla = _tabla()
+    with db.engine.begin() as conexion:
+        resultado = conexion.execute(
+            update(tabla)
+            .where(tabla.c.id == trabajo_id, tabla.c.estado == 'en_curso',
+                   tabla.c.proceso == proceso)
+            .values(fecha_actualizacion=datetime.now(), **valores)
+        )
+    return resultado.rowcount == 1
+
+
+class _Avance:
+    """Función de avance de un trabajo: escribe como mucho una vez por INTERVALO_AVANCE"""
+
+    def __init__(self, trabajo_id, proceso):
+        self.trabajo_id = trabajo_id
+        self.proceso = proceso
+        self._ultimo = 0.0
+
+    def __call__(self, progreso, mensaje=None):
+        ahora = time.monotonic()
+        if ahora - self._ultimo < INTERVALO_AVANCE:
+            return
+        self._ultimo = ahora
+        valores = {'progreso': max(0.0, min(float(progreso), 1.0))}
+        if mensaje is not None:
+            valores['mensaje'] = mensaje[:200]
+        if not _actualizar(self.trabajo_id, self.proceso, **valores):
+            raise TrabajoCancelado()
+
+
+def ejecutar(trabajo_id, proceso):
+    """Ejecuta un trabajo ya reservado por este proceso con _tomar()"""
+    trabajo = db.session.get(Trabajo, trabajo_id)
+    nombre_tipo, parametros = trabajo.tipo, json.loads(trabajo.parametros)
+    db.session.rollback()
+    tipo = TIPOS.get(nombre_tipo)
+    if tipo is None:
+        _actualizar(trabajo_id, proceso, estado='error', fecha_fin=datetime.now(),
+                    error=f'Tipo de trabajo desconocido: {nombre_tipo}')
+        return
+
+    carpeta = carpeta_resultados()
+    os.makedirs(carpeta, exist_ok=True)
+    archivo = f"{trabajo_id}.{parametros['formato']}"
+    ruta = os.path.join(carpeta, archivo)
+    temporal = f'{ruta}.{os.getpid()}.tmp'
+    try:
+        with open(temporal, 'w', encoding='utf-8', newline='') as destino:
+            tipo.ejecutar(parametros, destino, _Avance(trabajo_id, proceso))
+        os.replace(temporal, ruta)
+        _actualizar(trabajo_id, proceso, estado='terminado', progreso=1.0, mensaje='Listo',
+                    archivo=archivo, tipo_contenido=tipo.formatos[parametros['formato']],
+                    fecha_fin=datetime.now())
+    except TrabajoCancelado:
+        pass
+    except Exception as e:
+        current_app.logger.exception('Error en el trabajo %s (%s)', trabajo_id, nombre_tipo)
+        _actualizar(trabajo_id, proceso, estado='error', mensaje='Error',
+                    error=str(e)[:1000] or type(e).__name__, fecha_fin=datetime.now())
+    finally:
+        db.session.rollback()
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def procesar_uno(proceso):
+    """Toma el trabajo pendiente más antiguo y lo ejecuta. False si no había."""
+    trabajo_id = _tomar(proceso)
+    if trabajo_id is None:
+        return False
+    ejecutar(trabajo_id, proceso)
+    return True
+
+
+def mantenimiento(vencimiento, retencion_dias):
+    """
+    Devuelve a la cola los trabajos en curso sin latido (o los da por
+    fallidos si ya agotaron los intentos) y borra los terminados viejos.
+    """
+    tabla = _tabla()
+    colgado = (tabla.c.estado == 'en_curso') & \
+              (tabla.c.fecha_actualizacion < datetime.now() - timedelta(seconds=vencimiento))
+    with db.engine.begin() as conexion:
+        conexion.execute(update(tabla).where(colgado, tabla.c.intentos < MAXIMO_INTENTOS)
+                         .values(estado='pendiente', proceso=None, mensaje='Reintentando'))
+        conexion.execute(update(tabla).where(colgado, tabla.c.intentos >= MAXIMO_INTENTOS)
+                         .values(estado='error', fecha_fin=datetime.now(),
+                                 error='El proceso que lo ejecutaba dejó de responder'))
+        viejos = conexion.execute(
+            select(tabla.c.id, tabla.c.archivo)
+            .where(tabla.c.estado.in_(TERMINADOS),
+                   tabla.c.fecha_creacion < datetime.now() - timedelta(days=retencion_dias))
+        ).all()
+        if viejos:
+            conexion.execute(tabla.delete().where(tabla.c.id.in_([v.id for v in viejos])))
+
+    carpeta = carpeta_resultados()
+    for _, archivo in viejos:
+        if archivo and os.path.exists(os.path.join(carpeta, archivo)):
+            os.remove(os.path.join(carpeta, archivo))
+    return len(viejos)
+
+
+# ----------------------------------------------------------- despachador
+
+class Despachador:
+    """Hilos que toman trabajos de la cola en este proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hilos = []
+        self._pid = None
+        self._aviso = threading.Event()
+        self._detener = threading.Event()
+        self._ultimo_mantenimiento = 0.0
+        self.app = None
+
+    @property
+    def activo(self):
+        return self._pid == os.getpid() and any(h.is_alive() for h in self._hilos)
+
+    def iniciar(self, app, hilos=None):
+        """Arranca los hilos si todavía no corren en este proceso (sirve después de un fork)"""
+        hilos = app.config['TRABAJOS_HILOS'] if hilos is None else hilos
+        with self._lock:
+            if hilos <= 0 or self.activo:
+                return
+            self.app = app
+            self._pid = os.getpid()
+            self._detener.clear()
+            self._hilos = [
+                threading.Thread(target=self._ciclo, name=f'trabajos-{i}', daemon=True)
+                for i in range(hilos)
+            ]
+            for hilo in self._hilos:
+                hilo.start()
+
+    def avisar(self):
+        """Hay un trabajo nuevo: despierta a los hilos sin esperar el intervalo"""
+        self._aviso.set()
+
+    def detener(self, espera=None):
+        self._detener.set()
+        self._aviso.set()
+        for hilo in self._hilos:
+            hilo.join(espera)
+
+    def _mantener(self):
+        with self._lock:
+            if time.monotonic() - self._ultimo_mantenimiento < INTERVALO_MANTENIMIENTO:
+                return
+            self._ultimo_mantenimiento = time.monotonic()
+        mantenimiento(self.app.config['TRABAJOS_VENCIMIENTO'],
+                      self.app.config['TRABAJOS_RETENCION_DIAS'])
+
+    def _ciclo(self):
+        proceso = f'{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}'
+        intervalo = self.app.config['TRABAJOS_INTERVALO']
+        with self.app.app_context():
+            while not self._detener.is_set():
+                ejecuto = False
+                try:
+                    self._mantener()
+                    ejecuto = procesar_uno(proceso)
+                except Exception:
+                    self.app.logger.exception('Error en el despachador de trabajos')
+                finally:
+                    db.session.remove()
+                if not ejecuto:
+                    self._aviso.wait(intervalo)
+                    self._aviso.clear()
+
+
+despachador = Despachador()
+
+
+def init_app(app):
+    """Valores por defecto de la configuración de trabajos"""
+    # Con gevent los hilos serían greenlets del worker: un cálculo largo
+    # frenaría todas sus conexiones. Ahí los trabajos corren en trabajador.py
+    hilos = 0 if con_gevent() else 2
+    app.config.setdefault('TRABAJOS_HILOS', int(os.environ.get('TRABAJOS_HILOS', hilos)))
+    app.config.setdefault('TRABAJOS_INTERVALO', 2.0)
+    app.config.setdefault('TRABAJOS_VENCIMIENTO', 600)
+    app.config.setdefault('TRABAJOS_RETENCION_DIAS', 7)
@@ -0,0 +1,12 @@
+"""Insert con ON CONFLICT según el motor de base de datos"""
+
+from app import db
+
+
+def insert(modelo):
+    """Devuelve un insert del modelo que soporta on_conflict_do_update"""
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as insert_dialecto
+    else:
+        from sqlalchemy.dialects.sqlite import insert as insert_dialecto
+    return insert_dialecto(modelo)
@@ -0,0 +1,205 @@
+"""
+Asignación vigente de cada empleado por fecha.
+
+Las asignaciones de un empleado se guardan en memoria ordenadas por fecha
+de inicio, junto con el máximo de fecha_fin acumulado hasta cada posición
+(un árbol de intervalos aplanado en listas). Encontrar las asignaciones que
+tocan una fecha o un rango es una bisección más unos pocos pasos hacia
+atrás, así ubicar miles de filas de presentismo no consulta la base una por
+una. Una asignación sin fecha_fin sigue vigente indefinidamente.
+
+El índice compartido guarda la versión de los cambios de asignaciones con
+la que se armó (registro_cambios). Cada uso compara esa versión y, si
+cambió, recarga solo los empleados afectados; como la versión se lee de la
+base, vale también entre workers. Debe actualizarse antes de escribir en
+la transacción: lo que lee ve los cambios aún sin commit.
+
+Las escrituras verifican la superposición con las asignaciones del
+empleado leídas en la misma transacción (verificar()), no con el índice.
+"""
+
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date
+
+from sqlalchemy import select
+
+from app import db
+from models import Asignacion
+from models.sincronizacion import RegistroCambio
+from servicios import cambios
+
+SIN_FIN = date.max
+
+# Con más cambios que estos desde la última versión se rearma todo el índice
+MAXIMO_CAMBIOS_INCREMENTALES = 2000
+
+Vigencia = namedtuple('Vigencia', 'id personal_id obra_id fecha_asignacion fecha_fin '
+                                  'puesto salario_diario')
+
+_COLUMNAS = (Asignacion.id, Asignacion.personal_id, Asignacion.obra_id,
+             Asignacion.fecha_asignacion, Asignacion.fecha_fin,
+             Asignacion.puesto, Asignacion.salario_diario)
+
+
+class AsignacionSuperpuesta(ValueError):
+    """La asignación se superpone con otra del mismo empleado"""
+
+    def __init__(self, existente):
+        self.existente = existente
+        hasta = existente.fecha_fin.isoformat() if existente.fecha_fin else 'sin fecha de fin'
+        super().__init__(
+            f'Se superpone con la asignación {existente.id} (obra {existente.obra_id}, '
+            f'{existente.fecha_asignacion.isoformat()} a {hasta})'
+        )
+
+
+class Intervalos:
+    """Asignaciones de un empleado ordenadas por inicio, con el máximo fin acumulado"""
+
+    __slots__ = ('inicios', 'maximos', 'vigencias')
+
+    def __init__(self, vigencias):
+        self.vigencias = sorted(vigencias, key=lambda v: (v.fecha_asignacion, v.id))
+        self.inicios = [v.fecha_asignacion for v in self.vigencias]
+        self.maximos = []
+        maximo = date.min
+        for v in self.vigencias:
+            maximo = max(maximo, v.fecha_fin or SIN_FIN)
+            self.maximos.append(maximo)
+
+    def superpuestas(self, desde, hasta=None):
+        """Asignaciones que tocan [desde, hasta], de la que empieza más tarde a la primera"""
+        hasta = hasta or SIN_FIN
+        i = bisect_right(self.inicios, hasta) - 1
+        # maximos es creciente: a la izquierda de un máximo menor que desde no hay nada
+        while i >= 0 and self.maximos[i] >= desde:
+            vigencia = self.vigencias[i]
+            if (vigencia.fecha_fin or SIN_FIN) >= desde:
+                yield vigencia
+            i -= 1
+
+    def vigente(self, fecha, obra_id=None):
+        """La asignación vigente en la fecha (la más reciente si hay varias) o None"""
+        for vigencia in self.superpuestas(fecha, fecha):
+            if obra_id is None or vigencia.obra_id == obra_id:
+                return vigencia
+        return None
+
+
+def _leer(condicion=None):
+    consulta = select(*_COLUMNAS)
+    if condicion is not None:
+        consulta = consulta.where(condicion)
+    por_empleado = {}
+    for fila in db.session.execute(consulta):
+        por_empleado.setdefault(fila.personal_id, []).append(Vigencia(*fila))
+    return por_empleado
+
+
+class IndiceAsignaciones:
+    """Intervalos de todos los empleados, al día con registro_cambios"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_empleado = {}
+        self._empleado_de = {}
+        self._version = None
+        self._motor = None
+
+    def _reemplazar(self, por_empleado, personal_ids=None):
+        if personal_ids is None:
+            self._por_empleado, self._empleado_de = {}, {}
+            personal_ids = por_empleado.keys()
+        for personal_id in personal_ids:
+            anteriores = self._por_empleado.pop(personal_id, None)
+            if anteriores is not None:
+                for vigencia in anteriores.vigencias:
+                    self._empleado_de.pop(vigencia.id, None)
+            vigencias = por_empleado.get(personal_id)
+            if vigencias:
+                self._por_empleado[personal_id] = Intervalos(vigencias)
+                for vigencia in vigencias:
+                    self._empleado_de[vigencia.id] = personal_id
+
+    def actualizar(self):
+        """Recarga lo que cambió desde la última versión vista"""
+        version = cambios.version_actual(['asignaciones'])
+        with self._lock:
+            if self._motor is db.engine and version == self._version:
+                return
+            anterior = self._version if self._motor is db.engine else None
+            ids = None
+            if anterior is not None and version > anterior:
+                ids = set(db.session.scalars(
+                    select(RegistroCambio.registro_id)
+                    .where(RegistroCambio.tabla == 'asignaciones',
+                           RegistroCambio.version > anterior,
+                           RegistroCambio.version <= version)
+                    .limit(MAXIMO_CAMBIOS_INCREMENTALES + 1)
+                ))
+            if ids is None or len(ids) > MAXIMO_CAMBIOS_INCREMENTALES:
+                self._reemplazar(_leer())
+            else:
+                # Empleados de las asignaciones cambiadas: los que tenían antes
+                # (bajas y cambios de empleado) y los que tienen ahora
+                afectados = {self._empleado_de[i] for i in ids if i in self._empleado_de}
+                afectados.update(db.session.scalars(
+                    select(Asignacion.personal_id).where(Asignacion.id.in_(ids))
+                ))
+                self._reemplazar(_leer(Asignacion.personal_id.in_(afectados)), afectados)
+            self._version = version
+            self._motor = db.engine
+
+    def intervalos(self, personal_id):
+        return self._por_empleado.get(personal_id)
+
+    def vigente(self, personal_id, fecha, obra_id=None):
+        intervalos = self._por_empleado.get(personal_id)
+        return intervalos.vigente(fecha, obra_id) if intervalos else None
+
+    def en_fecha(self, fecha, obra_id=None):
+        """Asignación vigente en la fecha de cada empleado (de la obra, si se indica)"""
+        resultado = []
+        for intervalos in self._por_empleado.values():
+            vigencia = intervalos.vigente(fecha, obra_id)
+            if vigencia is not None:
+                resultado.append(vigencia)
+        return resultado
+
+
+indice = IndiceAsignaciones()
+
+
+def vigentes(filas, obra=True):
+    """
+    Asignación vigente de cada (personal_id, obra_id, fecha) de filas, en
+    el mismo orden; None si no hay. Con obra=False se ignora obra_id y se
+    devuelve la asignación del empleado en esa fecha, sea de la obra que sea.
+    """
+    indice.actualizar()
+    return [indice.vigente(personal_id, fecha, obra_id if obra else None)
+            for personal_id, obra_id, fecha in filas]
+
+
+def verificar(personal_id, fecha_asignacion, fecha_fin=None, excluir_id=None):
+    """
+    Lanza AsignacionSuperpuesta si el empleado ya tiene una asignación que
+    se cruza con [fecha_asignacion, fecha_fin]. Lee de la transacción en
+    curso (usa ix_asignaciones_personal_fecha), no del índice compartido.
+    """
+    condicion = Asignacion.personal_id == personal_id
+    if excluir_id is not None:
+        condicion = condicion & (Asignacion.id != excluir_id)
+    vigencias = _leer(condicion).get(personal_id, [])
+    superpuesta = next(Intervalos(vigencias).superpuestas(fecha_asignacion, fecha_fin), None)
+    if superpuesta is not None:
+        raise AsignacionSuperpuesta(superpuesta)
+
+
+def a_dict(vigencia):
+    datos = vigencia._asdict()
+    for campo in ('fecha_asignacion', 'fecha_fin'):
+        datos[campo] = datos[campo].isoformat() if datos[campo] else None
+    return datos
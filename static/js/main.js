@@ -35,6 +35,325 @@ async function apiCall(endpoint, method = 'GET', data = null) {
     }
 }
 
+// Convierte una respuesta ?format=columnar (servicios/columnar.py) en la
+// lista de objetos del formato normal
+const COLUMNAR_REFERENCES = [
+    ['personal', 'personal_id', { personal_nombre: 'nombre', personal_apellido: 'apellido' }],
+    ['obras', 'obra_id', { obra_nombre: 'nombre' }]
+];
+
+function fromColumnar(data) {
+    const columns = Object.entries(data.columnas).map(([key, column]) =>
+        [key, Array.isArray(column) ? column : column.indices.map(i => column.valores[i])]);
+    const items = [];
+    for (let i = 0; i < data.cantidad; i++) {
+        const item = {};
+        columns.forEach(([key, values]) => { item[key] = values[i]; });
+        COLUMNAR_REFERENCES.forEach(([table, idKey, fields]) => {
+            if (!data[table]) return;
+            const reference = data[table][item[idKey]] || {};
+            Object.entries(fields).forEach(([key, field]) => {
+                item[key] = reference[field] ?? null;
+            });
+        });
+        items.push(item);
+    }
+    return items;
+}
+
+function listUrl(endpoint, params) {
+    const url = new URL(endpoint, window.location.origin);
+    Object.entries(params).forEach(([key, value]) => {
+        if (value !== null && value !== undefined && value !== '') {
+            url.searchParams.set(key, value);
+        }
+    });
+    return url;
+}
+
+// Paginación por cursor: el servidor devuelve el cursor de la próxima página
+// en el header X-Siguiente-Cursor. Las páginas se piden en formato columnar,
+// que pesa bastante menos en datos móviles
+async function fetchPage(endpoint, params = {}) {
+    const response = await fetch(listUrl(endpoint, { ...params, format: 'columnar' }));
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return {
+        items: fromColumnar(await response.json()),
+        next: response.headers.get('X-Siguiente-Cursor'),
+        version: response.headers.get('X-Version')
+    };
+}
+
+// Recorre todas las páginas (para selects y datos de referencia)
+async function fetchAllPages(endpoint, params = {}) {
+    let items = [];
+    let after = null;
+    do {
+        const page = await fetchPage(endpoint, { ...params, limit: 1000, after });
+        items = items.concat(page.items);
+        after = page.next;
+    } while (after);
+    return items;
+}
+
+// Una página del listado como filas <tr> ya renderizadas en el servidor
+async function fetchRows(endpoint, params = {}) {
+    const response = await fetch(listUrl(endpoint, { ...params, format: 'html' }));
+    if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return {
+        html: await response.text(),
+        next: response.headers.get('X-Siguiente-Cursor'),
+        version: response.headers.get('X-Version')
+    };
+}
+
+// Tabla que carga de a una página y agrega un botón "Cargar más". Si la
+// página trae la primera tanda de filas renderizada en el servidor (con
+// data-version en el tbody), la primera carga la usa en lugar de pedirla
+class PagedTable {
+    constructor(endpoint, tbodyId, renderRow, pageSize = 50) {
+        this.endpoint = endpoint;
+        this.tbody = document.getElementById(tbodyId);
+        this.renderRow = renderRow;
+        this.pageSize = pageSize;
+        this.params = {};
+        this.after = null;
+        this.version = null;
+        this.prerendered = 'version' in this.tbody.dataset;
+
+        this.moreButton = document.createElement('button');
+        this.moreButton.className = 'btn btn-edit';
+        this.moreButton.textContent = 'Cargar más';
+        this.moreButton.style.display = 'none';
+        this.moreButton.style.marginTop = '10px';
+        this.moreButton.addEventListener('click', () => this.more());
+        this.tbody.closest('table').parentElement.after(this.moreButton);
+    }
+
+    async load(params = {}) {
+        this.params = params;
+        if (this.prerendered) {
+            this.prerendered = false;
+            this.after = this.tbody.dataset.siguiente || null;
+            this.version = this.tbody.dataset.version;
+            this.moreButton.style.display = this.after ? '' : 'none';
+            return;
+        }
+        this.after = null;
+        this.version = null;
+        await this.more(true);
+    }
+
+    // Agrega la página siguiente; con replace reemplaza las filas actuales
+    // cuando llega la respuesta (así la tabla no queda vacía mientras tanto)
+    async more(replace = false) {
+        try {
+            const page = await fetchRows(this.endpoint, {
+                ...this.params, limit: this.pageSize, after: this.after
+            });
+            if (replace) {
+                this.tbody.innerHTML = page.html;
+            } else {
+                this.tbody.insertAdjacentHTML('beforeend', page.html);
+            }
+            // Versión de los datos de la primera página: desde ahí se siguen los cambios
+            if (this.version === null) this.version = page.version;
+            this.after = page.next;
+            this.moreButton.style.display = page.next ? '' : 'none';
+        } catch (error) {
+            console.error('Error cargando tabla:', error);
+        }
+    }
+
+    // Aplica altas, modificaciones y bajas recibidas en vivo. matches indica
+    // si un registro entra en los filtros actuales de la tabla
+    apply(cambios, matches = () => true) {
+        cambios.forEach(c => {
+            const row = this.tbody.querySelector(`tr[data-id="${c.id}"]`);
+            if (c.operacion === 'baja' || !matches(c.datos)) {
+                if (row) row.remove();
+                return;
+            }
+            const target = row || document.createElement('tr');
+            target.dataset.id = c.id;
+            target.innerHTML = this.renderRow(c.datos);
+            if (!row) this.tbody.prepend(target);
+        });
+    }
+}
+
+// Cambios en vivo de presentismo y fichadas (/api/eventos, Server-Sent Events).
+// EventSource se reconecta solo y el servidor reenvía lo que pasó mientras
+// tanto (Last-Event-ID). Si el servidor rechaza la conexión (503: cada
+// worker admite pocas conexiones en vivo) los cambios se consultan cada
+// POLL_MS en /api/sync y se vuelve a intentar el flujo cada RETRY_MS.
+class LiveFeed {
+    static POLL_MS = 15000;
+    static RETRY_MS = 60000;
+
+    constructor(onCambios, onRecargar) {
+        this.onCambios = onCambios;
+        this.onRecargar = onRecargar;
+        this.source = null;
+        this.params = {};
+        this.lastId = null;
+        this.retry = null;
+        this.poll = null;
+    }
+
+    get connected() {
+        return this.source !== null && this.source.readyState === EventSource.OPEN;
+    }
+
+    open(params = {}) {
+        this.close();
+        this.params = params;
+        this.lastId = params.desde || null;
+        this.connect();
+    }
+
+    connect() {
+        const url = listUrl('/api/eventos', { ...this.params, desde: this.lastId });
+        this.source = new EventSource(url);
+        this.source.onopen = () => this.stopPolling();
+        this.source.addEventListener('cambios', event => {
+            this.lastId = event.lastEventId;
+            this.onCambios(JSON.parse(event.data).cambios);
+        });
+        this.source.addEventListener('recargar', event => {
+            this.lastId = event.lastEventId;
+            this.onRecargar();
+        });
+        this.source.onerror = () => {
+            if (this.source.readyState === EventSource.CLOSED) {
+                this.source = null;
+                this.startPolling();
+                this.retry = setTimeout(() => this.connect(), LiveFeed.RETRY_MS);
+            }
+        };
+    }
+
+    startPolling() {
+        if (this.poll === null && this.lastId) {
+            this.poll = setInterval(() => this.fetchChanges(), LiveFeed.POLL_MS);
+        }
+    }
+
+    stopPolling() {
+        clearInterval(this.poll);
+        this.poll = null;
+    }
+
+    // Mismo formato de cambios que el flujo (servicios/cambios.py)
+    async fetchChanges() {
+        const since = this.lastId;
+        try {
+            const response = await fetch(listUrl('/api/sync', {
+                tablas: this.params.tablas, obra_id: this.params.obra_id, since
+            }));
+            if (!response.ok || this.lastId !== since) return;
+            const data = await response.json();
+            this.lastId = String(data.version);
+            if (data.hay_mas) {
+                this.onRecargar();
+            } else if (data.cambios.length) {
+                this.onCambios(data.cambios);
+            }
+        } catch (error) {
+            // Sin conexión: se reintenta en el próximo intervalo
+        }
+    }
+
+    close() {
+        clearTimeout(this.retry);
+        this.stopPolling();
+        if (this.source) {
+            this.source.close();
+            this.source = null;
+        }
+    }
+}
+
+// Selector de empleado con búsqueda en el servidor (/api/personal/buscar).
+// El texto se escribe en un input con datalist y el id elegido queda en un
+// input oculto. Sin conexión busca en los datos de referencia guardados.
+class PersonalTypeahead {
+    constructor(inputId, hiddenId, params = {}) {
+        this.input = document.getElementById(inputId);
+        this.hidden = document.getElementById(hiddenId);
+        this.params = params;
+        this.options = new Map();
+        this.timer = null;
+
+        this.list = document.createElement('datalist');
+        this.list.id = `${inputId}-opciones`;
+        this.input.setAttribute('list', this.list.id);
+        this.input.setAttribute('autocomplete', 'off');
+        this.input.after(this.list);
+
+        this.input.addEventListener('input', () => {
+            this.select();
+            clearTimeout(this.timer);
+            this.timer = setTimeout(() => this.search(this.input.value), 150);
+        });
+    }
+
+    label(p) {
+        return `${p.apellido}, ${p.nombre}` + (p.dni ? ` (DNI ${p.dni})` : '');
+    }
+
+    async search(q) {
+        if (q.trim().length < 2) return;
+        let results;
+        try {
+            const url = new URL('/api/personal/buscar', window.location.origin);
+            Object.entries({ ...this.params, q, limit: 15 })
+                .forEach(([key, value]) => url.searchParams.set(key, value));
+            const response = await fetch(url);
+            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+            results = await response.json();
+        } catch (error) {
+            if (typeof referenceData === 'undefined') return;
+            const words = q.toLowerCase().split(/\s+/).filter(Boolean);
+            results = (await referenceData.get('personal')).filter(p => words.every(w =>
+                [p.nombre, p.apellido, p.dni, p.email, p.ciudad]
+                    .some(v => v && v.toLowerCase().startsWith(w)))).slice(0, 15);
+        }
+        this.options = new Map(results.map(p => [this.label(p), p.id]));
+        this.list.innerHTML = '';
+        this.options.forEach((id, label) => {
+            const option = document.createElement('option');
+            option.value = label;
+            this.list.appendChild(option);
+        });
+        this.select();
+    }
+
+    // Toma el id si el texto coincide con una opción; si no, el campo es inválido
+    select() {
+        const id = this.options.get(this.input.value);
+        this.hidden.value = id || '';
+        this.input.setCustomValidity(id ? '' : 'Seleccione un empleado de la lista');
+    }
+
+    set(id, label) {
+        this.options = new Map([[label, id]]);
+        this.input.value = label;
+        this.select();
+    }
+
+    reset() {
+        this.options = new Map();
+        this.input.value = '';
+        this.list.innerHTML = '';
+        this.select();
+    }
+}
+
 // Cargar datos en tabla
 async function loadTable(endpoint, tableSelector) {
     try {
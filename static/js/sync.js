@@ -0,0 +1,150 @@
+// Sincronización para trabajo en obra con señal intermitente.
+// Las altas se guardan primero en una cola local (localStorage) con una clave
+// generada acá; la cola se envía a /api/sync cuando hay conexión y el servidor
+// ignora las claves que ya aplicó, así reintentar nunca duplica registros.
+// Personal, obras y asignaciones se guardan localmente y solo se bajan los cambios.
+
+const SYNC_ENDPOINT = '/api/sync';
+const SYNC_QUEUE_KEY = 'sync_cola';
+const SYNC_REFERENCE_KEY = 'sync_referencia';
+const SYNC_INTERVAL = 30000;
+const SYNC_BATCH_SIZE = 500;
+
+function newOperationKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).substring(2)}`;
+}
+
+class SyncQueue {
+    constructor() {
+        this.flushing = null;
+    }
+
+    pending() {
+        return JSON.parse(localStorage.getItem(SYNC_QUEUE_KEY) || '[]');
+    }
+
+    save(operations) {
+        localStorage.setItem(SYNC_QUEUE_KEY, JSON.stringify(operations));
+    }
+
+    enqueue(entidad, accion, datos, id = null) {
+        const operation = { clave: newOperationKey(), entidad, accion, datos };
+        if (id) operation.id = id;
+        this.save([...this.pending(), operation]);
+        return operation;
+    }
+
+    // Envía la cola. Devuelve los resultados del servidor (vacío si no hubo conexión)
+    flush() {
+        if (!this.flushing) {
+            this.flushing = this._flush().finally(() => { this.flushing = null; });
+        }
+        return this.flushing;
+    }
+
+    async _flush() {
+        const results = [];
+        while (navigator.onLine !== false) {
+            const batch = this.pending().slice(0, SYNC_BATCH_SIZE);
+            if (batch.length === 0) break;
+
+            let response;
+            try {
+                response = await fetch(SYNC_ENDPOINT, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ operaciones: batch })
+                });
+            } catch (error) {
+                break;  // Sin conexión: la cola queda para el próximo intento
+            }
+            if (!response.ok) break;
+
+            const body = await response.json();
+            const done = new Set(body.resultados.map(r => r.clave));
+            this.save(this.pending().filter(op => !done.has(op.clave)));
+            body.resultados
+                .filter(r => r.estado === 'rechazada' && !r.repetida)
+                .forEach(r => showNotification(`Registro rechazado: ${r.error}`, 'error'));
+            results.push(...body.resultados);
+        }
+        return results;
+    }
+}
+
+// Copia local de tablas de referencia, actualizada con el delta desde la última versión
+class ReferenceCache {
+    constructor(tablas) {
+        this.tablas = tablas;
+        const stored = JSON.parse(localStorage.getItem(SYNC_REFERENCE_KEY) || 'null');
+        this.state = stored && this.tablas.every(t => stored.tablas[t])
+            ? stored
+            : { version: 0, tablas: Object.fromEntries(tablas.map(t => [t, {}])) };
+        this.refreshing = null;
+    }
+
+    refresh() {
+        if (!this.refreshing) {
+            this.refreshing = this._refresh().finally(() => { this.refreshing = null; });
+        }
+        return this.refreshing;
+    }
+
+    async _refresh() {
+        let more = true;
+        while (more) {
+            const response = await fetch(
+                `${SYNC_ENDPOINT}?since=${this.state.version}&tablas=${this.tablas.join(',')}`
+            );
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const page = await response.json();
+            Object.entries(page.instantanea || {}).forEach(([tabla, filas]) => {
+                this.state.tablas[tabla] = Object.fromEntries(filas.map(f => [f.id, f]));
+            });
+            page.cambios.forEach(c => {
+                if (c.operacion === 'baja') {
+                    delete this.state.tablas[c.tabla][c.id];
+                } else {
+                    this.state.tablas[c.tabla][c.id] = c.datos;
+                }
+            });
+            this.state.version = page.version;
+            more = page.hay_mas;
+        }
+        localStorage.setItem(SYNC_REFERENCE_KEY, JSON.stringify(this.state));
+    }
+
+    // Filas de la tabla; sin conexión devuelve la última copia guardada
+    async get(tabla) {
+        try {
+            await this.refresh();
+        } catch (error) {
+            console.warn('Sin conexión, usando datos guardados:', error);
+        }
+        return Object.values(this.state.tablas[tabla]).sort((a, b) => a.id - b.id);
+    }
+}
+
+const syncQueue = new SyncQueue();
+const referenceData = new ReferenceCache(['personal', 'obras', 'asignaciones']);
+
+// Guarda una operación en la cola e intenta enviarla en el momento.
+// Devuelve el resultado del servidor o null si quedó pendiente.
+async function saveOffline(entidad, accion, datos, id = null) {
+    const operation = syncQueue.enqueue(entidad, accion, datos, id);
+    let results = await syncQueue.flush();
+    if (!results.some(r => r.clave === operation.clave)) {
+        // Si ya había un envío en curso la operación entra en el siguiente
+        results = await syncQueue.flush();
+    }
+    return results.find(r => r.clave === operation.clave) || null;
+}
+
+window.addEventListener('online', () => syncQueue.flush());
+setInterval(() => syncQueue.flush(), SYNC_INTERVAL);
+document.addEventListener('DOMContentLoaded', () => syncQueue.flush());
@@ -0,0 +1,87 @@
+import os
+import sys
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from models import Personal, Obra, Asignacion, Presentismo, IngresoEgreso
+from models.usuario import Usuario
+
+INICIO = date(2026, 1, 5)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'prueba.db'}",
+        'ARCHIVO_DB': str(tmp_path / 'prueba_archivo.db'),
+        'MIGRAR_AL_INICIAR': True,
+        'TRABAJOS_HILOS': 0,
+    })
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def cliente(app):
+    return app.test_client()
+
+
+def iniciar_sesion(app, cliente, rol='admin'):
+    """Crea un usuario con el rol indicado y deja su sesión abierta en el cliente"""
+    with app.app_context():
+        usuario = Usuario(email=f'{rol}@obra', nombre=rol, apellido='Prueba', rol=rol)
+        usuario.set_password('clave')
+        db.session.add(usuario)
+        db.session.commit()
+        usuario_id = usuario.id
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(usuario_id)
+        sesion['_fresh'] = True
+    return usuario_id
+
+
+def poblar(cantidad, obras=2):
+    """cantidad empleados con una asignación, un presentismo y una fichada cada uno"""
+    lista_obras = [Obra(nombre=f'Obra {i}') for i in range(obras)]
+    db.session.add_all(lista_obras)
+    db.session.flush()
+    desde = Personal.query.count()
+    for i in range(desde, desde + cantidad):
+        empleado = Personal(nombre=f'Nombre {i}', apellido=f'Apellido {i}', dni=f'dni-{i}')
+        db.session.add(empleado)
+        db.session.flush()
+        obra = lista_obras[i % obras]
+        fecha = INICIO + timedelta(days=i % 20)
+        db.session.add_all([
+            Asignacion(personal_id=empleado.id, obra_id=obra.id, fecha_asignacion=INICIO,
+                       salario_diario=1000),
+            Presentismo(personal_id=empleado.id, obra_id=obra.id, fecha=fecha, tipo='presente'),
+            IngresoEgreso(personal_id=empleado.id, obra_id=obra.id, fecha=fecha,
+                          hora_ingreso=time(8), hora_egreso=time(17), horas_trabajadas=9),
+        ])
+    db.session.commit()
+    return lista_obras
+
+
+@contextmanager
+def contar_consultas():
+    """Lista con las sentencias SQL ejecutadas dentro del bloque"""
+    sentencias = []
+
+    def registrar(conexion, cursor, sentencia, *args):
+        sentencias.append(sentencia)
+
+    event.listen(db.engine, 'before_cursor_execute', registrar)
+    try:
+        yield sentencias
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', registrar)
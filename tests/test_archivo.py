@@ -0,0 +1,66 @@
+"""Archivar un mes cambia la versión de los listados, que siguen incluyendo lo archivado"""
+
+from datetime import date
+
+import pytest
+
+from app import db
+from models import Presentismo
+from models.usuario import Usuario
+from servicios import archivo
+from tests.conftest import poblar
+
+ENERO = date(2026, 1, 1)
+
+
+@pytest.fixture
+def archivado(app, cliente):
+    """Enero de presentismo archivado; devuelve (ETag y versión previas, filas de enero)"""
+    with app.app_context():
+        poblar(6)
+        usuario = Usuario(email='admin@obra', nombre='Admin', apellido='Obra', rol='admin')
+        usuario.set_password('clave')
+        db.session.add(usuario)
+        db.session.commit()
+        usuario_id = usuario.id
+        filas = Presentismo.query.count()
+    with cliente.session_transaction() as sesion:
+        sesion['_user_id'] = str(usuario_id)
+        sesion['_fresh'] = True
+
+    previa = cliente.get('/api/presentismo')
+    with app.app_context():
+        archivo.preparar()
+        archivo.archivar_mes('presentismo', ENERO)
+        assert Presentismo.query.count() == 0
+    return previa, filas
+
+
+def test_archivar_cambia_la_version(cliente, archivado):
+    previa, filas = archivado
+    respuesta = cliente.get('/api/presentismo', headers={'If-None-Match': previa.headers['ETag']})
+    assert respuesta.status_code == 200
+    assert int(respuesta.headers['X-Version']) > int(previa.headers['X-Version'])
+
+    delta = cliente.get(f"/api/sync?tablas=presentismo&since={previa.headers['X-Version']}")
+    cambios = delta.get_json()['cambios']
+    assert len(cambios) == filas
+    assert {c['operacion'] for c in cambios} == {'baja'}
+    assert all(c['obra_id'] is not None for c in cambios)
+
+
+@pytest.mark.parametrize('parametros', ['', '?fecha_fin=2026-01-31', '?fecha_inicio=2026-01-10'])
+def test_listado_incluye_lo_archivado(cliente, archivado, parametros):
+    _, filas = archivado
+    respuesta = cliente.get(f'/api/presentismo{parametros}')
+    assert respuesta.status_code == 200
+    lista = respuesta.get_json()
+    assert lista
+    if not parametros:
+        assert len(lista) == filas
+
+
+def test_listado_posterior_al_corte(cliente, archivado):
+    respuesta = cliente.get('/api/presentismo?fecha_inicio=2026-02-01')
+    assert respuesta.status_code == 200
+    assert respuesta.get_json() == []
@@ -0,0 +1,46 @@
+"""Las versiones de registro_cambios no se reutilizan y se hacen visibles en el orden en que se toman"""
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import db
+from models import Obra
+from models.sincronizacion import RegistroCambio
+from servicios import cambios
+
+
+def test_versiones_no_se_reutilizan(app):
+    with app.app_context():
+        db.session.add(Obra(nombre='Primera'))
+        db.session.commit()
+        anterior = cambios.version_actual()
+        db.session.execute(delete(RegistroCambio).where(RegistroCambio.version == anterior))
+        db.session.commit()
+
+        db.session.add(Obra(nombre='Segunda'))
+        db.session.commit()
+        assert db.session.execute(select(func.max(RegistroCambio.version))).scalar() > anterior
+
+
+class _Conexion:
+    """Conexión falsa que guarda las sentencias compiladas para el dialecto"""
+
+    def __init__(self, dialecto):
+        self.dialect = dialecto
+        self.sentencias = []
+
+    def execute(self, sentencia):
+        self.sentencias.append(str(sentencia.compile(dialect=self.dialect)))
+
+
+def test_bloqueo_de_versiones_en_base_de_servidor():
+    servidor = _Conexion(postgresql.dialect())
+    cambios._ordenar_versiones(servidor)
+    assert len(servidor.sentencias) == 1
+    assert 'secuencia_cambios' in servidor.sentencias[0]
+    assert servidor.sentencias[0].rstrip().endswith('FOR UPDATE')
+
+    # En SQLite el orden ya lo da el único escritor: no se consulta nada
+    local = _Conexion(sqlite.dialect())
+    cambios._ordenar_versiones(local)
+    assert local.sentencias == []
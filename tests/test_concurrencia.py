@@ -0,0 +1,63 @@
+"""Escritores en paralelo sobre una base SQLite en archivo: sin bloqueos ni escrituras perdidas"""
+
+import threading
+from datetime import timedelta
+
+from app import db
+from models import Personal, Presentismo, IngresoEgreso, ResumenDiario
+from tests.conftest import INICIO, poblar
+
+HILOS = 6
+ESCRITURAS = 12
+
+
+def test_escritores_en_paralelo(app):
+    with app.app_context():
+        obra_id = poblar(HILOS * ESCRITURAS, obras=1)[0].id
+        empleados = [p.id for p in Personal.query.order_by(Personal.id)]
+    # Fuera del rango de poblar: todos escriben sobre la misma fila de resumen_diario
+    fecha = (INICIO + timedelta(days=40)).isoformat()
+
+    barrera = threading.Barrier(HILOS)
+    respuestas, fallas = [], []
+
+    def escritor(n):
+        cliente = app.test_client()
+        barrera.wait()
+        for i in range(ESCRITURAS):
+            personal_id = empleados[n * ESCRITURAS + i]
+            try:
+                if i % 2:
+                    respuesta = cliente.post('/api/ingresos-egresos', json={
+                        'personal_id': personal_id, 'obra_id': obra_id, 'fecha': fecha,
+                        'hora_ingreso': '08:00', 'hora_egreso': '17:00',
+                    })
+                else:
+                    respuesta = cliente.post('/api/presentismo', json={
+                        'personal_id': personal_id, 'obra_id': obra_id, 'fecha': fecha,
+                        'tipo': 'presente',
+                    })
+            except Exception as e:  # con TESTING los errores del servidor se propagan
+                fallas.append(repr(e))
+                continue
+            respuestas.append((respuesta.status_code, respuesta.get_data(as_text=True)))
+
+    hilos = [threading.Thread(target=escritor, args=(n,)) for n in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert fallas == []
+    assert not [cuerpo for _, cuerpo in respuestas if 'database is locked' in cuerpo]
+    assert [estado for estado, _ in respuestas] == [201] * (HILOS * ESCRITURAS)
+
+    mitad = HILOS * ESCRITURAS // 2
+    with app.app_context():
+        dia = INICIO + timedelta(days=40)
+        assert Presentismo.query.filter_by(fecha=dia).count() == mitad
+        assert IngresoEgreso.query.filter_by(fecha=dia).count() == mitad
+        # Los contadores incrementales no pierden sumas entre escritores
+        resumen = db.session.get(ResumenDiario, (obra_id, dia))
+        assert (resumen.presente, resumen.dotacion, resumen.registros_ingreso) == (mitad, mitad, mitad)
+        assert resumen.horas_totales == mitad * 9
@@ -0,0 +1,35 @@
+"""Los listados hacen la misma cantidad de consultas sin importar cuántas filas devuelven"""
+
+import pytest
+
+from app import db
+from tests.conftest import poblar, contar_consultas
+
+LISTADOS = (
+    '/api/personal',
+    '/api/obras',
+    '/api/asignaciones',
+    '/api/presentismo',
+    '/api/ingresos-egresos',
+)
+
+
+def _consultas(app, cliente, url):
+    with app.app_context(), contar_consultas() as sentencias:
+        respuesta = cliente.get(f'{url}?limit=1000')
+        assert respuesta.status_code == 200, respuesta.data
+    return len(sentencias), len(respuesta.get_json())
+
+
+@pytest.mark.parametrize('url', LISTADOS)
+def test_consultas_constantes(app, cliente, url):
+    with app.app_context():
+        poblar(5)
+    pocas, filas = _consultas(app, cliente, url)
+    assert filas >= 2
+
+    with app.app_context():
+        poblar(60)
+    muchas, filas_muchas = _consultas(app, cliente, url)
+    assert filas_muchas > filas
+    assert muchas == pocas
@@ -0,0 +1,46 @@
+"""Con gthread los flujos de eventos en vivo no pueden ocupar todos los hilos del worker"""
+
+import time
+
+import pytest
+
+from servicios import eventos
+from tests.conftest import iniciar_sesion
+
+
+@pytest.mark.parametrize('clase, hilos, maximo', [
+    ('gthread', '4', 1),
+    ('gthread', '2', 1),
+    ('gthread', '16', 4),
+    ('gevent', '4', 100),
+])
+def test_maximo_suscriptores(monkeypatch, clase, hilos, maximo):
+    monkeypatch.setenv('WEB_WORKER_CLASS', clase)
+    monkeypatch.setenv('WEB_THREADS', hilos)
+    assert eventos._maximo_suscriptores() == maximo
+
+
+def test_flujo_rechazado_al_llegar_al_maximo(app, cliente):
+    app.config['EVENTOS_MAXIMO_SUSCRIPTORES'] = 1
+    app.config['EVENTOS_INTERVALO'] = 0.05
+    iniciar_sesion(app, cliente, rol='en_obra')
+
+    abierto = cliente.get('/api/eventos')
+    try:
+        assert abierto.status_code == 200
+        rechazado = cliente.get('/api/eventos')
+        assert rechazado.status_code == 503
+        assert rechazado.headers['Retry-After']
+    finally:
+        abierto.close()
+
+    # Al cerrarse el flujo el lugar queda libre
+    otro = cliente.get('/api/eventos')
+    assert otro.status_code == 200
+    otro.close()
+
+    # Sin suscriptores el hilo del difusor termina solo
+    limite = time.monotonic() + 5
+    while eventos.difusor._hilo is not None and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert eventos.difusor._hilo is None
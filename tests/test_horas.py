@@ -0,0 +1,154 @@
+"""Cálculo de horas de un turno y fichadas duplicadas o superpuestas"""
+
+from datetime import date, time, timedelta
+
+import pytest
+
+from models import IngresoEgreso, Personal
+from servicios import horas
+from tests.conftest import INICIO, poblar
+
+
+def _hora(texto):
+    return None if texto is None else time.fromisoformat(texto)
+
+
+@pytest.mark.parametrize('ingreso, egreso, trabajadas, nocturnas, extra, cruza', [
+    ('08:00', '12:00', 4, 0, 0, False),
+    # Más de la jornada de 8 horas
+    ('08:00', '17:00', 9, 0, 1, False),
+    ('06:00', '22:00', 16, 1, 8, False),
+    # Franja nocturna de 21 a 6
+    ('18:00', '23:30', 5.5, 2.5, 0, False),
+    ('04:00', '10:00', 6, 2, 0, False),
+    ('16:00', '00:00', 8, 3, 0, False),
+    # Cruzan la medianoche
+    ('22:00', '06:00', 8, 8, 0, True),
+    ('20:00', '08:00', 12, 9, 4, True),
+    ('23:15', '01:45', 2.5, 2.5, 0, True),
+])
+def test_calcular(ingreso, egreso, trabajadas, nocturnas, extra, cruza):
+    assert horas.calcular(_hora(ingreso), _hora(egreso)) == {
+        'horas_trabajadas': trabajadas, 'horas_nocturnas': nocturnas,
+        'horas_extra': extra, 'cruza_medianoche': cruza,
+    }
+
+
+def test_calcular_con_otra_jornada():
+    assert horas.calcular(time(8), time(17), jornada=6)['horas_extra'] == 3
+
+
+@pytest.mark.parametrize('ingreso, egreso', [('08:00', None), (None, None)])
+def test_turno_abierto_sin_horas(ingreso, egreso):
+    assert horas.calcular(_hora(ingreso), _hora(egreso)) == {
+        'horas_trabajadas': None, 'horas_nocturnas': None,
+        'horas_extra': None, 'cruza_medianoche': False,
+    }
+
+
+@pytest.mark.parametrize('ingreso, egreso, mensaje', [
+    ('08:00', '08:00', 'igual a la de ingreso'),
+    ('06:00', '23:00', 'supera el máximo'),
+    ('20:00', '13:00', 'supera el máximo'),
+    (None, '17:00', 'sin hora de ingreso'),
+])
+def test_turnos_rechazados(ingreso, egreso, mensaje):
+    with pytest.raises(horas.TurnoInvalido, match=mensaje):
+        horas.calcular(_hora(ingreso), _hora(egreso))
+
+
+DIA = date(2026, 3, 2)
+SIGUIENTE = DIA + timedelta(days=1)
+
+
+@pytest.mark.parametrize('turnos, esperados', [
+    # Sin conflicto: uno termina cuando empieza el otro
+    ([('a', DIA, '08:00', '12:00'), ('b', DIA, '12:00', '17:00')], []),
+    ([('a', DIA, '08:00', '12:00'), ('b', DIA, '08:00', '17:00')], [('b', 'a', 'duplicada')]),
+    ([('a', DIA, '08:00', '12:00'), ('b', DIA, '11:00', '17:00')], [('b', 'a', 'superpuesta')]),
+    # El nocturno del día anterior se pisa con el de la mañana
+    ([('a', DIA, '22:00', '06:00'), ('b', SIGUIENTE, '05:00', '09:00')],
+     [('b', 'a', 'superpuesta')]),
+    # Un turno abierto sigue en curso: choca con el que empieza después ese día
+    ([('a', DIA, '08:00', None), ('b', DIA, '14:00', '18:00')], [('b', 'a', 'superpuesta')]),
+    ([('a', DIA, '22:00', None), ('b', SIGUIENTE, '07:00', '12:00')],
+     [('b', 'a', 'superpuesta')]),
+    ([('a', DIA, '08:00', '17:00'), ('b', DIA, '16:00', None)], [('b', 'a', 'superpuesta')]),
+    # ... pero no más allá de lo que puede durar un turno
+    ([('a', DIA, '08:00', None), ('b', SIGUIENTE, '06:00', '12:00')], []),
+    ([('a', DIA, '00:30', None), ('b', DIA, '23:00', None)], [('b', 'a', 'duplicada')]),
+])
+def test_conflictos(turnos, esperados):
+    assert horas.conflictos([
+        (clave, 1, fecha, _hora(ingreso), _hora(egreso))
+        for clave, fecha, ingreso, egreso in turnos
+    ]) == esperados
+
+
+def test_conflictos_por_empleado():
+    assert horas.conflictos([
+        ('a', 1, DIA, time(8), time(17)),
+        ('b', 2, DIA, time(8), time(17)),
+        ('c', 2, DIA, time(9), None),
+    ]) == [('c', 'b', 'superpuesta')]
+
+
+@pytest.fixture
+def fichada(app):
+    """Un empleado con una fichada de 08:00 a 17:00 en INICIO"""
+    with app.app_context():
+        obra = poblar(1, obras=1)[0]
+        return obra.id, Personal.query.one().id, IngresoEgreso.query.one().id
+
+
+def _alta(cliente, obra_id, personal_id, ingreso, egreso=None, fecha=INICIO):
+    return cliente.post('/api/ingresos-egresos', json={
+        'personal_id': personal_id, 'obra_id': obra_id, 'fecha': fecha.isoformat(),
+        'hora_ingreso': ingreso, 'hora_egreso': egreso,
+    })
+
+
+@pytest.mark.parametrize('ingreso, egreso, motivo', [
+    ('08:00', '12:00', 'duplicada'),
+    ('16:00', '20:00', 'superpuesta'),
+    ('07:00', None, 'superpuesta'),
+])
+def test_alta_rechazada(app, cliente, fichada, ingreso, egreso, motivo):
+    obra_id, personal_id, guardada = fichada
+    respuesta = _alta(cliente, obra_id, personal_id, ingreso, egreso)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['error'] == f'Fichada {motivo} con el registro {guardada}'
+    with app.app_context():
+        assert IngresoEgreso.query.count() == 1
+
+
+def test_alta_despues_de_un_turno_abierto(app, cliente, fichada):
+    obra_id, personal_id, _ = fichada
+    dia = INICIO + timedelta(days=2)
+    abierto = _alta(cliente, obra_id, personal_id, '08:00', fecha=dia)
+    assert abierto.status_code == 201
+    respuesta = _alta(cliente, obra_id, personal_id, '18:00', '20:00', fecha=dia)
+    assert respuesta.status_code == 400
+    assert 'superpuesta' in respuesta.get_json()['error']
+
+    # Al cerrar el turno abierto queda libre el resto del día
+    cierre = cliente.put(f"/api/ingresos-egresos/{abierto.get_json()['id']}",
+                         json={'hora_egreso': '12:00'})
+    assert cierre.status_code == 200
+    assert _alta(cliente, obra_id, personal_id, '18:00', '20:00', fecha=dia).status_code == 201
+
+
+def test_modificacion_rechazada(app, cliente, fichada):
+    obra_id, personal_id, guardada = fichada
+    tarde = _alta(cliente, obra_id, personal_id, '18:00', '21:00').get_json()['id']
+
+    respuesta = cliente.put(f'/api/ingresos-egresos/{tarde}', json={'hora_ingreso': '16:30'})
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['error'] == f'Fichada superpuesta con el registro {guardada}'
+    respuesta = cliente.put(f'/api/ingresos-egresos/{tarde}', json={'hora_ingreso': '08:00'})
+    assert respuesta.status_code == 400
+    assert 'duplicada' in respuesta.get_json()['error']
+
+    # Modificar la misma fichada no choca consigo misma
+    assert cliente.put(f'/api/ingresos-egresos/{guardada}',
+                       json={'hora_egreso': '17:30'}).status_code == 200
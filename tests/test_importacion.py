@@ -0,0 +1,155 @@
+"""Importación de personal desde CSV: formatos locales, DNI repetidos y reporte de errores"""
+
+import csv
+import io
+import os
+from datetime import date
+
+import pytest
+
+from app import db
+from models import Asignacion, Obra, Personal
+from servicios import importacion
+from tests.conftest import iniciar_sesion
+
+
+def _csv(texto):
+    return io.BytesIO(texto.encode('utf-8'))
+
+
+def _importar(texto, simular=False):
+    return importacion.importar(importacion.leer(_csv(texto), 'personal.csv'), simular=simular)
+
+
+@pytest.fixture
+def obra(app):
+    """Una obra y un empleado ya cargado con DNI 28.111.222, sin asignaciones"""
+    with app.app_context():
+        obra = Obra(nombre='Torre Norte')
+        db.session.add_all([obra, Personal(nombre='Ana', apellido='Gómez', dni='28.111.222')])
+        db.session.commit()
+        return obra.id
+
+
+def test_csv_con_punto_y_coma_y_formato_local(app, obra):
+    with app.app_context():
+        resumen, errores = _importar(
+            'Nombre;Apellido;Documento;Fecha de ingreso;Obra;Puesto;Salario\n'
+            'Juan;Pérez;30.123.456;01/03/2025;torre norte;Oficial;1.234,50\n'
+            ';;;;;;\n'
+            'Luis;Díaz;31-222-333;15/03/2025;;;\n'
+        )
+        db.session.commit()
+
+        assert errores == []
+        assert resumen == {'filas': 2, 'personal_creado': 2, 'asignaciones_creadas': 1,
+                           'errores': 0, 'simulacion': False}
+        juan = Personal.query.filter_by(dni='30.123.456').one()
+        assert juan.fecha_ingreso == '2025-03-01'
+        asignacion = Asignacion.query.filter_by(personal_id=juan.id).one()
+        assert (asignacion.obra_id, asignacion.puesto) == (obra, 'Oficial')
+        assert asignacion.salario_diario == 1234.5
+        # Sin fecha_asignacion se toma la de ingreso
+        assert asignacion.fecha_asignacion == date(2025, 3, 1)
+        assert Personal.query.filter_by(dni='31-222-333').one().fecha_ingreso == '2025-03-15'
+
+
+def test_dni_repetido(app, obra):
+    with app.app_context():
+        resumen, errores = _importar(
+            'nombre,apellido,dni\n'
+            'Juan,Pérez,30.123.456\n'
+            'Juan,Pérez,30123456\n'
+            'Ana,Gómez,28111222\n'
+        )
+        db.session.commit()
+
+        assert resumen['personal_creado'] == 1
+        assert errores == [
+            {'fila': 3, 'dni': '30123456', 'error': 'DNI 30123456 repetido en el archivo'},
+            {'fila': 4, 'dni': '28111222', 'error': 'DNI 28111222 ya registrado'},
+        ]
+        assert Personal.query.count() == 2
+
+
+def test_dni_existente_con_obra_solo_agrega_la_asignacion(app, obra):
+    with app.app_context():
+        resumen, errores = _importar(
+            'nombre,apellido,dni,obra_id,fecha_asignacion\n'
+            f'Ana,Gómez,28111222,{obra},2025-04-01\n'
+        )
+        db.session.commit()
+
+        assert errores == []
+        assert (resumen['personal_creado'], resumen['asignaciones_creadas']) == (0, 1)
+        ana = Personal.query.one()
+        assert [(a.obra_id, a.fecha_asignacion) for a in ana.asignaciones] == [
+            (obra, date(2025, 4, 1)),
+        ]
+
+
+def test_simulacion_no_inserta(app, obra):
+    with app.app_context():
+        resumen, errores = _importar('nombre,apellido\nJuan,Pérez\n', simular=True)
+        db.session.rollback()
+        assert (resumen['personal_creado'], resumen['simulacion']) == (1, True)
+        assert Personal.query.count() == 1
+
+
+def test_archivo_invalido(app):
+    with app.app_context():
+        with pytest.raises(importacion.ArchivoInvalido, match='Faltan columnas requeridas: apellido'):
+            _importar('nombre;dni\nJuan;1\n')
+        with pytest.raises(importacion.ArchivoInvalido, match='Formato no soportado'):
+            list(importacion.leer(_csv('nombre,apellido\n'), 'personal.txt'))
+
+
+def test_reporte_de_errores(app, obra, tmp_path):
+    with app.app_context():
+        _, errores = _importar(
+            'nombre;apellido;dni;obra;salario\n'
+            'Juan;;1;;\n'
+            'Luis;Díaz;2;Otra obra;\n'
+            'Pedro;Ruiz;3;Torre Norte;mucho\n'
+        )
+        db.session.rollback()
+
+    carpeta = str(tmp_path / importacion.CARPETA_REPORTES)
+    identificador = importacion.guardar_reporte(errores, carpeta)
+    ruta = importacion.ruta_reporte(carpeta, identificador)
+    with open(ruta, encoding='utf-8', newline='') as origen:
+        filas = list(csv.DictReader(origen))
+    assert filas == [
+        {'fila': '2', 'dni': '1', 'error': 'Nombre y Apellido son requeridos'},
+        {'fila': '3', 'dni': '2', 'error': 'Obra "Otra obra" inexistente'},
+        {'fila': '4', 'dni': '3', 'error': 'salario_diario inválido: mucho'},
+    ]
+
+    assert importacion.ruta_reporte(carpeta, '../' + identificador) is None
+    assert importacion.ruta_reporte(carpeta, '0' * 32) is None
+
+    # Al guardar otro reporte se borran los que superan DIAS_REPORTES
+    viejo = os.path.getmtime(ruta) - (importacion.DIAS_REPORTES + 1) * 86400
+    os.utime(ruta, (viejo, viejo))
+    importacion.guardar_reporte(errores, carpeta)
+    assert importacion.ruta_reporte(carpeta, identificador) is None
+
+
+def test_importar_por_http(app, cliente, obra, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path))
+    iniciar_sesion(app, cliente)
+
+    respuesta = cliente.post('/api/personal/importar', data={
+        'archivo': (_csv('nombre,apellido,dni\nJuan,Pérez,1\nLuis,,2\n'), 'personal.csv'),
+    })
+    assert respuesta.status_code == 201
+    resumen = respuesta.get_json()
+    assert (resumen['personal_creado'], resumen['errores']) == (1, 1)
+
+    reporte = cliente.get(resumen['reporte'])
+    assert reporte.status_code == 200
+    assert list(csv.DictReader(io.StringIO(reporte.get_data(as_text=True)))) == [
+        {'fila': '3', 'dni': '2', 'error': 'Nombre y Apellido son requeridos'},
+    ]
+    reporte.close()
+    assert cliente.get('/api/personal/importar/no-existe/errores').status_code == 404
@@ -0,0 +1,54 @@
+"""Los listados y la liquidación filtrados por obra o empleado y fechas usan los índices compuestos"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from models import Presentismo, IngresoEgreso
+from servicios import liquidacion
+from servicios.listados import filtrar
+from servicios.serializacion import consulta_plana
+from tests.conftest import poblar
+
+DESDE = date(2026, 1, 1)
+HASTA = date(2026, 1, 31)
+
+
+def _plan(consulta):
+    sql = str(consulta.compile(db.engine, compile_kwargs={'literal_binds': True}))
+    return [fila[3] for fila in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+
+def _verificar(plan, tabla, indice):
+    assert any(f'{tabla} USING INDEX {indice}' in paso for paso in plan), plan
+    assert not any(paso.startswith(f'SCAN {tabla}') for paso in plan), plan
+
+
+@pytest.fixture
+def datos(app):
+    with app.app_context():
+        poblar(40)
+        yield
+
+
+@pytest.mark.parametrize('modelo', (Presentismo, IngresoEgreso))
+@pytest.mark.parametrize('filtro', ('obra_id', 'personal_id'))
+def test_listado(app, datos, modelo, filtro):
+    args = {filtro: '1', 'fecha_inicio': DESDE.isoformat(), 'fecha_fin': HASTA.isoformat()}
+    consulta = consulta_plana(filtrar(modelo, args), modelo).statement
+    tabla = modelo.__tablename__
+    _verificar(_plan(consulta), tabla, f'ix_{tabla}_{filtro.split("_")[0]}_fecha')
+
+
+@pytest.mark.parametrize('armar, tabla', (
+    (liquidacion._consulta_presentismo, 'presentismo'),
+    (liquidacion._consulta_horas, 'ingresos_egresos'),
+))
+@pytest.mark.parametrize('filtro', ('obra_id', 'personal_id'))
+def test_liquidacion(app, datos, armar, tabla, filtro):
+    def filtros(t):
+        return [t.c[filtro] == 1]
+    _verificar(_plan(armar(DESDE, HASTA, filtros)), tabla,
+               f'ix_{tabla}_{filtro.split("_")[0]}_fecha')
@@ -0,0 +1,96 @@
+"""Carga de presentismo de una cuadrilla: upsert en un lote y errores por fila"""
+
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import routes
+from app import db
+from models import Personal, Presentismo
+from tests.conftest import INICIO, poblar
+
+
+@pytest.fixture
+def cuadrilla(app):
+    """Tres empleados en una obra; solo el primero tiene presentismo en INICIO"""
+    with app.app_context():
+        obra = poblar(3, obras=1)[0]
+        return obra.id, [p.id for p in Personal.query.order_by(Personal.id)]
+
+
+def _lote(cliente, obra_id, registros, fecha=INICIO):
+    return cliente.post('/api/presentismo/lote', json={
+        'obra_id': obra_id, 'fecha': fecha.isoformat(), 'registros': registros,
+    })
+
+
+def test_alta_y_actualizacion_en_un_lote(app, cliente, cuadrilla):
+    obra_id, (primero, segundo, tercero) = cuadrilla
+    respuesta = _lote(cliente, obra_id, [
+        {'personal_id': primero, 'tipo': 'art', 'notas': 'Parte médico'},
+        {'personal_id': str(segundo), 'tipo': 'presente'},
+        {'personal_id': tercero, 'tipo': 'feriado'},
+        {'personal_id': segundo, 'tipo': 'ausente_sin_aviso'},
+        {'personal_id': 99999, 'tipo': 'presente'},
+        {'tipo': 'presente'},
+        'no es un objeto',
+    ])
+    assert respuesta.status_code == 200, respuesta.data
+    cuerpo = respuesta.get_json()
+    assert (cuerpo['creados'], cuerpo['actualizados'], cuerpo['errores']) == (1, 1, 5)
+
+    resultados = cuerpo['resultados']
+    assert [r['estado'] for r in resultados] == [
+        'actualizado', 'creado', 'error', 'error', 'error', 'error', 'error',
+    ]
+    assert resultados[2]['error'] == 'Tipo de presentismo inválido: feriado'
+    assert resultados[3]['error'] == 'Empleado repetido en el lote'
+    assert resultados[4]['error'] == 'Empleado 99999 inexistente'
+    assert resultados[5]['error'] == 'personal_id es requerido'
+    assert resultados[6]['error'] == 'Registro inválido'
+
+    with app.app_context():
+        del_dia = {p.personal_id: p for p in Presentismo.query.filter_by(fecha=INICIO)}
+        assert set(del_dia) == {primero, segundo}
+        assert (del_dia[primero].tipo, del_dia[primero].notas) == ('art', 'Parte médico')
+        assert del_dia[primero].id == resultados[0]['id']
+        assert del_dia[segundo].id == resultados[1]['id']
+        # Los otros días no se tocan
+        assert Presentismo.query.filter(Presentismo.fecha != INICIO).count() == 2
+
+
+def test_lote_repetido_actualiza(app, cliente, cuadrilla):
+    obra_id, empleados = cuadrilla
+    fecha = INICIO + timedelta(days=10)
+    registros = [{'personal_id': p, 'tipo': 'presente'} for p in empleados]
+    primera = _lote(cliente, obra_id, registros, fecha).get_json()
+    segunda = _lote(cliente, obra_id, registros, fecha).get_json()
+    assert (primera['creados'], primera['actualizados']) == (3, 0)
+    assert (segunda['creados'], segunda['actualizados']) == (0, 3)
+    with app.app_context():
+        assert Presentismo.query.filter_by(fecha=fecha).count() == 3
+
+
+def test_conflicto_de_integridad_responde_409(app, cliente, cuadrilla, monkeypatch):
+    obra_id, empleados = cuadrilla
+
+    def fallar(*args):
+        raise IntegrityError('INSERT INTO presentismo ...', {}, Exception('FOREIGN KEY constraint failed'))
+
+    monkeypatch.setattr(routes, 'registrar_lote', fallar)
+    respuesta = _lote(cliente, obra_id, [{'personal_id': empleados[0], 'tipo': 'presente'}])
+    assert respuesta.status_code == 409
+    assert 'INSERT' not in respuesta.get_json()['error']
+    assert 'FOREIGN KEY' not in respuesta.get_json()['error']
+
+
+def test_otros_errores_no_se_ocultan(app, cliente, cuadrilla, monkeypatch):
+    obra_id, empleados = cuadrilla
+
+    def fallar(*args):
+        raise RuntimeError('falla inesperada')
+
+    monkeypatch.setattr(routes, 'registrar_lote', fallar)
+    with pytest.raises(RuntimeError):
+        _lote(cliente, obra_id, [{'personal_id': empleados[0], 'tipo': 'presente'}])
@@ -0,0 +1,132 @@
+"""Verificación de conflictos de fichadas en un lote de sincronización"""
+
+from datetime import time, timedelta
+
+from app import db
+from models import Personal, IngresoEgreso
+from servicios.sincronizacion import aplicar_operaciones
+from models.usuario import Usuario
+from tests.conftest import INICIO, poblar, contar_consultas
+
+
+def _alta(clave, personal_id, obra_id, fecha, ingreso, egreso):
+    return {'clave': clave, 'entidad': 'ingresos_egresos', 'accion': 'crear',
+            'datos': {'personal_id': personal_id, 'obra_id': obra_id, 'fecha': fecha.isoformat(),
+                      'hora_ingreso': ingreso, 'hora_egreso': egreso}}
+
+
+def _usuario(rol='en_obra'):
+    usuario = Usuario(email=f'{rol}@obra', nombre=rol, apellido='Prueba', rol=rol)
+    usuario.set_password('clave')
+    db.session.add(usuario)
+    db.session.flush()
+    return usuario.id
+
+
+def _estados(resultados):
+    return {r['clave']: r['estado'] for r in resultados}
+
+
+def test_conflictos_en_orden_del_lote(app):
+    with app.app_context():
+        obra = poblar(1, obras=1)[0]
+        empleado = Personal.query.one()
+        guardada = IngresoEgreso.query.one()
+        assert guardada.fecha == INICIO
+        dia = INICIO + timedelta(days=1)
+
+        resultados = aplicar_operaciones([
+            # Superpuesta con la fichada guardada
+            _alta('a', empleado.id, obra.id, INICIO, '16:00', '18:00'),
+            # Dos del lote superpuestas entre sí: gana la primera
+            _alta('b', empleado.id, obra.id, dia, '08:00', '12:00'),
+            _alta('c', empleado.id, obra.id, dia, '11:00', '15:00'),
+            # La guardada se corre y deja libre el horario para la siguiente
+            {'clave': 'd', 'entidad': 'ingresos_egresos', 'accion': 'actualizar',
+             'id': guardada.id, 'datos': {'hora_ingreso': '06:00', 'hora_egreso': '07:00'}},
+            _alta('e', empleado.id, obra.id, INICIO, '08:00', '17:00'),
+            # Turno nocturno del día anterior que se pisa con el de las 06:00
+            _alta('f', empleado.id, obra.id, INICIO - timedelta(days=1), '22:00', '06:30'),
+            _alta('g', empleado.id, obra.id, dia, '18:00', '20:00'),
+        ], usuario_id=_usuario())
+
+        assert _estados(resultados) == {
+            'a': 'rechazada', 'b': 'aplicada', 'c': 'rechazada', 'd': 'aplicada',
+            'e': 'aplicada', 'f': 'rechazada', 'g': 'aplicada',
+        }
+        db.session.rollback()
+
+
+def test_una_consulta_de_fichadas_por_lote(app):
+    def consultas_fichadas(cantidad, desde):
+        with app.app_context():
+            obra = poblar(cantidad, obras=1)[0]
+            usuario_id = Usuario.query.with_entities(Usuario.id).scalar() or _usuario()
+            ids = [p.id for p in Personal.query.order_by(Personal.id).offset(desde)]
+            operaciones = [
+                _alta(f'{desde}-{i}', personal_id, obra.id, INICIO + timedelta(days=25),
+                      '08:00', '17:00')
+                for i, personal_id in enumerate(ids)
+            ]
+            with contar_consultas() as sentencias:
+                resultados = aplicar_operaciones(operaciones, usuario_id=usuario_id)
+            db.session.commit()
+        assert set(_estados(resultados).values()) == {'aplicada'}
+        return sum(1 for s in sentencias
+                   if s.lstrip().upper().startswith('SELECT') and 'FROM ingresos_egresos' in s)
+
+    assert consultas_fichadas(3, 0) == consultas_fichadas(40, 3) == 1
+
+
+def test_ids_como_texto(app):
+    with app.app_context():
+        obra = poblar(1, obras=1)[0]
+        empleado = Personal.query.one()
+        dia = (INICIO + timedelta(days=3)).isoformat()
+
+        def alta(clave, personal_id, obra_id):
+            return {'clave': clave, 'entidad': 'presentismo', 'accion': 'crear',
+                    'datos': {'personal_id': personal_id, 'obra_id': obra_id,
+                              'fecha': dia, 'tipo': 'presente'}}
+
+        resultados = aplicar_operaciones([
+            alta('texto', str(empleado.id), str(obra.id)),
+            alta('letras', 'doce', obra.id),
+            alta('booleano', True, obra.id),
+            alta('falta', None, obra.id),
+            {'clave': 'id-texto', 'entidad': 'presentismo', 'accion': 'eliminar', 'id': 'x'},
+        ], usuario_id=_usuario())
+        errores = {r['clave']: r.get('error') for r in resultados}
+
+        assert _estados(resultados) == {
+            'texto': 'aplicada', 'letras': 'rechazada', 'booleano': 'rechazada',
+            'falta': 'rechazada', 'id-texto': 'rechazada',
+        }
+        assert errores['letras'] == "personal_id debe ser un número entero: 'doce'"
+        assert errores['booleano'] == 'personal_id debe ser un número entero: True'
+        assert errores['falta'] == 'personal_id es requerido'
+        assert errores['id-texto'] == "id debe ser un número entero: 'x'"
+        db.session.rollback()
+
+
+def test_claves_por_usuario(app):
+    with app.app_context():
+        obra = poblar(1, obras=1)[0]
+        empleado = Personal.query.one()
+        dispositivo, otro = _usuario('en_obra'), _usuario('admin')
+        dia = INICIO + timedelta(days=5)
+
+        primera = aplicar_operaciones(
+            [_alta('k1', empleado.id, obra.id, dia, '08:00', '12:00')], usuario_id=dispositivo)
+        reintento = aplicar_operaciones(
+            [_alta('k1', empleado.id, obra.id, dia, '08:00', '12:00')], usuario_id=dispositivo)
+        # La misma clave de otro usuario es otra operación: no devuelve el resultado ajeno
+        ajena = aplicar_operaciones(
+            [_alta('k1', empleado.id, obra.id, dia, '13:00', '17:00')], usuario_id=otro)
+        db.session.commit()
+
+        assert primera[0]['estado'] == 'aplicada'
+        assert reintento[0] == {**primera[0], 'repetida': True}
+        assert ajena[0]['estado'] == 'aplicada' and 'repetida' not in ajena[0]
+        assert ajena[0]['id'] != primera[0]['id']
+        assert IngresoEgreso.query.filter_by(fecha=dia).count() == 2
@@ -0,0 +1,147 @@
+"""Cola de trabajos: reserva sin duplicados, latido vencido y cancelación"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import db
+from models.trabajos import Trabajo
+from servicios import trabajos
+from tests.conftest import poblar
+
+EXPORTACION = {'tabla': 'presentismo', 'formato': 'csv'}
+
+
+def _encolar(app, cantidad=1):
+    with app.app_context():
+        nuevos = [trabajos.encolar('exportacion', dict(EXPORTACION)) for _ in range(cantidad)]
+        db.session.commit()
+        return [t.id for t in nuevos]
+
+
+def _trabajo(app, trabajo_id):
+    with app.app_context():
+        trabajo = db.session.get(Trabajo, trabajo_id)
+        db.session.expunge(trabajo)
+        return trabajo
+
+
+def _sin_latido(app, trabajo_id, segundos=3600):
+    """Simula un proceso que murió: su último latido quedó en el pasado"""
+    with app.app_context():
+        db.session.execute(update(Trabajo).where(Trabajo.id == trabajo_id).values(
+            fecha_actualizacion=datetime.now() - timedelta(seconds=segundos)))
+        db.session.commit()
+
+
+def test_dos_procesos_nunca_toman_el_mismo(app):
+    ids = _encolar(app, 12)
+    barrera = threading.Barrier(4)
+    tomados = {}
+
+    def proceso(nombre):
+        with app.app_context():
+            barrera.wait()
+            propios = tomados[nombre] = []
+            while (trabajo_id := trabajos._tomar(nombre)) is not None:
+                propios.append(trabajo_id)
+
+    hilos = [threading.Thread(target=proceso, args=(f'p{n}',)) for n in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    todos = [trabajo_id for propios in tomados.values() for trabajo_id in propios]
+    assert sorted(todos) == ids
+    for nombre, propios in tomados.items():
+        for trabajo_id in propios:
+            trabajo = _trabajo(app, trabajo_id)
+            assert (trabajo.estado, trabajo.proceso, trabajo.intentos) == ('en_curso', nombre, 1)
+
+
+def test_sin_pendientes_no_toma_nada(app):
+    with app.app_context():
+        assert trabajos._tomar('p') is None
+        assert trabajos.procesar_uno('p') is False
+
+
+def test_latido_vencido_vuelve_a_la_cola(app):
+    (trabajo_id,) = _encolar(app)
+    with app.app_context():
+        assert trabajos._tomar('muerto') == trabajo_id
+
+        # Con latido reciente no se toca
+        trabajos.mantenimiento(600, 7)
+        assert _trabajo(app, trabajo_id).estado == 'en_curso'
+
+        _sin_latido(app, trabajo_id)
+        trabajos.mantenimiento(600, 7)
+        trabajo = _trabajo(app, trabajo_id)
+        assert (trabajo.estado, trabajo.proceso, trabajo.mensaje) == ('pendiente', None, 'Reintentando')
+
+        # El proceso viejo ya no puede escribir su avance
+        with pytest.raises(trabajos.TrabajoCancelado):
+            trabajos._Avance(trabajo_id, 'muerto')(0.5)
+
+        assert trabajos._tomar('vivo') == trabajo_id
+        assert _trabajo(app, trabajo_id).intentos == trabajos.MAXIMO_INTENTOS
+
+        # Agotados los intentos queda con error en lugar de volver a la cola
+        _sin_latido(app, trabajo_id)
+        trabajos.mantenimiento(600, 7)
+        trabajo = _trabajo(app, trabajo_id)
+        assert trabajo.estado == 'error'
+        assert trabajo.error == 'El proceso que lo ejecutaba dejó de responder'
+        assert trabajos._tomar('otro') is None
+
+
+def test_cancelar(app):
+    pendiente, en_curso = _encolar(app, 2)
+    with app.app_context():
+        assert trabajos.cancelar(db.session.get(Trabajo, pendiente))
+        db.session.commit()
+        # El cancelado no se reserva: se toma el siguiente
+        assert trabajos._tomar('p') == en_curso
+
+        avance = trabajos._Avance(en_curso, 'p')
+        avance(0.1, 'Empezando')
+        assert trabajos.cancelar(db.session.get(Trabajo, en_curso))
+        db.session.commit()
+        avance._ultimo = 0.0
+        with pytest.raises(trabajos.TrabajoCancelado):
+            avance(0.2)
+
+        trabajo = db.session.get(Trabajo, en_curso)
+        assert (trabajo.estado, trabajo.progreso) == ('cancelado', 0.1)
+        # Uno terminado no se cancela
+        assert trabajos.cancelar(trabajo) is False
+
+
+def test_procesar_uno_y_retencion(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'instance_path', str(tmp_path))
+    with app.app_context():
+        poblar(3)
+        db.session.commit()
+    (trabajo_id,) = _encolar(app)
+
+    with app.app_context():
+        assert trabajos.procesar_uno('p') is True
+        trabajo = db.session.get(Trabajo, trabajo_id)
+        assert (trabajo.estado, trabajo.progreso, trabajo.archivo) == ('terminado', 1.0, f'{trabajo_id}.csv')
+        ruta = trabajos.ruta_resultado(trabajo)
+        with open(ruta, encoding='utf-8') as resultado:
+            assert len(resultado.read().splitlines()) == 4
+        db.session.rollback()
+
+        # Pasada la retención se borran la fila y su archivo
+        assert trabajos.mantenimiento(600, 7) == 0
+        db.session.execute(update(Trabajo).values(
+            fecha_creacion=datetime.now() - timedelta(days=8)))
+        db.session.commit()
+        assert trabajos.mantenimiento(600, 7) == 1
+        assert db.session.get(Trabajo, trabajo_id) is None
+        assert not os.path.exists(ruta)
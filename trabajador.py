@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Proceso que ejecuta los trabajos en segundo plano (reportes y exportaciones)
+Uso: python trabajador.py [--hilos 2] [--una-vez]
+
+En producción se corre junto a gunicorn, con TRABAJOS_HILOS=0 en los
+workers web para que el cálculo no comparta proceso con los requests.
+Con --una-vez procesa lo que esté pendiente y termina.
+"""
+
+import argparse
+import os
+import signal
+import socket
+
+from app import create_app
+from servicios import trabajos
+
+def _interrumpir(numero, marco):
+    raise KeyboardInterrupt
+
+def trabajar():
+    parser = argparse.ArgumentParser(description='Ejecuta los trabajos en segundo plano')
+    parser.add_argument('--hilos', type=int, default=2, help='trabajos en paralelo')
+    parser.add_argument('--una-vez', action='store_true',
+                        help='procesar lo pendiente y terminar')
+    args = parser.parse_args()
+
+    app = create_app({'MIGRAR_AL_INICIAR': False})
+
+    if args.una_vez:
+        with app.app_context():
+            proceso = f'{socket.gethostname()}:{os.getpid()}'
+            cantidad = 0
+            try:
+                while trabajos.procesar_uno(proceso):
+                    cantidad += 1
+            except Exception as e:
+                print(f"❌ Error al procesar trabajos: {str(e)}")
+                raise SystemExit(1)
+        print(f"✅ Trabajos procesados: {cantidad}")
+        return
+
+    if args.hilos < 1:
+        print("❌ --hilos debe ser al menos 1")
+        raise SystemExit(1)
+
+    trabajos.despachador.iniciar(app, args.hilos)
+    print(f"✅ Trabajador iniciado con {args.hilos} hilos (Ctrl+C para detener)")
+
+    # SIGTERM (systemd, docker stop) termina igual que Ctrl+C
+    signal.signal(signal.SIGTERM, _interrumpir)
+    try:
+        signal.pause()
+    except KeyboardInterrupt:
+        pass
+    print("Deteniendo: se espera a que terminen los trabajos en curso...")
+    trabajos.despachador.detener()
+
+if __name__ == '__main__':
+    trabajar()
@@ -0,0 +1,12 @@
+"""
+Punto de entrada WSGI para producción
+Uso: gunicorn -c gunicorn.conf.py wsgi:app
+
+Los workers no crean ni migran el esquema: solo verifican la versión y
+fallan al iniciar si la base está desactualizada. Antes de cada
+despliegue hay que correr python migrar.py.
+"""
+
+from app import create_app
+
+app = create_app({'MIGRAR_AL_INICIAR': False})